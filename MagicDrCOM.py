@@ -9,12 +9,15 @@ import sys
 
 from PySide2 import QtWidgets, QtGui
 from drcom.gui.window import MainWindow
+from drcom.main.logger import setup
 
 if __name__ == "__main__":
+    setup()
     app = QtWidgets.QApplication([])
     app.setWindowIcon(QtGui.QIcon('./resources/app.ico'))
     windows = MainWindow()
     windows.show()
-    windows.load()
+    # 窗口绘制之后在后台读取配置并检测认证服务器
+    windows.start()
 
     sys.exit(app.exec_())
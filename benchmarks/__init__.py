@@ -0,0 +1,6 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
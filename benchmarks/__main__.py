@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+性能基准，在项目根目录下运行：
+
+    python -m benchmarks                              # 运行全部基准，结果以JSON输出到标准输出
+    python -m benchmarks codec latency -o new.json    # 只运行部分基准并保存结果
+    python -m benchmarks --baseline old.json          # 与之前保存的结果进行对比
+
+有基准的结果超出预算（over_budget 不为空）时以状态1退出
+"""
+
+import sys
+import json
+import logging
+import argparse
+
+from benchmarks import bench_gui
+from benchmarks import bench_codec
+from benchmarks import bench_latency
+from benchmarks import bench_memory
+from benchmarks import bench_round
+from benchmarks import bench_heartbeat
+from benchmarks import bench_startup
+from benchmarks.common import metadata
+
+GROUPS = {
+    "codec": bench_codec,
+    "gui": bench_gui,
+    "latency": bench_latency,
+    "heartbeat": bench_heartbeat,
+    "memory": bench_memory,
+    "round": bench_round,
+    "startup": bench_startup,
+}
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from _flatten(item, "{}.{}".format(prefix, key) if prefix else key)
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            label = item.get("sessions", index) if isinstance(item, dict) else index
+            yield from _flatten(item, "{}[{}]".format(prefix, label))
+    elif isinstance(value, (int, float)):
+        yield prefix, value
+
+
+def compare(baseline, current):
+    """
+    打印与基准结果的对比，比值大于1表示变慢（吞吐类指标表示变快）
+    :param baseline:
+    :param current:
+    :return:
+    """
+    old = dict(_flatten(baseline.get("results", {})))
+    print("{:<60} {:>14} {:>14} {:>8}".format("metric", "baseline", "current", "ratio"), file=sys.stderr)
+    for name, value in _flatten(current["results"]):
+        if not name.endswith(("_ns", "_ms", "_s", "_bytes")) or name not in old or not old[name]:
+            continue
+        print("{:<60} {:>14} {:>14} {:>8.2f}".format(name, old[name], value, value / old[name]), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="MagicDrCOM 性能基准")
+    parser.add_argument("groups", nargs="*", metavar="GROUP",
+                        help="要运行的基准（{}），默认全部运行".format(", ".join(sorted(GROUPS))))
+    parser.add_argument("-o", "--output", help="将JSON结果写入文件")
+    parser.add_argument("--baseline", help="与之前保存的JSON结果进行对比")
+    parser.add_argument("--iterations", type=int, default=200, help="登录延迟与单轮心跳延迟的采样次数")
+    parser.add_argument("--gui-iterations", type=int, default=10, help="图形界面登录延迟与启动时间的采样次数")
+    parser.add_argument("--log-messages", type=int, default=100000, help="图形界面日志面板测试写入的日志条数")
+    parser.add_argument("--rtt", type=float, default=5.0, help="单轮心跳测试中模拟服务器的返回延迟（毫秒）")
+    parser.add_argument("--sessions", default="1,10,100,1000,10000", help="心跳吞吐测试的会话数量，逗号分隔")
+    parser.add_argument("--rounds", type=int, default=5, help="每个会话数量下测量的心跳轮数")
+    parser.add_argument("--pool", type=int, default=8, help="SessionManager的UDP端点数量，登录与登出在每个端点上逐个进行")
+    parser.add_argument("--concurrency", type=int, default=256, help="同时登录的会话数量上限")
+    parser.add_argument("--memory-sessions", type=int, default=1000, help="内存占用测试的会话数量")
+    parser.add_argument("--memory-budget", type=int, default=4096, help="每个已登录会话的内存预算（字节）")
+    options = parser.parse_args(argv)
+    options.sessions = [int(count) for count in options.sessions.split(",") if count]
+    for name in options.groups:
+        if name not in GROUPS:
+            parser.error("unknown benchmark group: {}".format(name))
+
+    # 基准过程中的重试等日志不需要输出
+    logging.disable(logging.WARNING)
+
+    report = {"meta": metadata(), "results": {}}
+    for name in options.groups or sorted(GROUPS):
+        print("running {}...".format(name), file=sys.stderr)
+        report["results"][name] = GROUPS[name].run(options)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, "w") as fp:
+            fp.write(output)
+    else:
+        print(output)
+
+    if options.baseline:
+        with open(options.baseline) as fp:
+            compare(json.load(fp), report)
+
+    over = [name for name, result in report["results"].items()
+            if isinstance(result, dict) and result.get("over_budget")]
+    if over:
+        print("over budget: {}".format(", ".join(over)), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
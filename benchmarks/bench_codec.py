@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+数据包编解码的微基准
+"""
+
+import os
+
+from drcom.main.utils import md5
+from drcom.main.utils import checksum
+from drcom.main.utils import int2hex_str
+from drcom.main.client import DrCOMClient
+
+from benchmarks.common import micro
+
+
+def _client():
+    client = DrCOMClient("2019000000", "123456")
+    session = client.session
+    session.host_name = "MagicDrCOM-benchmark"
+    session.mac = bytes.fromhex("001a264a7b0d")
+    session.ip = "10.1.2.3"
+    session.salt = os.urandom(4)
+    session.auth_info = os.urandom(16)
+    return client
+
+
+def run(options):
+    client = _client()
+    key = os.urandom(4)
+    login = bytes(client._make_login_package())
+    salts = [os.urandom(4) for _ in range(64)]
+
+    def login_new_salt(state=[0]):
+        # 每次都更换salt，对应重新登录的开销
+        state[0] = (state[0] + 1) & 63
+        client.session.salt = salts[state[0]]
+        return client._make_login_package()
+
+    results = {
+        "make_login_package": micro(client._make_login_package),
+        "make_login_package_new_salt": micro(login_new_salt),
+        "make_alive_package_cls1": micro(lambda: client._make_alive_package(2, key, 1)),
+        "make_alive_package_cls3": micro(lambda: client._make_alive_package(2, key, 3)),
+        "make_alive1_package": micro(client._make_alive1_package),
+        "make_logout_package": micro(client._make_logout_package),
+        "checksum_login": micro(lambda: checksum(login[:314] + b'\x01\x26\x07\x11\x00\x00' + client.session.mac)),
+        "md5_login": micro(lambda: md5(b'\x03\x01' + client.session.salt + b'123456')),
+        "int2hex_str": micro(lambda: int2hex_str(0x1234)),
+    }
+    return results
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+图形界面从点击登录到在线的延迟，对本地模拟服务器测量：
+    signal     MainWindow.login()，登录任务完成时由信号切换到 ONLINE
+    busy_wait  之前的流程：启动登录任务之后每0.5秒检查一次线程池并调用 processEvents()
+另外从后台线程向日志面板写入 --log-messages 条日志，记录刷新（重绘）次数与保留的行数
+使用offscreen平台运行，不需要显示器；没有安装PySide2时跳过
+用户配置写入临时目录，不影响 ~/.MagicDrCOM-gui.cfg
+"""
+
+import os
+import time
+import tempfile
+import threading
+
+from benchmarks.common import configure
+from benchmarks.common import percentiles
+from benchmarks.common import EmulatorProcess
+
+
+def _wait(window, predicate, timeout=10):
+    """
+    运行事件循环直到 predicate() 为真，由界面状态变化唤醒，不轮询
+    """
+    from PySide2 import QtCore
+
+    loop = QtCore.QEventLoop()
+    timer = QtCore.QTimer()
+    timer.setSingleShot(True)
+    timer.timeout.connect(loop.quit)
+
+    def check(_):
+        if predicate():
+            loop.quit()
+
+    window.stateChanged.connect(check)
+    try:
+        if not predicate():
+            timer.start(int(timeout * 1000))
+            loop.exec_()
+    finally:
+        timer.stop()
+        window.stateChanged.disconnect(check)
+    if not predicate():
+        raise RuntimeError("timed out waiting for the window")
+
+
+def _signal(window, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        window.login()
+        _wait(window, lambda: window.state != window.LOGGING_IN)
+        samples.append(time.perf_counter() - start)
+        window.logout()
+        _wait(window, lambda: window.state == window.READY)
+    return samples
+
+
+def _busy_wait(app, window, iterations):
+    from drcom.main.threads import ClientLoginThreads
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        worker = ClientLoginThreads(window.client)
+        worker.setAutoDelete(True)
+        window.threads_pool.start(worker)
+        while window.threads_pool.activeThreadCount() != 0:
+            time.sleep(0.5)
+            app.processEvents()
+        samples.append(time.perf_counter() - start)
+        window.client.logout()
+    return samples
+
+
+def _log_view(window, messages):
+    """
+    后台线程连续写日志，刷新次数取决于耗时而不是消息数量，保留的行数不超过容量
+    """
+    from PySide2 import QtCore
+
+    model = window.log_model
+    flushes = model.flushes
+    received = model.received + messages
+    start = time.perf_counter()
+    writer = threading.Thread(target=lambda: [model.append("message {}".format(i)) for i in range(messages)])
+    writer.start()
+    loop = QtCore.QEventLoop()
+    while writer.is_alive() or model.received < received:
+        loop.processEvents(QtCore.QEventLoop.AllEvents, 50)
+    model.flush()
+    elapsed = time.perf_counter() - start
+    writer.join()
+    return {"messages": messages, "flushes": model.flushes - flushes, "rows": model.rowCount(),
+            "capacity": model.capacity, "seconds": round(elapsed, 3)}
+
+
+def run(options):
+    try:
+        from PySide2 import QtWidgets
+    except ImportError:
+        return {"skipped": "PySide2 is not installed"}
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    home = os.environ.get("HOME")
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, EmulatorProcess() as server:
+        os.environ["HOME"] = directory
+        previous = configure(SERVER_IP=server[0], SERVER_PORT=server[1], SERVER_CANDIDATES=[server[0]],
+                             SERVER_CACHE="", LOCAL_PORT=0)
+        try:
+            import drcom.gui.window as gui
+            gui.LINK_WATCH = False
+            app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+            window = gui.MainWindow()
+            window.usrLineEdit.setText("2019000000")
+            window.pwdLineEdit.setText("123456")
+            window.load()
+            _wait(window, lambda: window.state != window.PREPARING)
+            results["signal"] = percentiles(_signal(window, options.gui_iterations))
+            results["busy_wait"] = percentiles(_busy_wait(app, window, options.gui_iterations))
+            # 多次登录之后每次到期仍然只调用一次处理函数
+            results["timers"] = window.timers.stats()
+            results["log_view"] = _log_view(window, options.log_messages)
+            window.shutdown()
+            window.client.close()
+        finally:
+            configure(**previous)
+            if home is None:
+                os.environ.pop("HOME", None)
+            else:
+                os.environ["HOME"] = home
+    return results
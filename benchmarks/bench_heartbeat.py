@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+心跳吞吐：SessionManager 中的会话数量从 1 增长到 10k 时，一轮心跳的耗时与每秒完成的心跳数
+"""
+
+import time
+import asyncio
+
+from drcom.main.session import SessionManager
+
+from benchmarks.common import configure
+from benchmarks.common import percentiles
+from benchmarks.common import EmulatorProcess
+
+
+async def _measure(count, options):
+    manager = SessionManager(pool_size=options.pool, local_port=0, concurrency=options.concurrency)
+    await manager.start()
+    try:
+        for i in range(count):
+            manager.add("bench{:05d}".format(i), "123456")
+
+        start = time.perf_counter()
+        await asyncio.gather(*[manager.login(usr) for usr in manager.sessions])
+        login_time = time.perf_counter() - start
+
+        sessions = list(manager.sessions.values())
+        rounds = []
+        for _ in range(options.rounds):
+            start = time.perf_counter()
+            await asyncio.gather(*[session.heartbeat() for session in sessions])
+            rounds.append(time.perf_counter() - start)
+    finally:
+        manager.close()
+
+    return {
+        "sessions": count,
+        "pool": options.pool,
+        "login_all_s": round(login_time, 4),
+        "round": percentiles(rounds),
+        "heartbeats_per_s": round(count * len(rounds) / sum(rounds), 1),
+    }
+
+
+def run(options):
+    results = []
+    with EmulatorProcess() as server:
+        previous = configure(SERVER_IP=server[0], SERVER_PORT=server[1], SERVER_CANDIDATES=[server[0]],
+                             SERVER_CACHE="")
+        loop = asyncio.new_event_loop()
+        try:
+            for count in options.sessions:
+                results.append(loop.run_until_complete(_measure(count, options)))
+        finally:
+            loop.close()
+            configure(**previous)
+    return results
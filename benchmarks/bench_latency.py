@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+端到端登录延迟：对本地模拟服务器重复进行 challenge + login，统计各阶段延迟分位数
+"""
+
+import time
+import asyncio
+
+from drcom.main.aio import AsyncDrCOMClient
+from drcom.main.client import DrCOMClient
+from drcom.main.replies import ChallengeReply
+
+from benchmarks.common import configure
+from benchmarks.common import percentiles
+from benchmarks.common import EmulatorProcess
+
+
+def _sync(server, iterations):
+    client = DrCOMClient("2019000000", "123456")
+    client._setup()
+    challenge, login = [], []
+    try:
+        for _ in range(iterations):
+            pkg, random_value = client._make_challenge_package()
+            start = time.perf_counter()
+            reply = client._send_package(pkg, server, ChallengeReply)
+            client._check_challenge(reply, random_value)
+            middle = time.perf_counter()
+            client.login()
+            end = time.perf_counter()
+            challenge.append(middle - start)
+            login.append(end - middle)
+    finally:
+        client.socket.close()
+    return challenge, login
+
+
+def _async(server, iterations):
+    async def main():
+        client = AsyncDrCOMClient("2019000000", "123456")
+        await client._setup()
+        challenge, login = [], []
+        try:
+            for _ in range(iterations):
+                pkg, random_value = client._make_challenge_package()
+                start = time.perf_counter()
+                reply = await client._send_package(pkg, server, ChallengeReply)
+                client._check_challenge(reply, random_value)
+                middle = time.perf_counter()
+                await client.login()
+                end = time.perf_counter()
+                challenge.append(middle - start)
+                login.append(end - middle)
+        finally:
+            client.close()
+        return challenge, login
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+def run(options):
+    results = {}
+    with EmulatorProcess() as server:
+        previous = configure(SERVER_IP=server[0], SERVER_PORT=server[1], SERVER_CANDIDATES=[server[0]],
+                             SERVER_CACHE="", LOCAL_PORT=0)
+        try:
+            for name, engine in (("sync", _sync), ("asyncio", _async)):
+                challenge, login = engine(server, options.iterations)
+                results[name] = {
+                    "challenge": percentiles(challenge),
+                    "login": percentiles(login),
+                    "total": percentiles([a + b for a, b in zip(challenge, login)]),
+                }
+        finally:
+            configure(**previous)
+    return results
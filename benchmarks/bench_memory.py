@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+单个会话的内存占用：用tracemalloc统计创建大量会话前后增加的内存，除以会话数量
+    record     只有 core.Session 状态记录
+    client     DrCOMSession，数据包模板已经创建（相当于登录之后的离线状态）
+    logged_in  SessionManager 中对本地模拟服务器登录之后的会话，包括等待表、端点分配等
+超出预算的项目记录在结果的 over_budget 中并在标准错误输出中提示，python -m benchmarks 以非零状态退出；
+logged_in 的预算由 --memory-budget 给出
+"""
+
+import os
+import gc
+import sys
+import asyncio
+import tracemalloc
+
+from drcom.main.core import Session
+from drcom.main.session import DrCOMSession
+from drcom.main.session import SessionManager
+
+from benchmarks.common import configure
+from benchmarks.common import EmulatorProcess
+
+_HOST = ("MagicDrCOM-benchmark", bytes.fromhex("001a264a7b0d"), "10.1.2.3")
+
+# 每个会话的内存预算（字节）
+BUDGETS = {"record_bytes": 1024, "client_bytes": 2048}
+
+
+def _per_session(count, factory):
+    """
+    :param count:
+    :param factory: factory(i) 创建第i个会话
+    :return: 每个会话占用的字节数
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        sessions = [factory(i) for i in range(count)]
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del sessions
+    return used // count
+
+
+def _record(i):
+    session = Session("2019{:06d}".format(i), "123456")
+    session.host_name, session.mac, session.ip = _HOST
+    session.salt = os.urandom(4)
+    session.auth_info = os.urandom(16)
+    return session
+
+
+def _client(i):
+    client = DrCOMSession("2019{:06d}".format(i), "123456", None, _HOST)
+    client.session.salt = os.urandom(4)
+    client.session.auth_info = os.urandom(16)
+    client._make_login_package()
+    client._make_alive1_package()
+    client._make_alive_package(0, client.session.key, 1)
+    client._make_alive_package(0, client.session.key, 3)
+    client._make_logout_package()
+    return client
+
+
+async def _logged_in(count, options):
+    manager = SessionManager(pool_size=options.pool, local_port=0, concurrency=options.concurrency)
+    await manager.start()
+    try:
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(count):
+            manager.add("bench{:05d}".format(i), "123456")
+        await asyncio.gather(*[manager.login(usr) for usr in manager.sessions])
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+    finally:
+        manager.close()
+    return used // count
+
+
+def run(options):
+    count = options.memory_sessions
+    results = {
+        "sessions": count,
+        "budget_bytes": options.memory_budget,
+        "record_bytes": _per_session(count, _record),
+        "client_bytes": _per_session(count, _client),
+    }
+    with EmulatorProcess() as server:
+        previous = configure(SERVER_IP=server[0], SERVER_PORT=server[1], SERVER_CANDIDATES=[server[0]],
+                             SERVER_CACHE="")
+        loop = asyncio.new_event_loop()
+        try:
+            results["logged_in_bytes"] = loop.run_until_complete(_logged_in(count, options))
+        finally:
+            loop.close()
+            configure(**previous)
+
+    budgets = dict(BUDGETS, logged_in_bytes=options.memory_budget)
+    results["over_budget"] = sorted(name for name, budget in budgets.items() if results[name] > budget)
+    for name in results["over_budget"]:
+        print("memory: {} is {} bytes per session, exceeds the budget of {} bytes".format(
+            name, results[name], budgets[name]), file=sys.stderr)
+    return results
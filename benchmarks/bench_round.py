@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+单个会话一轮心跳的延迟：模拟服务器的返回延迟为 --rtt 毫秒时，
+    sequential  依次发送心跳包一、cls 1、cls 3，三个往返（之前的流程）
+    pipelined   heartbeat()，心跳包一与 cls 1 -> cls 3 链同时进行，两个往返
+同步客户端在一轮心跳期间阻塞调用线程，round 即心跳线程的占用时间
+"""
+
+import time
+import asyncio
+
+from drcom.main.aio import AsyncDrCOMClient
+from drcom.main.client import DrCOMClient
+
+from benchmarks.common import configure
+from benchmarks.common import percentiles
+from benchmarks.common import EmulatorProcess
+
+
+def _sequential(client):
+    session = client.session
+    client.send_alive_pkg1()
+    session.key = client.send_alive_pkg2(session.num, session.key, cls=1)
+    session.key = client.send_alive_pkg2(session.num, session.key, cls=3)
+    session.num = session.num + 2
+
+
+async def _sequential_async(client):
+    session = client.session
+    await client.send_alive_pkg1()
+    session.key = await client.send_alive_pkg2(session.num, session.key, cls=1)
+    session.key = await client.send_alive_pkg2(session.num, session.key, cls=3)
+    session.num = session.num + 2
+
+
+def _sync(rounds):
+    client = DrCOMClient("2019000000", "123456")
+    client.prepare()
+    client.login()
+    results = {}
+    try:
+        for name, heartbeat in (("sequential", _sequential), ("pipelined", DrCOMClient.heartbeat)):
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                heartbeat(client)
+                samples.append(time.perf_counter() - start)
+            results[name] = percentiles(samples)
+    finally:
+        client.close()
+    return results
+
+
+def _async(rounds):
+    async def main():
+        client = AsyncDrCOMClient("2019000000", "123456")
+        await client.prepare()
+        await client.login()
+        results = {}
+        try:
+            for name, heartbeat in (("sequential", _sequential_async), ("pipelined", AsyncDrCOMClient.heartbeat)):
+                samples = []
+                for _ in range(rounds):
+                    start = time.perf_counter()
+                    await heartbeat(client)
+                    samples.append(time.perf_counter() - start)
+                results[name] = percentiles(samples)
+        finally:
+            client.close()
+        return results
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(main())
+    finally:
+        loop.close()
+
+
+def run(options):
+    results = {"rtt_ms": options.rtt}
+    with EmulatorProcess("--delay", str(options.rtt / 1e3)) as server:
+        previous = configure(SERVER_IP=server[0], SERVER_PORT=server[1], SERVER_CANDIDATES=[server[0]],
+                             SERVER_CACHE="", LOCAL_PORT=0)
+        try:
+            results["sync"] = _sync(options.iterations)
+            results["asyncio"] = _async(options.iterations)
+        finally:
+            configure(**previous)
+    return results
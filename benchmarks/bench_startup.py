@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+图形界面的启动时间，从创建 MainWindow 开始计时：
+    construct    MainWindow() 返回
+    first_paint  窗口的第一个绘制事件
+    ready        检测到本地模拟服务器，可以登录（READY）
+另外在没有可用服务器时测量 first_paint，并记录首次绘制时的界面状态（检测应在后台进行，不推迟绘制）
+使用offscreen平台运行，不需要显示器；没有安装PySide2时跳过
+"""
+
+import os
+import time
+import tempfile
+
+from benchmarks.common import configure
+from benchmarks.common import percentiles
+from benchmarks.common import EmulatorProcess
+from benchmarks.bench_gui import _wait
+
+
+def _launch(app, gui):
+    """
+    :return: (window, {阶段: 秒}, 首次绘制时的状态, 开始时间)
+    """
+    from PySide2 import QtCore, QtWidgets
+
+    class PaintProbe(QtCore.QObject):
+        def __init__(self):
+            super(PaintProbe, self).__init__()
+            self.window = None
+            self.painted = None
+            self.state = None
+
+        def eventFilter(self, obj, event):
+            if self.painted is None and self.window is not None and event.type() == QtCore.QEvent.Paint \
+                    and isinstance(obj, QtWidgets.QWidget) and obj.window() is self.window:
+                self.painted = time.perf_counter()
+                self.state = self.window.state
+            return False
+
+    probe = PaintProbe()
+    app.installEventFilter(probe)
+    try:
+        start = time.perf_counter()
+        window = gui.MainWindow()
+        constructed = time.perf_counter()
+        probe.window = window
+        window.show()
+        window.start()
+        deadline = time.monotonic() + 5
+        while probe.painted is None and time.monotonic() < deadline:
+            app.processEvents(QtCore.QEventLoop.AllEvents, 50)
+    finally:
+        app.removeEventFilter(probe)
+    if probe.painted is None:
+        raise RuntimeError("the window was never painted")
+    return window, {"construct": constructed - start, "first_paint": probe.painted - start}, probe.state, start
+
+
+def run(options):
+    try:
+        from PySide2 import QtWidgets
+    except ImportError:
+        return {"skipped": "PySide2 is not installed"}
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    home = os.environ.get("HOME")
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, EmulatorProcess() as server:
+        os.environ["HOME"] = directory
+        previous = configure(SERVER_IP=server[0], SERVER_PORT=server[1], SERVER_CANDIDATES=[server[0]],
+                             SERVER_CACHE="", LOCAL_PORT=0)
+        try:
+            import drcom.gui.window as gui
+            gui.LINK_WATCH = False
+            app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+            samples = {"construct": [], "first_paint": [], "ready": []}
+            for _ in range(options.gui_iterations):
+                window, stages, _, start = _launch(app, gui)
+                _wait(window, lambda: window.state not in (window.UNREADY, window.PREPARING))
+                stages["ready"] = time.perf_counter() - start
+                window.shutdown(0)
+                window.client.close()
+                window.deleteLater()
+                for name, value in stages.items():
+                    samples[name].append(value)
+            results["online"] = {name: percentiles(values) for name, values in samples.items()}
+
+            # 候选服务器不可达：检测在后台重传，首次绘制不等待检测结果
+            configure(SERVER_IP="127.0.0.1", SERVER_PORT=9, SERVER_CANDIDATES=["127.0.0.1"])
+            window, stages, state, _ = _launch(app, gui)
+            window.shutdown(0)
+            window.client.close()
+            window.deleteLater()
+            results["offline"] = {"construct_ms": round(stages["construct"] * 1e3, 3),
+                                  "first_paint_ms": round(stages["first_paint"] * 1e3, 3),
+                                  "state_at_paint": state}
+        finally:
+            configure(**previous)
+            if home is None:
+                os.environ.pop("HOME", None)
+            else:
+                os.environ["HOME"] = home
+    return results
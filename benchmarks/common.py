@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import sys
+import time
+import socket
+import timeit
+import platform
+import subprocess
+
+import drcom.main.aio
+import drcom.main.tool
+import drcom.main.client
+import drcom.main.session
+import drcom.main.discovery
+import drcom.configs.settings
+
+# 通过 from drcom.configs.settings import * 引用了服务器地址的模块
+SETTINGS_MODULES = (drcom.configs.settings, drcom.main.client, drcom.main.tool, drcom.main.aio,
+                    drcom.main.session, drcom.main.discovery)
+
+
+def metadata():
+    """
+    基准结果中记录的运行环境，用于不同版本之间对比
+    :return:
+    """
+    try:
+        revision = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                           stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = ""
+    return {
+        "revision": revision,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "timestamp": int(time.time()),
+    }
+
+
+def configure(**values):
+    """
+    修改所有模块中引用的配置项，例如 configure(SERVER_IP="127.0.0.1", SERVER_PORT=61441)
+    :return: 修改之前的值，用于恢复
+    """
+    previous = {name: getattr(drcom.configs.settings, name) for name in values}
+    for module in SETTINGS_MODULES:
+        for name, value in values.items():
+            if hasattr(module, name):
+                setattr(module, name, value)
+    return previous
+
+
+def micro(func, repeat=5, min_time=0.2):
+    """
+    微基准：自动确定循环次数，返回每次调用耗时（纳秒）的最好值与中位数
+    :param func:
+    :param repeat:
+    :param min_time:
+    :return:
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(int(number * min_time / max(elapsed, 1e-9)), 1)
+    samples = sorted(t / number * 1e9 for t in timer.repeat(repeat=repeat, number=number))
+    return {"best_ns": round(samples[0], 1), "median_ns": round(samples[len(samples) // 2], 1), "loops": number}
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """
+    计算延迟分位数（毫秒）
+    :param samples: 秒为单位的样本
+    :param points:
+    :return:
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {"min_ms": round(ordered[0] * 1e3, 3), "max_ms": round(ordered[-1] * 1e3, 3),
+              "mean_ms": round(sum(ordered) / len(ordered) * 1e3, 3), "count": len(ordered)}
+    for point in points:
+        index = min(int(round(point / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+        result["p{}_ms".format(point)] = round(ordered[index] * 1e3, 3)
+    return result
+
+
+class EmulatorProcess(object):
+    """
+    在独立进程中运行 drcom.emulator，避免与被测客户端争抢GIL
+    """
+
+    def __init__(self, *options, port=0):
+        self.port = port or free_udp_port()
+        self.options = options
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen([sys.executable, "-m", "drcom.emulator", "--port", str(self.port)] +
+                                        list(self.options), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._wait_ready()
+        return ("127.0.0.1", self.port)
+
+    def __exit__(self, *args):
+        self.process.terminate()
+        self.process.wait()
+
+    def _wait_ready(self, timeout=10):
+        probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        probe.settimeout(0.1)
+        deadline = time.monotonic() + timeout
+        try:
+            while time.monotonic() < deadline:
+                probe.sendto(b'\x01\x02\x00\x00\x0a' + b'\x00' * 15, ("127.0.0.1", self.port))
+                try:
+                    probe.recvfrom(1024)
+                    return
+                except (socket.timeout, ConnectionError):
+                    continue
+        finally:
+            probe.close()
+        raise RuntimeError("emulator did not start on port {}".format(self.port))
+
+
+def free_udp_port():
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+    finally:
+        s.close()
@@ -15,5 +15,7 @@ if __name__ == "__main__":
     app.setWindowIcon(QtGui.QIcon('../resources/app.ico'))
     windows = MainWindow()
     windows.show()
+    # 窗口绘制之后在后台读取配置并检测认证服务器
+    windows.start()
 
     sys.exit(app.exec_())
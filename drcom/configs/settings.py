@@ -5,6 +5,7 @@
 # 本项目由@Ryuchen开发维护，使用Python3.7
 # ==================================================
 
+import os
 import logging
 
 
@@ -16,16 +17,40 @@ LOCAL_MAC = ""  # 选填，默认为空，应填写本机网卡MAC，全小写
 
 
 # app config
-ReTryTimes = 3
+ReTryTimes = 5  # 单个请求最多发送的次数
+RTO_INITIAL = 1.0  # 还没有测得往返时间时的重传超时（秒）
+RTO_MIN = 0.2  # 重传超时下限（秒）
+RTO_MAX = 3.0  # 重传超时上限（秒）
+OPERATION_DEADLINE = 9.0  # 单个请求（包括重传）的总时限（秒）
 ReLoginFlag = True
 ReLoginTimes = 3
 ReLoginCheck = 30
+HEARTBEAT_JITTER = 1.0  # 每个会话的心跳相位随机推迟 [0, HEARTBEAT_JITTER) 秒，避免大量会话同时发送
+HEARTBEAT_LATE = 0.5  # 心跳晚于计划时间超过该值（秒）时记为迟到，计入运行指标并输出警告
+SESSION_WINDOW = 32  # SessionManager中同时等待返回的请求数量上限（全部UDP端点共用），超出的请求等待前面的请求结束
 LOG_LEVEL = logging.INFO
+LOG_VIEW_LINES = 500  # 图形界面日志面板保留的行数，更早的日志被丢弃
+LOG_VIEW_INTERVAL = 200  # 日志面板两次刷新之间的最短间隔（毫秒），期间的日志合并显示
+LINK_WATCH = True  # 监听网卡与地址变化，网线拔插或IP变化时立即重新登录
+LINK_POLL_INTERVAL = 5  # 不支持rtnetlink的平台上检查网卡变化的间隔（秒）
+SHUTDOWN_DEADLINE = 3.0  # 图形界面退出时等待登出等后台任务的最长时间（秒），超时后取消任务直接退出
+DISCOVERY_RETRY_MIN = 5  # 图形界面检测认证服务器失败后第一次自动重试的等待时间（秒），之后每次加倍
+DISCOVERY_RETRY_MAX = 60  # 自动重试的最长等待时间（秒）
+METRICS_HOST = "127.0.0.1"  # 运行指标服务的监听地址
+METRICS_PORT = 0  # 运行指标服务的端口，为0时不启动，启动后访问 /metrics 或 /metrics.json
+CAPTURE_PACKETS = 0  # 抓包环形缓冲区保存的数据包数量，为0时不抓包，出错或收到SIGUSR1时写成pcap文件
+CAPTURE_DIR = os.path.expanduser("~")  # pcap文件的保存目录
+# 上一次可用的认证服务器与往返时间，下次启动时优先尝试；为空时不使用缓存
+SERVER_CACHE = os.path.join(os.path.expanduser("~"), ".MagicDrCOM-server.json")
 
 
 # login config
 # 关键参数，BISTU版专属，请勿随意更改
 SERVER_IP = '192.168.211.3'
+SERVER_PORT = 61440
+# prepare时同时探测的认证服务器地址，最先返回合法挑战包的服务器胜出
+SERVER_CANDIDATES = [SERVER_IP, '1.1.1.1', '202.1.1.1']
+LOCAL_PORT = 61440  # 本机绑定的端口，与本地模拟服务器(drcom.emulator)同机测试时需要修改
 DHCP_SERVER_IP = '211.68.32.204'
 CONTROL_CHECK_STATUS = b'\x20'
 ADAPTER_NUMBER = b'\x01'
@@ -33,6 +58,15 @@ IP_DOG = b'\x01'
 AUTH_VERSION = b'\x0a\x00'
 KEEP_ALIVE_VERSION = b'\xdc\x02'
 
+
+# probe config
+# 网络连通性检测目标：(类型, 地址, 端口[, 超时时间])，类型为 tcp、dns 或 drcom
+PROBE_TARGETS = [("tcp", "114.114.114.114", 53), ("dns", "223.5.5.5", 53), ("drcom", SERVER_IP, SERVER_PORT)]
+PROBE_QUORUM = 2  # 至少有几个目标可达时判定为在线
+PROBE_TIMEOUT = 1.0  # 单个目标的默认超时时间（秒）
+PROBE_TTL = 5.0  # 检测结果的缓存时间（秒）
+
+
 # 状态声明参数
 DIEOUT = 2
 ONLINE = 1
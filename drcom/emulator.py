@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+本地Dr.COM认证服务器模拟器，用于测试和性能基准，不需要接入校园网
+
+    python -m drcom.emulator --port 61441 --account 2019000000:123456
+
+客户端需要将 settings.py 中的 SERVER_IP 与 SERVER_CANDIDATES 改为 127.0.0.1，SERVER_PORT 改为模拟器端口；
+模拟器与客户端在同一台机器上时两者不能同时绑定61440端口
+
+支持的交互：
+    0x01 0x02 + 随机值   ->  0x02 0x02 + 随机值 + salt
+    0x01 0x03           ->  0x02 0x03 + 随机值 + salt
+    0x03 登录            ->  0x04（auth_info 位于 23:39）/ 0x05（32 字节处为错误码）
+    0xff 心跳包一         ->  0x07
+    0x07 心跳包二         ->  0x07 + 编号 + 0x28 0x00 0x0b + 类型 ... key 位于 16:20
+    0x06 登出            ->  0x04
+心跳包二的key必须沿用上一次返回的key，超过会话超时时间没有心跳的会话会被清除
+"""
+
+import os
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+from drcom.main.utils import md5
+from drcom.main.utils import checksum
+from drcom.main.logger import logger
+from drcom.main.logger import setup
+from drcom.configs.settings import *
+
+
+class EmulatorSession(object):
+
+    def __init__(self, usr, address, salt, auth_info):
+        self.usr = usr
+        self.address = address
+        self.salt = salt
+        self.auth_info = auth_info
+        self.key = b'\x00' * 4
+        self.last_seen = time.monotonic()
+
+
+class EmulatorProtocol(asyncio.DatagramProtocol):
+    """
+    模拟服务器的协议层
+    同一个地址上可以有多个账号登录，心跳包一与登出按auth_info、心跳包二按key区分会话
+    """
+
+    def __init__(self, accounts=None, session_timeout=180, challenge_timeout=30, loss=0.0, delay=0.0):
+        """
+        :param accounts: {账号: 密码}，为空时接受任意账号和密码
+        :param session_timeout: 会话超过该秒数没有心跳即被清除
+        :param challenge_timeout: salt的有效期
+        :param loss: 随机丢弃收到的数据包的概率，用于模拟丢包
+        :param delay: 返回数据包前等待的秒数，用于模拟网络延迟
+        """
+        self.accounts = accounts or {}
+        self.session_timeout = session_timeout
+        self.challenge_timeout = challenge_timeout
+        self.loss = loss
+        self.delay = delay
+
+        self.transport = None
+        self.stats = {}
+        self._salts = {}
+        self._sessions = {}
+        self._users = {}
+        self._keys = {}
+        self._fresh = {}
+        self._sweeper = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._sweep()
+
+    def connection_lost(self, exc):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+
+    @property
+    def sessions(self):
+        return list(self._sessions.values())
+
+    def _count(self, name):
+        self.stats[name] = self.stats.get(name, 0) + 1
+
+    def _sweep(self):
+        """
+        清除超时的会话与过期的salt
+        :return:
+        """
+        now = time.monotonic()
+        for auth_info, session in list(self._sessions.items()):
+            if now - session.last_seen > self.session_timeout:
+                logger.info("[Emulator]：Session %s timeout...", session.usr)
+                self._drop(session)
+                self._count("timeout")
+        for address, salts in list(self._salts.items()):
+            for salt, deadline in list(salts.items()):
+                if deadline < now:
+                    del salts[salt]
+            if not salts:
+                del self._salts[address]
+        interval = max(min(self.session_timeout, self.challenge_timeout) / 2, 0.1)
+        self._sweeper = asyncio.get_event_loop().call_later(interval, self._sweep)
+
+    def _drop(self, session):
+        self._sessions.pop(session.auth_info, None)
+        if self._users.get(session.usr) is session:
+            del self._users[session.usr]
+        if self._keys.get(session.key) is session:
+            del self._keys[session.key]
+        fresh = self._fresh.get(session.address)
+        if fresh and session in fresh:
+            fresh.remove(session)
+
+    def _reply(self, data, addr):
+        if self.delay:
+            asyncio.get_event_loop().call_later(self.delay, self.transport.sendto, data, addr)
+        else:
+            self.transport.sendto(data, addr)
+
+    def datagram_received(self, data, addr):
+        if self.loss and random.random() < self.loss:
+            self._count("lost")
+            return
+        if not data:
+            return
+        code = data[0]
+        if code == 0x01 and len(data) >= 4:
+            reply = self._on_challenge(data, addr)
+        elif code == 0x03 and len(data) >= 330:
+            reply = self._on_login(data, addr)
+        elif code == 0xff and len(data) >= 36:
+            reply = self._on_alive1(data, addr)
+        elif code == 0x07 and len(data) >= 20:
+            reply = self._on_alive2(data, addr)
+        elif code == 0x06 and len(data) >= 80:
+            reply = self._on_logout(data, addr)
+        else:
+            reply = None
+        if reply is None:
+            self._count("dropped")
+            logger.debug("[Emulator]：Drop package from %s: %s", addr, data[:8])
+            return
+        self._reply(reply, addr)
+
+    def _on_challenge(self, data, addr):
+        self._count("challenge")
+        salt = os.urandom(4)
+        # 登出准备返回的salt不会被客户端使用
+        if data[1] == 0x02:
+            self._salts.setdefault(addr, {})[salt] = time.monotonic() + self.challenge_timeout
+        reply = bytearray(32)
+        reply[0] = 0x02
+        reply[1] = data[1]
+        reply[2:4] = data[2:4]
+        reply[4:8] = salt
+        return reply
+
+    @staticmethod
+    def _fail(code):
+        reply = bytearray(64)
+        reply[0] = 0x05
+        reply[32] = code
+        return reply
+
+    def _on_login(self, data, addr):
+        self._count("login")
+        usr = bytes(data[20:56]).rstrip(b'\x00').decode('ascii', 'replace')
+        mac = bytes(data[320:326])
+        if checksum(bytes(data[:314]) + b'\x01\x26\x07\x11\x00\x00' + mac) != bytes(data[314:318]):
+            return None
+
+        salts = self._salts.get(addr)
+        if not salts:
+            return None
+        salt = next(iter(salts))
+        if self.accounts:
+            if usr not in self.accounts:
+                return self._fail(0x31)
+            pwd = self.accounts[usr].encode('ascii')
+            for candidate in salts:
+                if md5(b'\x03\x01' + candidate + pwd) == bytes(data[4:20]):
+                    salt = candidate
+                    break
+            else:
+                return self._fail(0x33)
+        del salts[salt]
+
+        if usr in self._users:
+            self._drop(self._users[usr])
+        session = EmulatorSession(usr, addr, salt, os.urandom(16))
+        self._sessions[session.auth_info] = session
+        self._users[usr] = session
+        self._fresh.setdefault(addr, []).append(session)
+        logger.info("[Emulator]：%s login from %s...", usr, addr)
+
+        reply = bytearray(64)
+        reply[0] = 0x04
+        reply[23:39] = session.auth_info
+        return reply
+
+    def _on_alive1(self, data, addr):
+        self._count("alive1")
+        session = self._sessions.get(bytes(data[20:36]))
+        if session is None:
+            return None
+        if self.accounts:
+            pwd = self.accounts[session.usr].encode('ascii')
+            if md5(b'\x03\x01' + session.salt + pwd) != bytes(data[1:17]):
+                return None
+        session.last_seen = time.monotonic()
+        reply = bytearray(32)
+        reply[0] = 0x07
+        reply[2] = 0x10
+        return reply
+
+    def _on_alive2(self, data, addr):
+        self._count("alive2")
+        key = bytes(data[16:20])
+        if key == b'\x00\x00\x00\x00':
+            # 第一轮心跳还没有key，交给该地址上最早登录且还没有开始心跳的会话
+            fresh = self._fresh.get(addr)
+            if not fresh:
+                return None
+            session = fresh.pop(0)
+            if not fresh:
+                del self._fresh[addr]
+        else:
+            session = self._keys.pop(key, None)
+            if session is None:
+                return None
+
+        session.last_seen = time.monotonic()
+        session.key = self._new_key()
+        self._keys[session.key] = session
+
+        reply = bytearray(40)
+        reply[0] = 0x07
+        reply[1] = data[1]
+        reply[2:5] = b'\x28\x00\x0b'
+        reply[5] = data[5] + 1
+        reply[16:20] = session.key
+        return reply
+
+    def _new_key(self):
+        # 与其它会话正在使用的key重复时，先到的会话的下一次心跳会找不到自己的会话
+        while True:
+            key = os.urandom(4)
+            if key != b'\x00\x00\x00\x00' and key not in self._keys:
+                return key
+
+    def _on_logout(self, data, addr):
+        self._count("logout")
+        session = self._sessions.get(bytes(data[64:80]))
+        if session is None:
+            return None
+        if self.accounts:
+            pwd = self.accounts[session.usr].encode('ascii')
+            if md5(b'\x06\x01' + session.salt + pwd) != bytes(data[4:20]):
+                return None
+        self._drop(session)
+        logger.info("[Emulator]：%s logout from %s...", session.usr, addr)
+        reply = bytearray(32)
+        reply[0] = 0x04
+        return reply
+
+
+class DrCOMEmulator(object):
+    """
+    本地模拟服务器，可以在前台运行，也可以在后台线程中运行（用于测试与基准）
+    """
+
+    def __init__(self, host="127.0.0.1", port=SERVER_PORT, **options):
+        self.host = host
+        self.port = port
+        self.options = options
+
+        self.address = None
+        self.protocol = None
+        self._loop = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    async def _serve(self):
+        loop = asyncio.get_event_loop()
+        transport, self.protocol = await loop.create_datagram_endpoint(
+            lambda: EmulatorProtocol(**self.options), local_addr=(self.host, self.port))
+        self.address = transport.get_extra_info("sockname")
+        logger.info("[Emulator]：Listening on %s:%s...", *self.address)
+        return transport
+
+    def serve_forever(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        transport = self._loop.run_until_complete(self._serve())
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            transport.close()
+            self._loop.run_until_complete(asyncio.sleep(0))
+            self._loop.close()
+
+    def start(self):
+        """
+        在后台线程中启动模拟服务器
+        :return: 实际监听的地址
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="DrCOMEmulator", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self.address
+
+    def stop(self):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m drcom.emulator", description="本地Dr.COM认证服务器模拟器")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=SERVER_PORT, help="监听端口")
+    parser.add_argument("--account", action="append", default=[], metavar="USR:PWD",
+                        help="允许登录的账号，可以重复指定；不指定时接受任意账号")
+    parser.add_argument("--session-timeout", type=float, default=180, help="会话超时时间（秒）")
+    parser.add_argument("--challenge-timeout", type=float, default=30, help="salt有效期（秒）")
+    parser.add_argument("--loss", type=float, default=0.0, help="模拟丢包的概率")
+    parser.add_argument("--delay", type=float, default=0.0, help="模拟返回延迟（秒）")
+    args = parser.parse_args(argv)
+    setup()
+
+    accounts = dict(account.split(":", 1) for account in args.account)
+    emulator = DrCOMEmulator(args.host, args.port, accounts=accounts,
+                             session_timeout=args.session_timeout, challenge_timeout=args.challenge_timeout,
+                             loss=args.loss, delay=args.delay)
+    try:
+        emulator.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+图形界面的日志面板
+
+LogModel 是固定容量的环形缓冲区，超出容量时丢弃最早的行，长时间运行内存不增长。
+append() 可以在任意线程中调用，消息经由排队连接的信号进入界面线程的待显示队列，
+每 interval 毫秒最多合并成一次插入（以及一次删除），视图的重绘次数与消息数量无关。
+LogHandler 把 drcom 日志（重传、超时等）同样写入面板
+"""
+
+import time
+import logging
+import collections
+
+from drcom.configs.settings import LOG_VIEW_LINES
+from drcom.configs.settings import LOG_VIEW_INTERVAL
+
+from PySide2 import QtCore
+
+
+class LogModel(QtCore.QAbstractListModel):
+    """
+    只在界面线程中修改，其它线程通过 append() 发送消息
+    """
+    appended = QtCore.Signal(str)
+
+    def __init__(self, capacity=LOG_VIEW_LINES, interval=LOG_VIEW_INTERVAL, parent=None):
+        """
+        :param capacity: 保留的行数
+        :param interval: 两次刷新之间的最短间隔（毫秒）
+        :param parent:
+        """
+        super(LogModel, self).__init__(parent)
+        self.capacity = capacity
+        self._lines = collections.deque(maxlen=capacity)
+        # 一次刷新最多显示capacity行，更早的消息在进入待显示队列时就被丢弃
+        self._pending = collections.deque(maxlen=capacity)
+        self.received = 0
+        self.flushes = 0
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+        # 跨线程发送时Qt默认也会排队，这里显式指定，界面线程中调用时同样延迟到下一次刷新
+        self.appended.connect(self._enqueue, QtCore.Qt.QueuedConnection)
+
+    def append(self, msg):
+        """
+        添加一行，可以在任意线程中调用
+        :param msg:
+        :return:
+        """
+        self.appended.emit("{} {}".format(time.strftime("%H:%M:%S", time.localtime()), msg))
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._lines)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole, QtCore.Qt.ToolTipRole):
+            return None
+        row = index.row()
+        if row >= len(self._lines):
+            return None
+        return self._lines[row]
+
+    @QtCore.Slot(str)
+    def _enqueue(self, line):
+        self.received += 1
+        self._pending.append(line)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    @QtCore.Slot()
+    def flush(self):
+        """
+        把待显示的消息一次插入模型，超出容量的最早的行一次删除
+        :return:
+        """
+        if not self._pending:
+            return
+        batch = list(self._pending)
+        self._pending.clear()
+        self.flushes += 1
+
+        overflow = len(self._lines) + len(batch) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._lines.popleft()
+            self.endRemoveRows()
+
+        first = len(self._lines)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(batch) - 1)
+        self._lines.extend(batch)
+        self.endInsertRows()
+
+    def clear(self):
+        self._pending.clear()
+        self.beginResetModel()
+        self._lines.clear()
+        self.endResetModel()
+
+
+class LogHandler(logging.Handler):
+    """
+    把日志记录写入 LogModel，在记录日志的线程中调用，只发送信号
+    """
+
+    def __init__(self, model, level=logging.INFO):
+        super(LogHandler, self).__init__(level)
+        self.model = model
+
+    def emit(self, record):
+        try:
+            self.model.append(record.getMessage())
+        except Exception:
+            self.handleError(record)
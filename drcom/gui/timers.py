@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+图形界面的心跳、连通性检测与重新检测认证服务器的定时器
+
+SessionTimers 持有全部QTimer，每个定时器的timeout只在创建时连接一次，处理函数由构造参数给出，
+重新登录只是重新启动定时器，不会重复连接，也就不会一次到期调用多次处理函数。
+定时器都是单次的：处理函数 handler(generation) 启动后台任务，任务结束时调用 done(name, generation) 之后才重新计时，
+同一个定时器的任务不会重叠；任务尚未结束时到期计入 coalesced，不再调用处理函数。
+stop() 之后上一次会话遗留的任务调用的 done() 因为generation不同而被忽略
+ticks/fired/coalesced 记录每个定时器的到期次数、调用处理函数的次数与合并的次数
+"""
+
+from drcom.main.scheduler import Cadence
+
+from PySide2 import QtCore
+
+
+class SessionTimers(QtCore.QObject):
+    """
+    心跳（ALIVE）按Cadence的绝对截止时间触发，连通性检测（CHECK）在上一次检测结束之后间隔固定时间触发，
+    重新检测认证服务器（DISCOVER）在 start_discover 给出的延迟之后触发一次
+    只能在界面线程中使用
+    """
+    ALIVE = "alive"
+    CHECK = "check"
+    DISCOVER = "discover"
+    NAMES = (ALIVE, CHECK, DISCOVER)
+
+    def __init__(self, on_alive, on_check, metrics, parent=None, on_discover=None):
+        """
+        :param on_alive: 心跳到期时调用 on_alive(generation)，任务结束后必须调用 done(ALIVE, generation)
+        :param on_check: 检测到期时调用 on_check(generation)，任务结束后必须调用 done(CHECK, generation)
+        :param metrics: 记录心跳延迟的 drcom.main.metrics.Metrics
+        :param parent:
+        :param on_discover: 重新检测的延迟到期时调用 on_discover(generation)，只触发一次，不需要调用 done
+        """
+        super(SessionTimers, self).__init__(parent)
+        self.metrics = metrics
+        self.cadence = None
+        # CHECK 与 DISCOVER 的间隔（秒），没有启动时为None
+        self.intervals = {self.CHECK: None, self.DISCOVER: None}
+
+        self._handlers = {self.ALIVE: on_alive, self.CHECK: on_check, self.DISCOVER: on_discover}
+        self._timers = {}
+        # 每次启动或停止时加一，用来识别上一次会话遗留的任务
+        self._generation = {}
+        # 正在运行的任务启动时的generation，没有任务时为None
+        self._busy = {}
+        self.ticks = {}
+        self.fired = {}
+        self.coalesced = {}
+        for name, slot in ((self.ALIVE, self._on_alive), (self.CHECK, self._on_check),
+                           (self.DISCOVER, self._on_discover)):
+            timer = QtCore.QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(slot)
+            self._timers[name] = timer
+            self._generation[name] = 0
+            self._busy[name] = None
+            self.ticks[name] = self.fired[name] = self.coalesced[name] = 0
+        self._timers[self.ALIVE].setTimerType(QtCore.Qt.PreciseTimer)
+
+    def start_alive(self, interval):
+        """
+        :param interval: 心跳间隔（秒）
+        :return:
+        """
+        self._generation[self.ALIVE] += 1
+        self.cadence = Cadence(interval)
+        self._arm(self.ALIVE)
+
+    def start_check(self, interval):
+        """
+        :param interval: 检测间隔（秒）
+        :return:
+        """
+        self._generation[self.CHECK] += 1
+        self.intervals[self.CHECK] = interval
+        self._arm(self.CHECK)
+
+    def start_discover(self, delay):
+        """
+        :param delay: 距离重新检测的秒数，已经计时时重新计时
+        :return:
+        """
+        self._generation[self.DISCOVER] += 1
+        self.intervals[self.DISCOVER] = delay
+        self._arm(self.DISCOVER)
+
+    def stop(self, name=None):
+        """
+        :param name: ALIVE、CHECK 或 DISCOVER，为None时全部停止
+        :return:
+        """
+        for key in self.NAMES if name is None else (name,):
+            self._generation[key] += 1
+            self._busy[key] = None
+            self._timers[key].stop()
+            if key == self.ALIVE:
+                self.cadence = None
+            else:
+                self.intervals[key] = None
+
+    def active(self, name):
+        return (self.cadence if name == self.ALIVE else self.intervals[name]) is not None
+
+    def busy(self, name):
+        return self._busy[name] is not None
+
+    def done(self, name, generation):
+        """
+        到期时启动的任务结束，按下一次的到期时间重新计时
+        :param name:
+        :param generation: 处理函数收到的generation
+        :return:
+        """
+        if self._busy[name] != generation:
+            return
+        self._busy[name] = None
+        if not self.active(name):
+            return
+        # 任务运行期间重新启动过的定时器从新的节奏开始，不跳过第一轮
+        if name == self.ALIVE and generation == self._generation[name]:
+            self.cadence.advance()
+        self._arm(name)
+
+    def stats(self):
+        return {"ticks": dict(self.ticks), "fired": dict(self.fired), "coalesced": dict(self.coalesced)}
+
+    def _arm(self, name):
+        # 任务尚未结束时不计时，由 done() 重新启动
+        if self._busy[name] is not None:
+            return
+        delay = self.cadence.delay() if name == self.ALIVE else self.intervals[name]
+        self._timers[name].start(int(delay * 1000))
+
+    def _fire(self, name):
+        self.ticks[name] += 1
+        if self._busy[name] is not None:
+            self.coalesced[name] += 1
+            return
+        if not self.active(name):
+            return
+        generation = self._busy[name] = self._generation[name]
+        if name == self.ALIVE:
+            self.cadence.begin(self.metrics)
+        elif name == self.DISCOVER:
+            # 单次触发
+            self._busy[name] = None
+            self.intervals[name] = None
+        self.fired[name] += 1
+        self._handlers[name](generation)
+
+    @QtCore.Slot()
+    def _on_alive(self):
+        self._fire(self.ALIVE)
+
+    @QtCore.Slot()
+    def _on_check(self):
+        self._fire(self.CHECK)
+
+    @QtCore.Slot()
+    def _on_discover(self):
+        self._fire(self.DISCOVER)
@@ -9,16 +9,30 @@ import os
 import sys
 import json
 import time
-import socket
+import functools
 
 from drcom.main.utils import print_bytes
 
 from drcom.main.client import DrCOMClient
-from drcom.main.excepts import DrCOMException
-from drcom.main.excepts import TimeoutException
+from drcom.main.metrics import serve
+from drcom.main.capture import dump_on_error
+from drcom.main.capture import install_signal
+from drcom.main.logger import logger
 from drcom.main.threads import ClientCheckThreads
 from drcom.main.threads import ClientLoginThreads
 from drcom.main.threads import ClientAliveThreads
+from drcom.main.threads import ClientRetryThreads
+from drcom.main.threads import ClientLogoutThreads
+from drcom.main.threads import ClientReloginThreads
+from drcom.main.threads import ExecSignal
+from drcom.main.watcher import LinkWatcher
+from drcom.gui.timers import SessionTimers
+from drcom.gui.logview import LogModel
+from drcom.gui.logview import LogHandler
+from drcom.configs.settings import LINK_WATCH
+from drcom.configs.settings import SHUTDOWN_DEADLINE
+from drcom.configs.settings import DISCOVERY_RETRY_MIN
+from drcom.configs.settings import DISCOVERY_RETRY_MAX
 
 from PySide2 import QtCore, QtGui, QtWidgets
 
@@ -40,43 +54,207 @@ class QVLine(QtWidgets.QFrame):
 
 
 class MainWindow(QtWidgets.QMainWindow):
+    """
+    界面的状态只在界面线程中改变：后台任务通过 result/error 信号报告结果，
+    对应的槽函数切换状态，draw() 连接到 stateChanged 信号，根据状态更新控件
+    登出、连通性检测与断线重连作为可取消的后台任务（self.job）运行，同一时间最多一个，
+    client.cancel() 让任务中正在等待返回的请求立即结束
+    构造时只创建控件，show() 之后调用 start() 在事件循环中读取用户配置、启动后台服务并检测认证服务器
+    """
+    UNREADY = "unready"  # 没有检测到认证服务器
+    PREPARING = "preparing"  # 正在检测认证服务器
+    READY = "ready"  # 可以登录
+    LOGGING_IN = "logging_in"  # 正在登录
+    ONLINE = "online"  # 已经登录，心跳Timer运行中
+    LOGGING_OUT = "logging_out"  # 正在登出
+    RELOGGING = "relogging"  # 检测到断线，正在登出、检测并重新登录
+
+    stateChanged = QtCore.Signal(str)
 
     def __init__(self):
         super().__init__()
         self.client = DrCOMClient()
+        self.state = self.UNREADY
+        # 检测完成之后是否自动登录（网卡变化之后重新登录）
+        self.relogin_pending = False
+        # 正在运行的后台任务的信号，任务结束（state信号）时清空
+        self.job = None
+        self.started = False
+        self.closing = False
+        # 检测认证服务器失败之后下一次自动重试的等待时间（秒）
+        self.discover_delay = DISCOVERY_RETRY_MIN
+        self.stateChanged.connect(self.draw)
+
+        # 日志面板的环形缓冲区，界面线程与drcom日志（经由LogHandler）都写入这里
+        self.log_model = LogModel(parent=self)
+        self.log_handler = LogHandler(self.log_model)
+        logger.addHandler(self.log_handler)
 
         self._set_window_UI()
-        self._load_user_config()
+        self.draw(self.state)
 
-        self.alive_Timer = QtCore.QTimer()
+        # 心跳、连通性检测与重新检测的定时器，处理函数只连接这一次，重新登录时重新启动定时器
+        self.timers = SessionTimers(self._keep_alive, self._retry_login, self.client.metrics, self,
+                                    on_discover=self._rediscover)
         self.alive_interval = 10 * 1000
-        self.sending_alive_pkg = False
-
-        self.retry_Timer = QtCore.QTimer()
-        self.retry_interval = 10 * 1000
 
         # 工作线程池
         self.threads_pool = QtCore.QThreadPool()
         # 默认线程超时时间设置为10秒
         self.threads_pool.setExpiryTimeout(10000)
 
-        # 进行客户端初始化
+        # 网卡与地址变化的通知从监听线程经由信号转到界面线程处理
+        self.link_signals = ExecSignal()
+        self.link_signals.result.connect(self._on_link_change)
+        self.link_watcher = LinkWatcher(lambda identity, reason: self.link_signals.result.emit((identity, reason)))
+
+        self.metrics_server = None
+
+    def start(self):
+        """
+        窗口显示之后调用，初始化推迟到事件循环的下一轮，窗口先完成绘制并可以操作
+        :return:
+        """
+        if self.started:
+            return
+        self.started = True
         self.logger("正在初始化校园网接入准备")
-        QtWidgets.QApplication.processEvents()
+        QtCore.QTimer.singleShot(0, self._start)
+
+    @QtCore.Slot()
+    def _start(self):
+        if self.closing:
+            return
+        self._load_user_config()
+
+        if LINK_WATCH:
+            self.link_watcher.start()
+
+        # METRICS_PORT 不为0时提供运行指标
+        self.metrics_server = serve()
+
+        # CAPTURE_PACKETS 不为0时，出错或收到SIGUSR1时写pcap文件
+        install_signal()
+
+        self.load()
 
     @QtCore.Slot(object)
     def on_worker_error(self, e):
         self.logger(e.info)
         if e.last_pkg:
             print_bytes(e.last_pkg)
+        dump_on_error("gui")
 
     @QtCore.Slot(object)
     def on_worker_result(self, result):
         self.logger(result.msg)
 
+    def set_state(self, state):
+        if state != self.state:
+            self.state = state
+            self.stateChanged.emit(state)
+
+    @QtCore.Slot(object)
+    def on_prepared(self, result):
+        if self.state != self.PREPARING:
+            return
+        self.on_worker_result(result)
+        self.discover_delay = DISCOVERY_RETRY_MIN
+        self.set_state(self.READY)
+        if self.relogin_pending:
+            self.relogin_pending = False
+            self.login()
+
+    @QtCore.Slot(object)
+    def on_prepare_failed(self, e):
+        if self.state != self.PREPARING:
+            return
+        self.on_worker_error(e)
+        # relogin_pending 保留，断线之后重新检测成功时仍然自动登录
+        self.set_state(self.UNREADY)
+        if not self.closing:
+            # 按指数退避自动重试，网卡或地址变化时（_on_link_change）立即重试
+            self.logger("{}秒之后重新检测认证服务器".format(self.discover_delay))
+            self.timers.start_discover(self.discover_delay)
+            self.discover_delay = min(self.discover_delay * 2, DISCOVERY_RETRY_MAX)
+
+    @QtCore.Slot(object)
+    def on_logged_in(self, result):
+        if self.state != self.LOGGING_IN:
+            return
+        self.on_worker_result(result)
+        self.set_state(self.ONLINE)
+        # 启动心跳Timer
+        self.alive()
+        # if self.retryCheckBox.isChecked():
+        #     # 启动守护Timer
+        #     self.retry()
+        self._save_user_config()
+
+    @QtCore.Slot(object)
+    def on_login_failed(self, e):
+        if self.state != self.LOGGING_IN:
+            return
+        self.on_worker_error(e)
+        self.set_state(self.READY)
+
+    @QtCore.Slot(object)
+    def on_logged_out(self, result):
+        if self.state != self.LOGGING_OUT:
+            return
+        self.on_worker_result(result)
+        self.set_state(self.READY)
+
+    @QtCore.Slot(object)
+    def on_logout_failed(self, e):
+        if self.state != self.LOGGING_OUT:
+            return
+        self.on_worker_error(e)
+        # 心跳已经停止，服务器会在超时之后结束会话
+        self.client.session.login_flag = False
+        self.set_state(self.READY)
+
+    @QtCore.Slot(object)
+    def on_probe_failed(self, e):
+        if self.state != self.ONLINE:
+            return
+        self.logger(e.info)
+        self.client.metrics.incr("relogins")
+        self.timers.stop(SessionTimers.ALIVE)
+        self.set_state(self.RELOGGING)
+        worker = ClientReloginThreads(self.client)
+        worker.signals.progress.connect(self.logger)
+        worker.signals.error.connect(self.on_relogin_failed)
+        worker.signals.result.connect(self.on_relogged_in)
+        self._start_job(worker)
+
+    @QtCore.Slot(object)
+    def on_relogged_in(self, result):
+        if self.state != self.RELOGGING:
+            return
+        self.on_worker_result(result)
+        self.set_state(self.ONLINE)
+        self.alive()
+
+    @QtCore.Slot(object)
+    def on_relogin_failed(self, e):
+        if self.state != self.RELOGGING:
+            return
+        self.on_worker_error(e)
+        self.set_state(self.READY if self.client.session.ready_flag else self.UNREADY)
+
     @QtCore.Slot()
-    def on_sending_alive_pkg(self):
-        self.sending_alive_pkg = False
+    def on_job_finished(self):
+        if self.sender() is not self.job:
+            return
+        self.job = None
+        if self.closing:
+            return
+        # 被取消的任务结束之后恢复客户端，之后的请求正常发送
+        if self.client.interrupt:
+            self.client.resume()
+        if self.relogin_pending and self.state == self.UNREADY:
+            self.load()
 
     def _set_window_UI(self):
         self.setObjectName("MainWindow")
@@ -84,6 +262,17 @@ class MainWindow(QtWidgets.QMainWindow):
         self.setWindowFlags(QtGui.Qt.WindowCloseButtonHint)
         self._set_center_position()
         self._set_central_widget()
+        self._set_progress_widget()
+
+    def _set_progress_widget(self):
+        # 后台任务运行期间在状态栏显示忙碌指示
+        self.progressBar = QtWidgets.QProgressBar()
+        self.progressBar.setObjectName("ProgressBar")
+        self.progressBar.setRange(0, 0)
+        self.progressBar.setFixedSize(50, 10)
+        self.progressBar.setTextVisible(False)
+        self.progressBar.hide()
+        self.statusBar().addPermanentWidget(self.progressBar)
 
     def _set_center_position(self):
         availableWidth = QtWidgets.QDesktopWidget().width()
@@ -91,9 +280,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
         # 计算出窗口左上角的坐标
         x = (availableWidth - 280) / 2
-        y = (availableHeight - 360) / 2
-        self.setGeometry(QtCore.QRect(x, y, 280, 350))
-        self.setFixedSize(280, 350)  # cannot resize window size
+        y = (availableHeight - 460) / 2
+        self.setGeometry(QtCore.QRect(x, y, 280, 450))
+        self.setFixedSize(280, 450)  # cannot resize window size
 
     def _set_central_widget(self):
         centralWidget = QtWidgets.QWidget()
@@ -103,7 +292,8 @@ class MainWindow(QtWidgets.QMainWindow):
         centralWidgetLayout.addWidget(QHLine())
         centralWidgetLayout.addWidget(self._set_loginForm_widget())
         centralWidgetLayout.addWidget(self._set_optionForm_widget())
-        centralWidgetLayout.addSpacing(40)
+        centralWidgetLayout.addWidget(self._set_logView_widget())
+        centralWidgetLayout.addSpacing(10)
         centralWidgetLayout.setMargin(2)
         centralWidgetLayout.setAlignment(QtGui.Qt.AlignCenter)
         centralWidget.setLayout(centralWidgetLayout)
@@ -231,7 +421,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.loginButton = QtWidgets.QPushButton("登录")
         self.loginButton.setObjectName("LoginButton")
 
-        self.loginButton.clicked.connect(self.login)
+        self.loginButton.clicked.connect(self._on_login_button)
 
         optionFormLayout.addWidget(self.loginButton)
 
@@ -240,6 +430,19 @@ class MainWindow(QtWidgets.QMainWindow):
         optionForm.setLayout(optionFormLayout)
         return optionForm
 
+    def _set_logView_widget(self):
+        self.logView = QtWidgets.QListView()
+        self.logView.setObjectName("LogView")
+        self.logView.setFixedSize(270, 110)
+        # 行高相同，插入时不需要逐行计算布局
+        self.logView.setUniformItemSizes(True)
+        self.logView.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.logView.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.logView.setModel(self.log_model)
+        # 每次刷新只插入一批，滚动一次
+        self.log_model.rowsInserted.connect(self.logView.scrollToBottom)
+        return self.logView
+
     def _load_user_config(self):
         currentPath = QtCore.QDir.homePath()
         if sys.platform in ["linux", "darwin"]:
@@ -250,17 +453,23 @@ class MainWindow(QtWidgets.QMainWindow):
         if not os.path.exists(settingPath):
             return
 
-        with open(settingPath, "r") as userSetting:
-            setting = json.loads(userSetting.read())
+        try:
+            with open(settingPath, "r") as userSetting:
+                setting = json.loads(userSetting.read())
             self.retryTimesSpinBox.setValue(setting["relogin_times"])
             self.retryCheckSpinBox.setValue(setting["relogin_check"])
             self.retryCheckBox.setChecked(setting["relogin_flag"])
             self.remPwdCheckBox.setChecked(setting["rem_pwd"])
             if setting["rem_pwd"]:
-                self.usrLineEdit.setText(setting["usr"])
-                self.pwdLineEdit.setText(setting["pwd"])
+                # 用户已经开始输入时不覆盖
+                if not self.usrLineEdit.text():
+                    self.usrLineEdit.setText(setting["usr"])
+                if not self.pwdLineEdit.text():
+                    self.pwdLineEdit.setText(setting["pwd"])
+        except (OSError, ValueError, KeyError) as e:
+            self.logger("无法读取用户配置: {}".format(e))
 
-        self.draw(state=0)
+        self.draw(self.state)
 
     def _save_user_config(self):
         currentPath = QtCore.QDir.homePath()
@@ -280,130 +489,186 @@ class MainWindow(QtWidgets.QMainWindow):
         with open(settingPath, 'w') as userSetting:
             userSetting.write(json.dumps(setting, sort_keys=True, indent=4))
 
-    def _keep_alive(self):
-        if not self.sending_alive_pkg:
-            self.logger("PING Server: {} ".format(time.strftime("%H:%M:%S", time.localtime())))
-            worker = ClientAliveThreads(self.client)
-            worker.setAutoDelete(True)
-            worker.signals.error.connect(self.on_worker_error)
-            worker.signals.state.connect(self.on_sending_alive_pkg)
-            self.threads_pool.start(worker)
-            self.sending_alive_pkg = True
+    def _keep_alive(self, generation):
+        """
+        心跳定时器到期，在后台发送一轮心跳，结束之后由 timers.done 按下一轮的截止时间重新计时
+        :param generation:
+        """
+        self.logger("PING Server: {} ".format(time.strftime("%H:%M:%S", time.localtime())))
+        worker = ClientAliveThreads(self.client)
+        worker.setAutoDelete(True)
+        worker.signals.error.connect(self.on_worker_error)
+        worker.signals.state.connect(functools.partial(self.timers.done, SessionTimers.ALIVE, generation))
+        self.threads_pool.start(worker)
 
-    def _retry_login(self):
+    def _rediscover(self, generation):
         """
-        判断网络连通性的方法
-        Host: 114.114.114.114
-        OpenPort: 53/tcp
-        Service: domain (DNS/TCP)
+        重新检测认证服务器的定时器到期
+        :param generation:
         """
-        try:
-            socket.setdefaulttimeout(1)
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect(("114.114.114.114", 53))
-            return True
-        except socket.error:
-            self.logger("[Magic-Dr.COM::_retry_login]: Network connection seems broken...")
-            self.alive_Timer.stop()
-            self.logout()
-            self.login()
-            self.alive_Timer.start(self.alive_interval)
-
-    def draw(self, state: bool):
-        if state:
-            self.usrLineEdit.setEnabled(True)
-            self.pwdLineEdit.setEnabled(True)
-            self.remPwdCheckBox.setEnabled(True)
-            self.retryCheckBox.setEnabled(True)
-            self.retryTimesSpinBox.setEnabled(True)
-            self.retryCheckSpinBox.setEnabled(True)
+        self.load()
+
+    def _retry_login(self, generation):
+        """
+        在后台判断网络连通性，同时检测PROBE_TARGETS中的目标，结果与其它调用者共用
+        断线时由 on_probe_failed 在后台登出并重新登录
+        :param generation:
+        """
+        if self.state != self.ONLINE or self.job is not None:
+            self.timers.done(SessionTimers.CHECK, generation)
+            return
+        worker = ClientRetryThreads(self.client)
+        worker.signals.error.connect(self.on_probe_failed)
+        worker.signals.state.connect(functools.partial(self.timers.done, SessionTimers.CHECK, generation))
+        self._start_job(worker)
+
+    def _start_job(self, worker):
+        worker.setAutoDelete(True)
+        self.job = worker.signals
+        worker.signals.state.connect(self.on_job_finished)
+        self.threads_pool.start(worker)
+
+    def cancel(self):
+        """
+        取消正在运行的后台任务，结果由任务的 error 信号与 on_job_finished 处理
+        :return:
+        """
+        if self.job is not None:
+            self.client.cancel()
+
+    @QtCore.Slot(object)
+    def _on_link_change(self, change):
+        """
+        网线拔插或IP变化时立即重新准备并登录
+        :param change: (identity, reason)
+        """
+        identity, reason = change
+        if self.state == self.UNREADY and not self.client.session.login_flag:
+            # 还没有检测到认证服务器，网络可用时立即重新检测
+            if identity[2] and self.job is None:
+                self.logger("[Magic-Dr.COM::_on_link_change]: {}, detecting server...".format(reason))
+                self.discover_delay = DISCOVERY_RETRY_MIN
+                self.load()
+            return
+        if not self.client.session.login_flag or self.state == self.LOGGING_OUT:
+            return
+        if not identity[2]:
+            self.logger("[Magic-Dr.COM::_on_link_change]: Network is unavailable ({})...".format(reason))
+            return
+        self.logger("[Magic-Dr.COM::_on_link_change]: {}, relogin...".format(reason))
+        self.client.metrics.incr("relogins")
+        self.timers.stop(SessionTimers.ALIVE)
+        self.client.session.login_flag = False
+        self.set_state(self.UNREADY)
+        # 检测完成（on_prepared）之后自动登录
+        self.relogin_pending = True
+        if self.job is not None:
+            # 正在进行的检测或重连已经没有意义，取消之后由 on_job_finished 重新检测
+            self.cancel()
         else:
-            self.usrLineEdit.setEnabled(False)
-            self.pwdLineEdit.setEnabled(False)
-            self.remPwdCheckBox.setEnabled(False)
-            self.retryCheckBox.setEnabled(False)
-            self.retryTimesSpinBox.setEnabled(False)
-            self.retryCheckSpinBox.setEnabled(False)
-
-        if self.client.ready_flag:
-            self.loginButton.setEnabled(True)
-            if self.client.login_flag:
-                self.loginButton.setText("注销")
-                self.loginButton.clicked.disconnect()
-                self.loginButton.clicked.connect(self.logout)
-            else:
-                self.loginButton.setText("登录")
-                self.loginButton.clicked.disconnect()
-                self.loginButton.clicked.connect(self.login)
+            self.load()
+
+    def draw(self, state):
+        """
+        根据界面状态更新控件，登录之前（包括检测认证服务器期间）都可以修改账号与选项
+        :param state:
+        :return:
+        """
+        editable = state in (self.UNREADY, self.PREPARING, self.READY)
+        self.usrLineEdit.setEnabled(editable)
+        self.pwdLineEdit.setEnabled(editable)
+        self.remPwdCheckBox.setEnabled(editable)
+        self.retryCheckBox.setEnabled(editable)
+        self.retryTimesSpinBox.setEnabled(editable)
+        self.retryCheckSpinBox.setEnabled(editable)
+
+        self.loginButton.setEnabled(state in (self.READY, self.ONLINE, self.RELOGGING))
+        if state == self.ONLINE:
+            self.loginButton.setText("注销")
+        elif state == self.PREPARING:
+            self.loginButton.setText("正在检测")
+        elif state == self.LOGGING_IN:
+            self.loginButton.setText("正在登录")
+        elif state == self.LOGGING_OUT:
+            self.loginButton.setText("正在注销")
+        elif state == self.RELOGGING:
+            self.loginButton.setText("取消重连")
         else:
-            self.loginButton.setEnabled(False)
+            self.loginButton.setText("登录")
+        self.progressBar.setVisible(state in (self.PREPARING, self.LOGGING_IN, self.LOGGING_OUT, self.RELOGGING))
+
+    def _on_login_button(self):
+        if self.state in (self.ONLINE, self.RELOGGING):
+            self.logout()
+        elif self.state == self.READY:
+            self.login()
 
     def load(self):
+        """
+        在后台检测认证服务器，结果由 on_prepared/on_prepare_failed 处理，不阻塞界面
+        :return:
+        """
+        if self.state != self.UNREADY or self.job is not None:
+            return
+        self.timers.stop(SessionTimers.DISCOVER)
+        self.logger("正在检测认证服务器")
+        self.set_state(self.PREPARING)
         worker = ClientCheckThreads(self.client)
         worker.setAutoDelete(True)
-        worker.signals.error.connect(self.on_worker_error)
-        worker.signals.result.connect(self.on_worker_result)
+        worker.signals.error.connect(self.on_prepare_failed)
+        worker.signals.result.connect(self.on_prepared)
         self.threads_pool.start(worker)
-        while self.threads_pool.activeThreadCount() != 0:
-            time.sleep(0.5)
-            QtWidgets.QApplication.processEvents()
-
-        self.draw(state=self.client.ready_flag)
 
     def login(self):
-        self.client.usr = self.usrLineEdit.text()
-        self.client.pwd = self.pwdLineEdit.text()
-        try:
-            worker = ClientLoginThreads(self.client)
-            worker.setAutoDelete(True)
-            worker.signals.error.connect(self.on_worker_error)
-            worker.signals.result.connect(self.on_worker_result)
-            self.threads_pool.start(worker)
-            while self.threads_pool.activeThreadCount() != 0:
-                time.sleep(0.5)
-                QtWidgets.QApplication.processEvents()
-
-            self.draw(state=0)
-            self._keep_alive()
-            # 启动心跳Timer
-            self.alive()
-            # if self.retryCheckBox.isChecked():
-            #     # 启动守护Timer
-            #     self.retry()
-            self._save_user_config()
-        except (DrCOMException, TimeoutException) as e:
-            self.logger(e.info)
+        """
+        在后台登录，结果由 on_logged_in/on_login_failed 处理，不阻塞界面
+        :return:
+        """
+        if self.state != self.READY:
+            return
+        self.client.session.usr = self.usrLineEdit.text()
+        self.client.session.pwd = self.pwdLineEdit.text()
+        self.set_state(self.LOGGING_IN)
+        worker = ClientLoginThreads(self.client)
+        worker.setAutoDelete(True)
+        worker.signals.error.connect(self.on_login_failed)
+        worker.signals.result.connect(self.on_logged_in)
+        self.threads_pool.start(worker)
 
     def alive(self):
-        self.alive_Timer.timeout.connect(self._keep_alive)
-        self.alive_Timer.start(self.alive_interval)
+        self.timers.start_alive(self.alive_interval / 1000)
 
     def retry(self):
-        self.retry_Timer.timeout.connect(self._retry_login)
-        self.retry_Timer.start(self.retryCheckSpinBox.value() * 1000)
+        self.timers.start_check(self.retryCheckSpinBox.value())
 
     def logout(self):
-        # 第一次清理线程池
-        self.threads_pool.clear()
-        # 把定时器清理掉
-        if self.alive_Timer.isActive():
-            self.alive_Timer.stop()
-        if self.retry_Timer.isActive():
-            self.retry_Timer.stop()
-        # 第二次清理线程池
+        """
+        在后台登出，结果由 on_logged_out/on_logout_failed 处理，不阻塞界面；断线重连时取消重连
+        :return:
+        """
+        if self.state == self.RELOGGING:
+            self.cancel()
+            return
+        if self.state != self.ONLINE:
+            return
+        # 正在进行的连通性检测的结果不再需要（on_probe_failed 只在 ONLINE 时处理）
+        self.job = None
+        # 清理尚未开始的心跳任务与定时器
         self.threads_pool.clear()
-        """以上是为了避免残留线程导致程序退出异常"""
-        try:
-            self.client.logout()
-        except (DrCOMException, TimeoutException) as e:
-            self.logger(e.info)
-        else:
-            self.logger("已经断开与校园网的链接")
-            self.draw(state=1)
+        self.timers.stop()
+        self.set_state(self.LOGGING_OUT)
+        worker = ClientLogoutThreads(self.client)
+        worker.signals.error.connect(self.on_logout_failed)
+        worker.signals.result.connect(self.on_logged_out)
+        self._start_job(worker)
 
     def logger(self, msg):
-        self.statusBar().clearMessage()
+        """
+        状态栏显示最新的一条，日志面板保留最近的 LOG_VIEW_LINES 条
+        :param msg:
+        """
         self.statusBar().showMessage(f"Magic-Dr.COM:: {msg} ~")
-        QtWidgets.QApplication.processEvents()
+        self.log_model.append(msg)
 
     @staticmethod
     def info(msg):
@@ -414,13 +679,42 @@ class MainWindow(QtWidgets.QMainWindow):
         message.setDefaultButton(QtWidgets.QMessageBox.Yes)
         message.exec_()
 
+    def shutdown(self, deadline=SHUTDOWN_DEADLINE):
+        """
+        退出前登出，最多等待 deadline 秒，服务器没有返回时取消后台任务直接退出
+        :param deadline: 秒
+        :return:
+        """
+        end = time.monotonic() + deadline
+        self.closing = True
+        logger.removeHandler(self.log_handler)
+        self.link_watcher.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.threads_pool.clear()
+        self.timers.stop()
+        if self.job is not None:
+            # 正在进行的检测或重连不再需要
+            self.client.cancel()
+            self.threads_pool.waitForDone(500)
+            self.client.resume()
+        if self.client.session.login_flag:
+            self.logger("正在断开与校园网的链接")
+            self.set_state(self.LOGGING_OUT)
+            worker = ClientLogoutThreads(self.client)
+            worker.setAutoDelete(True)
+            self.threads_pool.start(worker)
+        if not self.threads_pool.waitForDone(max(int((end - time.monotonic()) * 1000), 0)):
+            self.client.cancel()
+            self.threads_pool.waitForDone(500)
+
     def closeEvent(self, event: QtGui.QCloseEvent):
         description = "是否退出当前程序?"
         reply = QtWidgets.QMessageBox.warning(self, "警告", description,
                                               QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
                                               QtWidgets.QMessageBox.No)
         if reply == QtWidgets.QMessageBox.Yes:
-            self.logout()
+            self.shutdown()
             event.accept()
         else:
             event.ignore()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import sys
+import asyncio
+import collections
+
+from drcom.main.core import DrCOMCore
+from drcom.main.core import DrCOMResponse
+from drcom.main.dispatch import SHARED
+from drcom.main.dispatch import Dispatcher
+from drcom.main.dispatch import request_key
+from drcom.main.discovery import Discovery
+from drcom.main.scheduler import Cadence
+from drcom.main.metrics import serve
+from drcom.main.capture import DEFAULT_CAPTURE
+from drcom.main.capture import dump_on_error
+from drcom.main.capture import install_signal
+from drcom.main.replies import AliveReply
+from drcom.main.replies import LoginReply
+from drcom.main.replies import LogoutReply
+from drcom.main.replies import ChallengeReply
+from drcom.main.logger import logger
+from drcom.main.logger import warning_limited
+from drcom.main.logger import setup
+from drcom.main.excepts import DrCOMException
+from drcom.main.excepts import TimeoutException
+from drcom.configs.settings import *
+
+
+# 超时计时比计划晚到超过该值（秒）时说明事件循环被阻塞，重新计时
+LOOP_LAG = 0.05
+
+
+def _expire(waiter):
+    if not waiter.done():
+        waiter.set_exception(asyncio.TimeoutError())
+
+
+class _Deadline(object):
+    """
+    请求的超时计时，不使用asyncio.wait_for，避免每个请求额外创建任务，也避免取消信号被吞掉
+    事件循环被阻塞（例如同时启动大量会话的心跳）时计时会晚到，阻塞期间到达的返回还在socket缓冲区中，
+    而 datagram_received 每轮事件循环只处理一个数据包；晚到时重新计时，不把已经到达的返回当作超时。
+    最多推迟到发送之后 OPERATION_DEADLINE 秒
+    """
+    __slots__ = ("waiter", "timeout", "deadline", "limit", "handle")
+
+    def __init__(self, waiter, timeout):
+        loop = asyncio.get_event_loop()
+        self.waiter = waiter
+        self.timeout = timeout
+        self.deadline = loop.time() + timeout
+        self.limit = self.deadline - timeout + max(timeout, OPERATION_DEADLINE)
+        self.handle = loop.call_at(self.deadline, self._fire)
+
+    def _fire(self):
+        if self.waiter.done():
+            return
+        loop = asyncio.get_event_loop()
+        now = loop.time()
+        if now - self.deadline > LOOP_LAG and now < self.limit:
+            self.deadline = min(now + self.timeout, self.limit)
+            self.handle = loop.call_at(self.deadline, self._fire)
+            return
+        _expire(self.waiter)
+
+    def cancel(self):
+        self.handle.cancel()
+
+
+def _discard(future):
+    """
+    取走不再需要的任务的异常，避免事件循环输出 "exception was never retrieved"
+    """
+    if not future.cancelled():
+        future.exception()
+
+
+class _Unlimited(object):
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *args):
+        return False
+
+
+_UNLIMITED = _Unlimited()
+
+
+class DrCOMProtocol(asyncio.DatagramProtocol):
+    """
+    基于asyncio的UDP协议层
+    收到的数据包按签名交给等待它的请求，没有等待者的数据包直接丢弃
+    签名相同的请求（例如同一服务器上多个会话的登录）按先后顺序排队；
+    SHARED 中的请求（心跳包一）不排队，同时等待的请求按发送顺序依次取得返回
+    capture 不为None时记录收发的全部数据包；
+    window 为 asyncio.Semaphore 时每个等待返回的请求占用一个名额，可以由多个端点共用
+    """
+
+    def __init__(self, capture=None, window=None):
+        self.transport = None
+        self.capture = capture
+        self.window = window
+        self._local = None
+        self._dispatcher = Dispatcher()
+        self._locks = {}
+        # SHARED 请求的等待队列，在等待表中以队列代替单个等待者
+        self._queues = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._local = transport.get_extra_info("sockname")
+
+    def datagram_received(self, data, addr):
+        if self.capture is not None:
+            self.capture.record(False, self._local, addr, data)
+        waiter = self._dispatcher.match(data, addr)
+        if waiter is None:
+            return
+        if isinstance(waiter, collections.deque):
+            # 交给最早发送、仍在等待的请求
+            while waiter:
+                first = waiter.popleft()
+                if not first.done():
+                    first.set_result((data, addr))
+                    return
+            return
+        if not waiter.done():
+            waiter.set_result((data, addr))
+
+    def error_received(self, exc):
+        logger.debug("[DrCOMProtocol.error_received]：%s", exc)
+
+    def connection_lost(self, exc):
+        for entry in self._dispatcher.waiters():
+            for waiter in entry if isinstance(entry, collections.deque) else (entry,):
+                if not waiter.done():
+                    waiter.set_exception(DrCOMException("[DrCOMProtocol]：Connection lost..."))
+
+    async def request(self, pkg, server, timeout, fanout=(), reply=None):
+        """
+        发送数据包并等待与之对应的返回
+        :param pkg:
+        :param server:
+        :param timeout:
+        :param fanout: 同时发送的其它地址（探测服务器时使用），任意一个地址的返回都可以完成请求
+        :param reply: 解析返回数据包的类，例如 replies.AliveReply
+        :return: reply(data, address)；reply为None时返回 (data, address)
+        """
+        key = request_key(pkg, server)
+        if key[1] in SHARED:
+            return await self._request_shared(key, pkg, server, timeout, fanout, reply)
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # 先排队再占用名额，等待同签名请求的协程不占用名额
+            async with entry[0], self._slot():
+                loop = asyncio.get_event_loop()
+                waiter = loop.create_future()
+                handle = _Deadline(waiter, timeout)
+                self._dispatcher.register(key, waiter)
+                try:
+                    self._send(pkg, server, fanout)
+                    data, address = await waiter
+                    return reply(data, address) if reply is not None else (data, address)
+                finally:
+                    handle.cancel()
+                    self._dispatcher.unregister(key, waiter)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def _request_shared(self, key, pkg, server, timeout, fanout, reply):
+        """
+        SHARED 请求不等待之前的同类请求，登记在同一个队列中，参数与返回值同 request
+        """
+        async with self._slot():
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = collections.deque()
+                self._dispatcher.register(key, queue)
+            loop = asyncio.get_event_loop()
+            waiter = loop.create_future()
+            handle = _Deadline(waiter, timeout)
+            queue.append(waiter)
+            try:
+                self._send(pkg, server, fanout)
+                data, address = await waiter
+                return reply(data, address) if reply is not None else (data, address)
+            finally:
+                handle.cancel()
+                try:
+                    queue.remove(waiter)
+                except ValueError:
+                    pass
+                if not queue and self._queues.get(key) is queue:
+                    del self._queues[key]
+                    self._dispatcher.unregister(key, queue)
+
+    def _slot(self):
+        """
+        占用一个等待返回的名额，window为None时不限制
+        """
+        return _UNLIMITED if self.window is None else self.window
+
+    def _send(self, pkg, server, fanout):
+        self.transport.sendto(pkg, server)
+        for other in fanout:
+            self.transport.sendto(pkg, other)
+        if self.capture is not None:
+            for address in (server,) + tuple(fanout):
+                self.capture.record(True, self._local, address, pkg)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+class AsyncDrCOMClient(DrCOMCore):
+    """
+    协程版本的客户端，数据包的构造与校验与DrCOMClient共用DrCOMCore
+    整个会话的生命周期都运行在同一个事件循环中，不再占用阻塞线程
+    """
+    __slots__ = ("protocol",)
+
+    def __init__(self, usr="", pwd=""):
+        super(AsyncDrCOMClient, self).__init__(usr, pwd)
+        self.protocol = None
+
+    async def _setup(self):
+        """
+        获取本机信息并创建绑定LOCAL_PORT端口的UDP端点
+        :return:
+        """
+        self._setup_host()
+
+        if self.protocol is not None:
+            return
+
+        loop = asyncio.get_event_loop()
+        try:
+            _, self.protocol = await loop.create_datagram_endpoint(lambda: DrCOMProtocol(DEFAULT_CAPTURE),
+                                                                   local_addr=("0.0.0.0", LOCAL_PORT))
+        except OSError:
+            raise DrCOMException("检测到重复启动客户端")
+
+    async def _send_package(self, pkg, server, reply=None):
+        """
+        发送数据包，重传策略与DrCOMClient._send_package一致
+        :param pkg:
+        :param server:
+        :param reply: 解析返回数据包的类，见 drcom.main.replies
+        :return:
+        """
+        policy = self.policy
+        metrics = self.metrics
+        host = server[0]
+        loop = asyncio.get_event_loop()
+        begin = loop.time()
+        for attempt, timeout in policy.schedule(host):
+            if attempt:
+                metrics.incr("retransmissions")
+            start = loop.time()
+            try:
+                result = await self.protocol.request(pkg, server, timeout, reply=reply)
+            except asyncio.TimeoutError:
+                policy.failure(host)
+                warning_limited("DrCOM._send_package", "[DrCOM._send_package]：Continue to retry times [%d]...",
+                                policy.attempts - attempt - 1)
+                continue
+
+            end = loop.time()
+            policy.success(host, end - start, attempt)
+            metrics.observe(pkg, end - begin)
+            return result
+
+        metrics.incr("timeouts")
+        exception = TimeoutException("[DrCOM._send_package]：Failure on sending package...")
+        exception.last_pkg = bytes(pkg)
+        raise exception
+
+    async def prepare(self):
+        """
+        获取服务器IP和Salt，探测方式与DrCOMClient.prepare一致
+        :return:
+        """
+        await self._setup()
+        pkg, random_value = self._make_challenge_package()
+
+        loop = asyncio.get_event_loop()
+        discovery = Discovery(self.policy)
+        begin = loop.time()
+        for attempt, timeout, servers in discovery.schedule():
+            if attempt:
+                self.metrics.incr("retransmissions")
+            start = loop.time()
+            try:
+                reply = await self.protocol.request(pkg, servers[0], timeout, servers[1:], ChallengeReply)
+            except asyncio.TimeoutError:
+                discovery.failure()
+                warning_limited("DrCOM.prepare", "[DrCOM.prepare]：Continue to retry times [%d]...",
+                                self.policy.attempts - attempt - 1)
+                continue
+
+            if self._check_challenge(reply, random_value):
+                end = loop.time()
+                discovery.success(reply.address, end - start, attempt)
+                self.metrics.observe(pkg, end - begin)
+                res = DrCOMResponse()
+                res.msg = "已做好接入有线网的准备"
+                return res
+
+        self.metrics.incr("timeouts")
+        exception = DrCOMException("无法检测到验证服务器")
+        exception.last_pkg = pkg
+        raise exception
+
+    async def login(self):
+        """
+        登录到目标服务器方法
+        :return:
+        """
+        pkg = self._make_login_package()
+
+        reply = await self._send_package(pkg, (self.session.server_ip, SERVER_PORT), LoginReply)
+
+        return self._check_login(reply)
+
+    async def send_alive_pkg1(self):
+        """
+        发送类型一的心跳包
+        :return:
+        """
+        pkg = self._make_alive1_package()
+
+        reply = await self._send_package(pkg, (self.session.server_ip, SERVER_PORT), AliveReply)
+
+        self._check_alive1(reply)
+
+    async def send_alive_pkg2(self, num, key, cls):
+        """
+        发送类型二的心跳包
+        :return: 下一次心跳使用的key
+        """
+        pkg = self._make_alive_package(num=num, key=key, cls=cls)
+
+        reply = await self._send_package(pkg, (self.session.server_ip, SERVER_PORT), AliveReply)
+
+        return self._check_alive2(reply, cls)
+
+    async def heartbeat(self):
+        """
+        发送一轮心跳：类型一心跳包，以及类型二的cls 1与cls 3心跳包
+        类型一心跳包不依赖key，与类型二的 cls 1 -> cls 3 链同时进行，流程与DrCOMClient.heartbeat一致
+        :return:
+        """
+        session = self.session
+        alive1 = asyncio.ensure_future(self.send_alive_pkg1())
+        try:
+            session.key = await self.send_alive_pkg2(session.num, session.key, cls=1)
+            session.key = await self.send_alive_pkg2(session.num, session.key, cls=3)
+        except BaseException:
+            alive1.cancel()
+            alive1.add_done_callback(_discard)
+            raise
+        await alive1
+        session.num = session.num + 2
+
+    async def keep_alive(self, interval=10):
+        """
+        心跳循环，直到登出或者心跳失败；按绝对截止时间发送（见Cadence），执行耗时不会累积
+        :param interval: 心跳间隔
+        :return:
+        """
+        session = self.session
+        cadence = Cadence(interval)
+        while True:
+            await asyncio.sleep(cadence.delay())
+            if not session.login_flag or not session.alive_flag:
+                break
+            cadence.begin(self.metrics)
+            try:
+                await self.heartbeat()
+            except (TimeoutException, DrCOMException) as exc:
+                logger.error("err_no:60, [DrCOM.keep_alive]：%s", exc.info)
+                dump_on_error("keep-alive")
+                self._alive_stopped()
+                break
+            cadence.advance()
+
+    async def logout(self):
+        """
+        登出，流程与DrCOMClient.logout一致
+        :return:
+        """
+        server = (self.session.server_ip, SERVER_PORT)
+
+        await self.send_alive_pkg1()
+
+        pkg = self._make_logout_challenge_package()
+
+        reply = await self._send_package(pkg, server, LogoutReply)
+
+        self._check_logout_challenge(reply)
+
+        pkg = self._make_logout_package()
+
+        reply = await self._send_package(pkg, server, LogoutReply)
+
+        self._check_logout(reply)
+
+    async def run(self, interval=10):
+        """
+        完整的会话生命周期：准备、登录、心跳，任务被取消时登出
+        :param interval: 心跳间隔
+        :return:
+        """
+        await self.prepare()
+        await self.login()
+        logger.info("[DrCOM.run]：Successfully login to DrCOM Server...")
+        try:
+            await self.keep_alive(interval)
+        finally:
+            if self.session.login_flag:
+                await self.logout()
+                logger.info("[DrCOM.run]：Successful logout to DrCOM Server")
+
+    def close(self):
+        if self.protocol is not None:
+            self.protocol.close()
+            self.protocol = None
+
+
+# 用于命令行模式
+if __name__ == '__main__':
+    setup()
+    client = AsyncDrCOMClient(USERNAME, PASSWORD)
+    metrics_server = serve()
+    install_signal()
+    loop = asyncio.get_event_loop()
+    task = loop.create_task(client.run())
+    try:
+        loop.run_until_complete(task)
+    except KeyboardInterrupt:
+        task.cancel()
+        try:
+            loop.run_until_complete(task)
+        except (asyncio.CancelledError, DrCOMException, TimeoutException):
+            pass
+    except (DrCOMException, TimeoutException) as e:
+        logger.error("err_no:10, [DrCOM.run]：%s", e.info)
+        dump_on_error("run")
+        sys.exit(1)
+    finally:
+        client.close()
+        loop.close()
+        if metrics_server is not None:
+            metrics_server.stop()
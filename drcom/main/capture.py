@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+协议数据包抓取
+
+CAPTURE_PACKETS 不为0时，SocketDispatcher 与 DrCOMProtocol 收发的每一个数据包连同时间戳
+保存在固定大小的环形缓冲区中，写满之后覆盖最早的数据包；记录时只有一次元组赋值，
+不进行任何磁盘I/O。以下情况把缓冲区写成标准pcap文件（补齐IPv4与UDP头部，可以直接用
+Wireshark打开）：
+    出错时       dump_on_error(reason)，同一进程每 interval 秒最多写一次
+    收到信号时   install_signal() 之后向进程发送 SIGUSR1
+    任意时刻     DEFAULT_CAPTURE.dump()
+CAPTURE_PACKETS 为0时 DEFAULT_CAPTURE 为None，收发路径上只有一次判断
+"""
+
+import os
+import time
+import socket
+import signal
+import struct
+import itertools
+import threading
+
+from drcom.main.host import DEFAULT_HOST
+from drcom.main.logger import logger
+from drcom.configs.settings import *
+
+LINKTYPE_RAW = 101
+
+_PCAP_HEADER = struct.Struct("<IHHiIII")
+_RECORD_HEADER = struct.Struct("<IIII")
+_IPV4_HEADER = struct.Struct("!BBHHHBBH4s4s")
+_UDP_HEADER = struct.Struct("!HHHH")
+
+
+def _checksum(header):
+    if len(header) & 1:
+        header += b'\x00'
+    total = sum(struct.unpack("!%dH" % (len(header) // 2), header))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def _datagram(src, dst, payload, ident):
+    """
+    为UDP负载补齐IPv4与UDP头部
+    :param src: (IP, 端口)
+    :param dst: (IP, 端口)
+    :param payload:
+    :param ident: IPv4标识
+    :return:
+    """
+    length = _IPV4_HEADER.size + _UDP_HEADER.size + len(payload)
+    source = socket.inet_aton(src[0])
+    destination = socket.inet_aton(dst[0])
+    header = _IPV4_HEADER.pack(0x45, 0, length, ident & 0xffff, 0, 64, socket.IPPROTO_UDP, 0,
+                               source, destination)
+    header = header[:10] + struct.pack("!H", _checksum(header)) + header[12:]
+    udp_length = _UDP_HEADER.size + len(payload)
+    # UDP校验和包括源地址、目的地址、协议与长度组成的伪头部，计算结果为0时写为0xffff
+    pseudo = source + destination + struct.pack("!BBH", 0, socket.IPPROTO_UDP, udp_length)
+    udp = _UDP_HEADER.pack(src[1], dst[1], udp_length, 0) + payload
+    udp_checksum = _checksum(pseudo + udp) or 0xffff
+    return header + udp[:6] + struct.pack("!H", udp_checksum) + udp[8:]
+
+
+class Capture(object):
+    """
+    数据包环形缓冲区，可以在多个线程与事件循环中同时使用
+    """
+
+    def __init__(self, size=CAPTURE_PACKETS, directory=None, interval=60):
+        """
+        :param size: 最多保存的数据包数量
+        :param directory: pcap文件的保存目录，默认使用CAPTURE_DIR
+        :param interval: dump_on_error两次写文件之间的最短间隔（秒）
+        """
+        self.size = size
+        self.directory = directory if directory is not None else CAPTURE_DIR
+        self.interval = interval
+        self._slots = [None] * size
+        self._sequence = itertools.count()
+        self._dumped = None
+        self._lock = threading.Lock()
+
+    def record(self, outgoing, local, peer, data):
+        """
+        记录一个数据包
+        :param outgoing: 是否为发送的数据包
+        :param local: 本机 (IP, 端口)
+        :param peer: 对方 (IP, 端口)
+        :param data:
+        :return:
+        """
+        # itertools.count 的 next() 在GIL下是原子操作，不需要加锁
+        sequence = next(self._sequence)
+        self._slots[sequence % self.size] = (sequence, time.time(), outgoing, local, peer, bytes(data))
+
+    def packets(self):
+        """
+        :return: 按时间顺序排列的 [(序号, 时间戳, 是否发送, 本机地址, 对方地址, 数据)]
+        """
+        return sorted(entry for entry in list(self._slots) if entry is not None)
+
+    def clear(self):
+        self._slots = [None] * self.size
+
+    def write(self, stream):
+        """
+        把缓冲区中的数据包以pcap格式写入stream
+        :param stream: 以二进制模式打开的文件
+        :return: 写入的数据包数量
+        """
+        packets = self.packets()
+        host_ip = None
+        stream.write(_PCAP_HEADER.pack(0xa1b2c3d4, 2, 4, 0, 0, 65535, LINKTYPE_RAW))
+        for sequence, stamp, outgoing, local, peer, data in packets:
+            if local[0] in ("", "0.0.0.0"):
+                # 绑定在全部地址上时使用当前联网的IP地址
+                if host_ip is None:
+                    host_ip = DEFAULT_HOST.get()[2] or "0.0.0.0"
+                local = (host_ip, local[1])
+            src, dst = (local, peer) if outgoing else (peer, local)
+            frame = _datagram(src, dst, data, sequence)
+            seconds = int(stamp)
+            stream.write(_RECORD_HEADER.pack(seconds, int((stamp - seconds) * 1e6), len(frame), len(frame)))
+            stream.write(frame)
+        return len(packets)
+
+    def dump(self, reason="manual", path=None):
+        """
+        把缓冲区写成pcap文件
+        :param reason: 写入文件名，方便区分
+        :param path: 文件路径，默认为 CAPTURE_DIR/MagicDrCOM-时间-原因.pcap
+        :return: 文件路径，写入失败时返回None
+        """
+        if path is None:
+            name = "MagicDrCOM-{}-{}.pcap".format(
+                time.strftime("%Y%m%d-%H%M%S"), "".join(c if c.isalnum() else "-" for c in reason))
+            path = os.path.join(self.directory, name)
+        try:
+            with open(path, "wb") as stream:
+                count = self.write(stream)
+        except OSError as e:
+            logger.error("err_no:90, [Capture.dump]：Failure on writing %s: %s", path, e)
+            return None
+        logger.info("[Capture.dump]：%d packets written to %s...", count, path)
+        return path
+
+    def dump_on_error(self, reason):
+        """
+        出错时写文件，短时间内的多次出错只写一次
+        :param reason:
+        :return: 文件路径，没有写入时返回None
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._dumped is not None and now - self._dumped < self.interval:
+                return None
+            self._dumped = now
+        return self.dump(reason)
+
+
+# 默认共享的抓包缓冲区，CAPTURE_PACKETS为0时不抓包
+DEFAULT_CAPTURE = Capture() if CAPTURE_PACKETS else None
+
+
+def dump_on_error(reason):
+    """
+    启用抓包时把缓冲区写成pcap文件
+    :param reason:
+    :return:
+    """
+    if DEFAULT_CAPTURE is not None:
+        return DEFAULT_CAPTURE.dump_on_error(reason)
+    return None
+
+
+def install_signal(signum=None):
+    """
+    收到信号（默认SIGUSR1）时写pcap文件，只能在主线程中调用；不支持的平台上什么也不做
+    :param signum:
+    :return: 是否已经安装
+    """
+    if DEFAULT_CAPTURE is None:
+        return False
+    signum = signum if signum is not None else getattr(signal, "SIGUSR1", None)
+    if signum is None:
+        return False
+    try:
+        signal.signal(signum, lambda *_: DEFAULT_CAPTURE.dump("signal"))
+    except (ValueError, OSError) as e:
+        logger.debug("[Capture]：Failure on installing signal handler: %s", e)
+        return False
+    return True
@@ -5,340 +5,209 @@
 # 本项目由@Ryuchen开发维护，使用Python3.7
 # ==================================================
 
-import sys
 import time
-import struct
 import socket
-import random
-
-from drcom.main.utils import mac
-from drcom.main.utils import hostname
-from drcom.main.utils import ipaddress
-from drcom.main.utils import md5
-from drcom.main.utils import checksum
-from drcom.main.utils import int2hex_str
-from drcom.main.utils import clean_socket_buffer
-from drcom.main.logger import Log
+
+from drcom.main.core import DrCOMCore
+from drcom.main.core import DrCOMResponse
+from drcom.main.dispatch import SocketDispatcher
+from drcom.main.discovery import Discovery
+from drcom.main.scheduler import Cadence
+from drcom.main.capture import DEFAULT_CAPTURE
+from drcom.main.capture import dump_on_error
+from drcom.main.replies import AliveReply
+from drcom.main.replies import LoginReply
+from drcom.main.replies import LogoutReply
+from drcom.main.replies import ChallengeReply
+from drcom.main.logger import logger
+from drcom.main.logger import warning_limited
 from drcom.main.excepts import DrCOMException
 from drcom.main.excepts import TimeoutException
 from drcom.configs.settings import *
 
 
-class DrCOMResponse(object):
-
-    def __init__(self):
-        self._msg = ""
-
-    @property
-    def msg(self):
-        return self._msg
+class _Flight(object):
+    """
+    一个已经发送、正在等待返回的请求
+    """
+    __slots__ = ("pkg", "server", "schedule", "attempt", "begin", "sent", "deadline", "waiter")
 
-    @msg.setter
-    def msg(self, msg):
-        self._msg = msg
+    def __init__(self, pkg, server, schedule):
+        self.pkg = pkg
+        self.server = server
+        self.schedule = schedule
+        self.attempt = 0
+        self.begin = time.monotonic()
+        self.sent = self.begin
+        self.deadline = self.begin
+        self.waiter = None
 
 
-class DrCOMClient(object):
+class DrCOMClient(DrCOMCore):
+    """
+    阻塞socket上的客户端，图形界面与命令行共用
+    会话状态保存在 self.session 中，数据包的构造与校验见 DrCOMCore
+    interrupt 为True时停止正在进行的重传，cancel() 还会唤醒正在等待返回的线程
+    """
+    __slots__ = ("socket", "dispatcher", "interrupt")
 
     def __init__(self, usr="", pwd=""):
-        self._usr = usr
-        self._pwd = pwd
-
-        self._num = 0
-        self._key = b'\x00' * 4
-
-        self.salt = b""
-        self.server_ip = ""
-        self.auth_info = b""
-
-        self.alive_flag = True
-        self.ready_flag = False
-        self.login_flag = False
-
-        self.platform = sys.platform
-
-    @property
-    def usr(self):
-        return self._usr
-
-    @usr.setter
-    def usr(self, value):
-        self._usr = value
-
-    @property
-    def pwd(self):
-        return self._pwd
-
-    @pwd.setter
-    def pwd(self, value):
-        self._pwd = value
-
-    @property
-    def num(self):
-        return self._num
-
-    @num.setter
-    def num(self, value):
-        self._num = value
-
-    @property
-    def key(self):
-        return self._key
-
-    @key.setter
-    def key(self, value):
-        self._key = value
+        super(DrCOMClient, self).__init__(usr, pwd)
+        self.socket = None
+        self.dispatcher = None
+        self.interrupt = False
 
     def _setup(self):
         """
-        尝试获取当前主机的主机名称、MAC地址、联网IP地址
+        尝试获取当前主机的主机名称、MAC地址、联网IP地址，并绑定本地LOCAL_PORT端口
         :return:
         """
-        self.host_name = hostname()
+        self._setup_host()
 
-        if LOCAL_MAC:  # 如果没有指定本机MAC，尝试自动获取
-            self.mac = bytes().fromhex(LOCAL_MAC)
-        else:
-            self.mac = bytes().fromhex(mac())
+        if self.socket is not None:
+            return
 
-        if LOCAL_IP:  # 如果没有指定本机IP，尝试自动获取
-            self.ip = LOCAL_IP
-        else:
-            self.ip = ipaddress()
-
-        if not self.host_name or not self.mac or not self.ip:
-            raise DrCOMException("请确保已经接入有线网")
-
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        self.socket.settimeout(3)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
         try:
-            self.socket.bind(("", 61440))
+            sock.bind(("", LOCAL_PORT))
         except (OSError, socket.error):
+            sock.close()
+            logger.error("err_no:10, [DrCOM._setup]：无法绑定%s端口，请检查是否有其他进程占据了该端口", LOCAL_PORT)
             raise DrCOMException("检测到重复启动客户端")
+        self.socket = sock
+        self.dispatcher = SocketDispatcher(sock, DEFAULT_CAPTURE)
 
-    def _make_login_package(self):
+    def _send_package(self, pkg, server, reply=None):
         """
-        构造登陆数据包
-        :return:
+        发送数据包，重传超时按服务器的往返时间自适应调整，全部失败或超过总时限时触发超时异常
+        返回的数据包按请求的签名匹配，不再需要在发送前清空socket缓冲区
+        :param pkg:
+        :param server:
+        :param reply: 解析返回数据包的类，见 drcom.main.replies
+        :return: 解析之后的返回；reply为None时返回 (data, address)
         """
-        # (0:3 4) Header = Code + Type + EOF + (UserName Length + 20)
-        data = b'\x03\x01\x00' + int2hex_str(len(self.usr) + 20)
-        # (4:19 16) MD5_A = MD5(Code + Type + Salt + Password)
-        data += md5(b'\x03\x01' + self.salt + self.pwd.encode('ascii'))
-        # (20:55 36) 用户名
-        data += self.usr.encode('ascii').ljust(36, b'\x00')
-        # (56:56 1) 控制检查状态
-        data += CONTROL_CHECK_STATUS
-        # (57:57 1) 适配器编号？
-        data += ADAPTER_NUMBER
-        # (58:63 6) (MD5_A xor MAC)
-        data += int2hex_str(int.from_bytes(data[4:10], 'big') ^ int.from_bytes(self.mac, 'big')).rjust(6, b'\x00')
-        # (64:79 16) MD5_B = MD5(0x01 + Password + Salt + 0x00 *4)
-        data += md5(b'\x01' + self.pwd.encode('ascii') + self.salt + b'\x00' * 4)
-        # (80:80 1) NIC Count
-        data += b'\x01'
-        # (81:84 4) 本机IP
-        data += socket.inet_aton(self.ip)
-        # (85:88 4) ip地址 2
-        data += b'\00' * 4
-        # (89:92 4) ip地址 3
-        data += b'\00' * 4
-        # (93:96 4) ip地址 4
-        data += b'\00' * 4
-        # (97:104 8) 校验和A
-        data += md5(data + b'\x14\x00\x07\x0b')[:8]
-        # (105:105 1) IP Dog
-        data += IP_DOG
-        # (106:109 4) 未知
-        data += b'\x00' * 4
-        # (110:141 32) 主机名
-        data += self.host_name.encode('ascii').ljust(32, b'\x00')
-        # (142:145 4) 主要dns: 114.114.114.114
-        data += b'\x72\x72\x72\x72'
-        # (146:149 4) DHCP服务器IP
-        data += socket.inet_aton(DHCP_SERVER_IP)
-        # (150:153 4) 备用dns:8.8.8.8
-        data += b'\x08\x08\x08\x08'
-        # (154:161 8) 未知
-        data += b'\x00' * 8
-        data += b'\x94\x00\x00\x00'  # (162:165 4) 未知
-        data += b'\x06\x00\x00\x00'  # (166:169 4) OS major 不同客户端有差异
-        data += b'\x01\x00\x00\x00'  # (170:173 4) OS minor 不同客户端有差异
-        data += b'\xb1\x1d\x00\x00'  # (174:177 4) OS build 不同客户端有差异
-        data += b'\x02\x00\x00\x00'  # (178:181 4) 未知 OS相关
-        # (182:213 32) 操作系统名称
-        data += "WINDOWS".encode('ascii').ljust(32, b'\x00')
-        # (214:309 96) 未知 不同客户端有差异，BISTU版此字段包含一段识别符，但不影响登陆
-        data += b'\x00' * 96
-        # (310:311 2)
-        data += AUTH_VERSION
-        # (312:313 2) 未知
-        data += b'\x02\x0c'
-        # (314:317 4) 校验和
-        data += checksum(data + b'\x01\x26\x07\x11\x00\x00' + self.mac)
-        # (318:319 2) 未知
-        data += b'\x00\x00'
-        # (320:325 6) 本机MAC
-        data += self.mac
-        # (326:326 1) auto logout / default: False
-        data += b'\x00'
-        # (327:327 1) broadcast mode / default : False
-        data += b'\x00'
-        # (328:329 2) 未知 不同客户端有差异
-        data += b'\x17\x77'
-        return data
-
-    def _make_alive_package(self, num, key, cls):
+        return self._complete(self._submit(pkg, server), reply)
+
+    def _submit(self, pkg, server):
         """
-        构造心跳数据包
-        :param num:
-        :param key:
-        :param cls:
-        :return:
+        发送数据包但不等待返回，与 _complete 配合可以让互不依赖的请求同时进行
+        :param pkg: 在 _complete 之前不能修改（重传时再次发送）
+        :param server:
+        :return: _Flight
         """
-        # (0:0 1) 未知
-        data = b'\x07'
-        # (1:1 1) 编号
-        data += int2hex_str(num % 256)
-        # (2:4 3) 未知
-        data += b'\x28\x00\x0b'
-        # (5:5 1) 类型
-        data += int2hex_str(cls)
-        # (6:7 2) BISTU版此字段不会变化
-        if num == 0:
-            data += b'\xdc\x02'
-        else:
-            data += KEEP_ALIVE_VERSION
-        # (8:9 2) 未知 每个包会有变化
-        data += b'\x2f\x79'
-        # (10:15 6) 未知
-        data += b'\x00' * 6
-        # (16:19 4)
-        data += key
-        # (20:23 4) 未知
-        data += b'\x00' * 4
-        # data += struct.pack("!H",0xdc02)  # 未验证
-        if cls == 1:
-            # (24:39 16) 未知
-            data += b'\x00' * 16
-        if cls == 3:
-            # host_ip
-            foo = b''.join([int2hex_str(int(i)) for i in self.ip.split('.')])
-            # use double keep in main to keep online .Ice
-            crc = b'\x00' * 4
-            # data += struct.pack("!I",crc) + foo + b'\x00' * 8
-            data += crc + foo + b'\x00' * 8
-        return data
-
-    def _make_logout_package(self):
-        # (0:3 4) Header = Code + Type + EOF + (UserName Length + 20)
-        data = b'\x06\x01\x00' + int2hex_str(len(self.usr) + 20)
-        # TODO MD5_A字段在BISTU版中的算法未知，但以下算法可以正常使用
-        # (4:19 16) MD5_A = MD5(Code + Type + Salt + Password)
-        data += md5(b'\x06\x01' + self.salt + self.pwd.encode('ascii'))
-        # (20:55 36) 用户名
-        data += self.usr.encode('ascii').ljust(36, b'\x00')
-        # (56:56 1) 控制检查状态
-        data += CONTROL_CHECK_STATUS
-        # (57:57 1) 适配器编号？
-        data += ADAPTER_NUMBER
-        # (58:63 6) (MD5_A xor MAC)
-        data += int2hex_str(int.from_bytes(data[4:10], 'big') ^ int.from_bytes(self.mac, 'big')).rjust(6, b'\x00')
-        data += self.auth_info
-        return data
-
-    def _send_package(self, pkg, server):
+        flight = _Flight(pkg, server, self.policy.schedule(server[0]))
+        self._transmit(flight)
+        return flight
+
+    def _transmit(self, flight):
         """
-        发送数据包, 每次发送都尝试三次，如果发送三次都失败，触发超时异常
-        :param pkg:
+        按重传计划进行下一次发送
+        :param flight:
         :return:
         """
-        last_times = ReTryTimes
-        while last_times > 0:
-            last_times = last_times - 1
-            clean_socket_buffer(self.socket)
-            self.socket.sendto(pkg, server)
+        policy = self.policy
+        for attempt, timeout in flight.schedule:
+            if self.interrupt:
+                break
+            if attempt:
+                self.metrics.incr("retransmissions")
+            flight.attempt = attempt
+            flight.sent = time.monotonic()
+            flight.deadline = flight.sent + timeout
             try:
-                data, address = self.socket.recvfrom(1024)
+                if flight.waiter is None:
+                    flight.waiter = self.dispatcher.submit(flight.pkg, flight.server, flight.deadline)
+                else:
+                    self.dispatcher.resend(flight.waiter, flight.pkg, flight.server)
             except socket.timeout:
-                Log(logging.WARNING, 0, "[DrCOM._send_package]：Continue to retry times [{}]...".format(last_times))
+                if self.interrupt:
+                    break
+                # 签名相同的请求在整个等待时间内都没有结束
+                policy.failure(flight.server[0])
                 continue
+            return
 
-            if data and address:
-                return data, address
-
+        self._abandon(flight)
+        if self.interrupt:
+            raise TimeoutException("[DrCOM._send_package]：Cancelled...")
+        self.metrics.incr("timeouts")
         exception = TimeoutException("[DrCOM._send_package]：Failure on sending package...")
-        exception.last_pkg = pkg
+        exception.last_pkg = bytes(flight.pkg)
         raise exception
 
-    def send_alive_pkg1(self):
+    def _complete(self, flight, reply=None):
         """
-        发送类型一的心跳包
-        :return:
-        """
-        pkg = b'\xff'
-        pkg += md5(b'\x03\x01' + self.salt + self.pwd.encode('ascii'))  # MD5_A
-        pkg += b'\x00' * 3
-        pkg += self.auth_info
-        pkg += struct.pack('!H', int(time.time()) % 0xFFFF)
-        pkg += b'\x00' * 3
-
-        data, address = self._send_package(pkg, (self.server_ip, 61440))
-
-        if data[0] == 0x07:
-            Log(logging.DEBUG, 0, "[DrCOM.send_alive_pkg1]：Successful sending heartbeat package type 1...")
-        else:
-            # 当收到的数据包没法识别的时候
-            exception = DrCOMException("[DrCOM.send_alive_pkg1]：Receive unknown packages content...")
-            exception.last_pkg = data
-            raise exception
-
-    def send_alive_pkg2(self, num, key, cls):
+        等待 _submit 的请求的返回，超时时重传
+        :param flight:
+        :param reply:
+        :return: 同 _send_package
         """
-        发送类型二的心跳包
-        :return:
-        """
-        pkg = self._make_alive_package(num=num, key=key, cls=cls)
-
-        data, address = self._send_package(pkg, (self.server_ip, 61440))
+        policy = self.policy
+        host = flight.server[0]
+        while True:
+            try:
+                result = self.dispatcher.collect(flight.waiter, flight.deadline, reply)
+            except socket.timeout:
+                if self.interrupt:
+                    self._abandon(flight)
+                    raise TimeoutException("[DrCOM._send_package]：Cancelled...")
+                policy.failure(host)
+                warning_limited("DrCOM._send_package", "[DrCOM._send_package]：Continue to retry times [%d]...",
+                                policy.attempts - flight.attempt - 1)
+                self._transmit(flight)
+                continue
+            arrived = flight.waiter.arrived
+            self._abandon(flight)
+            policy.success(host, arrived - flight.sent, flight.attempt)
+            self.metrics.observe(flight.pkg, arrived - flight.begin)
+            return result
 
-        if data[0] == 0x07:
-            Log(logging.DEBUG, 0, "[DrCOM.send_alive_pkg2]：Successful sending heartbeat package 2[{}]...".format(cls))
-            response = data[16:20]
-            return response
-        else:
-            # 当收到的数据包没法识别的时候
-            exception = DrCOMException("[DrCOM.send_alive_pkg2]：Receive unknown packages content...")
-            exception.last_pkg = data
-            raise exception
+    def _abandon(self, flight):
+        if flight.waiter is not None:
+            self.dispatcher.cancel(flight.waiter)
+            flight.waiter = None
 
     def prepare(self):
         """
-        获取服务器IP和Salt
+        获取服务器IP和Salt，挑战数据包同时发送给所有候选服务器，第一个合法的返回胜出
         :return:
         """
         self._setup()
-        random_value = struct.pack("<H", int(time.time() + random.randint(0xF, 0xFF)) % 0xFFFF)
-        pkg = b'\x01\x02' + random_value + b'\x0a' + b'\x00' * 15
-
-        # 尝试目前已知的学校认证服务器地址
-        for _ in [(SERVER_IP, 61440), ("1.1.1.1", 61440), ("202.1.1.1", 61440)]:
-            data, address = self._send_package(pkg, _)
-
-            # 未获取合理IP地址则进行下一个服务器地址尝试
-            if data[0:4] == b'\x02\x02' + random_value:
-                self.server_ip = address[0]
-                self.salt = data[4:8]
+        pkg, random_value = self._make_challenge_package()
+
+        discovery = Discovery(self.policy)
+        begin = time.monotonic()
+        for attempt, timeout, servers in discovery.schedule():
+            if self.interrupt:
+                break
+            if attempt:
+                self.metrics.incr("retransmissions")
+            start = time.monotonic()
+            try:
+                reply = self.dispatcher.exchange(pkg, servers[0], timeout, servers[1:], ChallengeReply)
+            except socket.timeout:
+                if self.interrupt:
+                    break
+                discovery.failure()
+                warning_limited("DrCOM.prepare", "[DrCOM.prepare]：Continue to retry times [%d]...",
+                                self.policy.attempts - attempt - 1)
+                continue
 
-                self.ready_flag = True
+            if self._check_challenge(reply, random_value):
+                end = time.monotonic()
+                discovery.success(reply.address, end - start, attempt)
+                self.metrics.observe(pkg, end - begin)
+                logger.debug("[DrCOM.prepare]：Server IP: %s, Salt: %s", self.session.server_ip, self.session.salt)
                 res = DrCOMResponse()
                 res.msg = "已做好接入有线网的准备"
                 return res
 
-        if not self.server_ip or not self.salt:
-            exception = DrCOMException("无法检测到验证服务器")
-            exception.last_pkg = pkg
-            raise exception
+        if self.interrupt:
+            raise DrCOMException("已取消检测验证服务器")
+        self.metrics.incr("timeouts")
+        exception = DrCOMException("无法检测到验证服务器")
+        exception.last_pkg = bytes(pkg)
+        raise exception
 
     def login(self):
         """
@@ -347,27 +216,74 @@ class DrCOMClient(object):
         """
         pkg = self._make_login_package()
 
-        data, address = self._send_package(pkg, (self.server_ip, 61440))
+        reply = self._send_package(pkg, (self.session.server_ip, SERVER_PORT), LoginReply)
+
+        return self._check_login(reply)
+
+    def send_alive_pkg1(self):
+        """
+        发送类型一的心跳包
+        :return:
+        """
+        pkg = self._make_alive1_package()
+
+        reply = self._send_package(pkg, (self.session.server_ip, SERVER_PORT), AliveReply)
+
+        self._check_alive1(reply)
+
+    def send_alive_pkg2(self, num, key, cls):
+        """
+        发送类型二的心跳包
+        :return: 下一次心跳使用的key
+        """
+        pkg = self._make_alive_package(num=num, key=key, cls=cls)
 
-        if data[0] == 0x04:
-            self.auth_info = data[23:39]
-            # 在这里设置当前为登录状态
-            self.login_flag = True
-            res = DrCOMResponse()
-            res.msg = "已经连接上校园网络"
-            return res
+        reply = self._send_package(pkg, (self.session.server_ip, SERVER_PORT), AliveReply)
 
-        elif data[0] == 0x05:
-            if len(data) > 32:
-                if data[32] == 0x31:
-                    raise DrCOMException("Failure on login because the wrong username...")
-                if data[32] == 0x33:
-                    raise DrCOMException("Failure on login because the wrong password...")
+        return self._check_alive2(reply, cls)
 
-        else:
-            exception = DrCOMException("Receive unknown packages content...")
-            exception.last_pkg = data
-            raise exception
+    def heartbeat(self):
+        """
+        发送一轮心跳：类型一心跳包，以及类型二的cls 1与cls 3心跳包
+        类型一心跳包不依赖key，与类型二的 cls 1 -> cls 3 链同时进行，一轮只需要两个往返
+        :return:
+        """
+        session = self.session
+        server = (session.server_ip, SERVER_PORT)
+        alive1 = self._submit(self._make_alive1_package(), server)
+        try:
+            session.key = self.send_alive_pkg2(session.num, session.key, cls=1)
+            session.key = self.send_alive_pkg2(session.num, session.key, cls=3)
+            self._check_alive1(self._complete(alive1, AliveReply))
+        finally:
+            self._abandon(alive1)
+        session.num = session.num + 2
+
+    def keep_alive(self, scheduler, interval=10):
+        """
+        在scheduler上按绝对截止时间每隔interval秒发送一轮心跳（见Cadence），
+        直到登出、心跳失败或者重新登录（由新的心跳接替）
+        :param scheduler: drcom.main.scheduler.Scheduler
+        :param interval: 心跳间隔
+        :return:
+        """
+        cadence = Cadence(interval)
+        scheduler.call_at(cadence.deadline, self._alive_round, scheduler, cadence, self.session.generation)
+
+    def _alive_round(self, scheduler, cadence, generation):
+        session = self.session
+        if not session.alive_flag or session.generation != generation or self.interrupt:
+            return
+        cadence.begin(self.metrics)
+        try:
+            self.heartbeat()
+        except (TimeoutException, DrCOMException) as exc:
+            logger.error("err_no:60, [DrCOM.keep_alive]：%s", exc.info)
+            dump_on_error("keep-alive")
+            if session.generation == generation:
+                self._alive_stopped()
+            return
+        scheduler.call_at(cadence.advance(), self._alive_round, scheduler, cadence, generation)
 
     def logout(self):
         """
@@ -377,27 +293,49 @@ class DrCOMClient(object):
         第二组似乎是用于告知网关准备登出
         第三组会发送登出的详细信息包括用户名等
         """
-        # 与alive_pkg1的最后两个字节相同
-        pkg = b'\x01\x03'
-        pkg += b'\x00\x00'
-        pkg += b'\x0a'
-        pkg += b'\x00' * 15
+        server = (self.session.server_ip, SERVER_PORT)
+
+        # 第一组 初步判断是为了判断当前网络是否联通
+        self.send_alive_pkg1()
 
-        data, address = self._send_package(pkg, (self.server_ip, 61440))
+        # 第二组 登出准备，与alive_pkg1的最后两个字节相同
+        pkg = self._make_logout_challenge_package()
 
-        if data[0:2] != b'\x02\x03':
-            exception = DrCOMException("[DrCOM.logout]：Receive unknown packages content...")
-            exception.last_pkg = data
-            raise exception
+        reply = self._send_package(pkg, server, LogoutReply)
+
+        self._check_logout_challenge(reply)
 
         # 第三组
         pkg = self._make_logout_package()
 
-        data, address = self._send_package(pkg, (self.server_ip, 61440))
+        reply = self._send_package(pkg, server, LogoutReply)
+
+        self._check_logout(reply)
 
-        if data[0] != 0x04:
-            exception = DrCOMException("[DrCOM.logout]：Receive unknown packages content...")
-            exception.last_pkg = data
-            raise exception
+    def cancel(self):
+        """
+        中止正在进行的请求，可以在其它线程中调用；之后的请求立即失败，直到 resume() 或 reset()
+        :return:
+        """
+        self.interrupt = True
+        if self.dispatcher is not None:
+            self.dispatcher.abort()
 
-        self.login_flag = False
+    def resume(self):
+        self.interrupt = False
+        if self.dispatcher is not None:
+            self.dispatcher.resume()
+
+    def reset(self):
+        """
+        重置登录状态
+        :return:
+        """
+        self.resume()
+        self.session.reset()
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+            self.dispatcher = None
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+协议核心
+
+Session 是单个账号会话的全部状态，使用 __slots__，没有 __dict__；
+DrCOMCore 负责数据包的构造与返回的校验，不进行任何I/O。
+同步(client.DrCOMClient，图形界面与命令行共用)与协程(aio.AsyncDrCOMClient)客户端
+继承 DrCOMCore，只实现发送、重传与等待
+"""
+
+import time
+import struct
+import random
+
+from drcom.main.host import DEFAULT_HOST
+from drcom.main.packets import PacketTemplate
+from drcom.main.replies import LoginReply
+from drcom.main.retry import DEFAULT_POLICY
+from drcom.main.metrics import DEFAULT_METRICS
+from drcom.main.logger import logger
+from drcom.main.excepts import DrCOMException
+from drcom.configs.settings import *
+
+
+class DrCOMResponse(object):
+
+    def __init__(self):
+        self._msg = ""
+
+    @property
+    def msg(self):
+        return self._msg
+
+    @msg.setter
+    def msg(self, msg):
+        self._msg = msg
+
+
+class Session(object):
+    """
+    单个账号会话的状态
+    generation 每次登录成功加一，旧的心跳循环据此退出
+    first_num 登录之后第一轮心跳的编号，共用UDP端点的会话各不相同（见SessionManager）
+    """
+    __slots__ = ("usr", "pwd", "host_name", "mac", "ip", "salt", "server_ip", "auth_info", "num", "first_num",
+                 "key", "ready_flag", "login_flag", "alive_flag", "generation", "template")
+
+    def __init__(self, usr="", pwd=""):
+        self.usr = usr
+        self.pwd = pwd
+        self.host_name = ""
+        self.mac = b""
+        self.ip = ""
+        self.salt = b""
+        self.server_ip = ""
+        self.auth_info = b""
+        self.num = 0
+        self.first_num = 0
+        self.key = b'\x00' * 4
+        self.ready_flag = False
+        self.login_flag = False
+        self.alive_flag = False
+        self.generation = 0
+        self.template = None
+
+    def reset(self):
+        """
+        重置登录状态，账号与本机信息保持不变
+        :return:
+        """
+        self.num = self.first_num
+        self.key = b'\x00' * 4
+        self.ready_flag = False
+        self.login_flag = False
+        self.alive_flag = False
+
+    def packets(self):
+        """
+        获取当前会话的数据包模板，账号或本机信息变化时重新创建
+        :return:
+        """
+        template = self.template
+        if template is None or not template.matches(self.usr, self.pwd, self.mac, self.ip, self.host_name):
+            template = self.template = PacketTemplate(self.usr, self.pwd, self.mac, self.ip, self.host_name)
+        return template
+
+    def __repr__(self):
+        return "<Session {} {}>".format(self.usr, "online" if self.login_flag else "offline")
+
+
+class DrCOMCore(object):
+    """
+    数据包的构造与返回的校验，子类提供 _send_package 以及 prepare/login/logout 等I/O方法
+    """
+    __slots__ = ("session", "policy", "metrics")
+
+    def __init__(self, usr="", pwd=""):
+        self.session = Session(usr, pwd)
+        self.policy = DEFAULT_POLICY
+        self.metrics = DEFAULT_METRICS
+
+    def _setup_host(self):
+        """
+        尝试获取当前主机的主机名称、MAC地址、联网IP地址
+        :return:
+        """
+        session = self.session
+        host_name, address, ip = DEFAULT_HOST.get()
+        session.host_name = host_name
+        # 没有指定本机MAC、IP时自动获取
+        session.mac = bytes.fromhex(LOCAL_MAC or address)
+        session.ip = LOCAL_IP or ip
+
+        if not session.host_name or not session.mac or not session.ip:
+            raise DrCOMException("请确保已经接入有线网")
+
+    @staticmethod
+    def _make_challenge_package():
+        """
+        构造获取Salt的挑战数据包
+        :return: 数据包与其中的随机值
+        """
+        random_value = struct.pack("<H", int(time.time() + random.randint(0xF, 0xFF)) % 0xFFFF)
+        pkg = b'\x01\x02' + random_value + b'\x0a' + b'\x00' * 15
+        return pkg, random_value
+
+    def _make_login_package(self):
+        """
+        构造登陆数据包，字段布局见PacketTemplate
+        :return:
+        """
+        return self.session.packets().login(self.session.salt)
+
+    def _make_alive1_package(self):
+        """
+        构造类型一的心跳数据包
+        :return:
+        """
+        session = self.session
+        return session.packets().alive1(session.salt, session.auth_info)
+
+    def _make_alive_package(self, num, key, cls):
+        """
+        构造类型二的心跳数据包
+        :param num:
+        :param key:
+        :param cls:
+        :return:
+        """
+        session = self.session
+        return session.packets().alive2(num, key, cls, num == session.first_num)
+
+    @staticmethod
+    def _make_logout_challenge_package():
+        """
+        构造登出准备数据包，与alive_pkg1的最后两个字节相同
+        :return:
+        """
+        return b'\x01\x03' + b'\x00\x00' + b'\x0a' + b'\x00' * 15
+
+    def _make_logout_package(self):
+        session = self.session
+        return session.packets().logout(session.salt, session.auth_info)
+
+    def _check_challenge(self, reply, random_value):
+        """
+        校验挑战数据包的返回内容，合法时记录服务器IP和Salt
+        :param reply: ChallengeReply
+        :param random_value:
+        :return: 是否为合法的返回内容
+        """
+        if reply.matches(random_value):
+            session = self.session
+            session.server_ip = reply.address[0]
+            session.salt = reply.salt
+            session.ready_flag = True
+            return True
+        logger.error("err_no:20, [DrCOM.prepare]：Receive unknown packages content: %s", reply.raw)
+        return False
+
+    def _check_login(self, reply):
+        """
+        校验登录数据包的返回内容，成功时开始新的心跳周期
+        :param reply: LoginReply
+        :return:
+        """
+        session = self.session
+        if reply.ok:
+            session.auth_info = reply.auth_info
+            session.num = session.first_num
+            session.key = b'\x00' * 4
+            session.login_flag = True
+            session.alive_flag = True
+            session.generation += 1
+            self.metrics.session_started(session.usr)
+            res = DrCOMResponse()
+            res.msg = "已经连接上校园网络"
+            return res
+
+        if reply.reason == LoginReply.WRONG_USERNAME:
+            logger.error("err_no:31, [DrCOM.login]：Failure on login because the wrong username...")
+            raise DrCOMException("Failure on login because the wrong username...")
+        if reply.reason == LoginReply.WRONG_PASSWORD:
+            logger.error("err_no:32, [DrCOM.login]：Failure on login because the wrong password...")
+            raise DrCOMException("Failure on login because the wrong password...")
+
+        logger.error("err_no:30, [DrCOM.login]：Receive unknown packages content: %s", reply.raw)
+        exception = DrCOMException("Failure on login to DrCOM...")
+        exception.last_pkg = reply.raw
+        raise exception
+
+    @staticmethod
+    def _check_alive1(reply):
+        """
+        校验类型一心跳包的返回内容
+        :param reply: AliveReply
+        :return:
+        """
+        if not reply.ok:
+            # 当收到的数据包没法识别的时候
+            logger.error("err_no:40, [DrCOM.send_alive_pkg1]：Receive unknown packages content: %s", reply.raw)
+            exception = DrCOMException("[DrCOM.send_alive_pkg1]：Receive unknown packages content...")
+            exception.last_pkg = reply.raw
+            raise exception
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[DrCOM.send_alive_pkg1]：Successful sending heartbeat package type 1...")
+
+    @staticmethod
+    def _check_alive2(reply, cls):
+        """
+        校验类型二心跳包的返回内容
+        :param reply: AliveReply
+        :param cls:
+        :return: 下一次心跳使用的key
+        """
+        if not reply.ok:
+            logger.error("err_no:50, [DrCOM.send_alive_pkg2]：Receive unknown packages content: %s", reply.raw)
+            exception = DrCOMException("[DrCOM.send_alive_pkg2]：Receive unknown packages content...")
+            exception.last_pkg = reply.raw
+            raise exception
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[DrCOM.send_alive_pkg2]：Successful sending heartbeat package 2[%s]...", cls)
+        return reply.key
+
+    @staticmethod
+    def _check_logout_challenge(reply):
+        if not reply.challenge_ok:
+            logger.error("err_no:70, [DrCOM.logout]：Receive unknown packages content: %s", reply.raw)
+            exception = DrCOMException("[DrCOM.logout]：Receive unknown packages content...")
+            exception.last_pkg = reply.raw
+            raise exception
+
+    def _check_logout(self, reply):
+        if not reply.logout_ok:
+            logger.error("err_no:71, [DrCOM.logout]：Receive unknown packages content: %s", reply.raw)
+            exception = DrCOMException("[DrCOM.logout]：Receive unknown packages content...")
+            exception.last_pkg = reply.raw
+            raise exception
+        self.session.login_flag = False
+        self._alive_stopped()
+
+    def _alive_stopped(self):
+        """
+        登出或者心跳失败，停止计算在线时长；心跳失败时仍然保持登录状态，由重新登录处理
+        :return:
+        """
+        self.session.alive_flag = False
+        self.metrics.session_stopped(self.session.usr)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+认证服务器探测
+
+挑战数据包同时发送给所有候选服务器，第一个带有相同随机值的返回胜出；
+胜出的服务器与往返时间保存在SERVER_CACHE中，下次启动时第一次只发送给缓存的服务器，
+超时之后再同时探测全部候选服务器
+"""
+
+import os
+import json
+import math
+import time
+import threading
+
+from drcom.main.logger import logger
+from drcom.configs.settings import *
+
+
+class ServerCache(object):
+    """
+    上一次可用的认证服务器，保存为一个很小的json文件
+    同一个服务器的记录最多每 interval 秒写一次磁盘，避免大量会话同时登录时频繁写文件
+    """
+
+    def __init__(self, path=None, interval=300):
+        """
+        :param path: 缓存文件路径，默认使用SERVER_CACHE
+        :param interval: 服务器没有变化时两次写入之间的最短间隔（秒）
+        """
+        self._path = path
+        self.interval = interval
+        self._record = None
+        self._loaded = False
+        self._written = 0
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self._path if self._path is not None else SERVER_CACHE
+
+    def load(self):
+        """
+        读取缓存，文件不存在、无法解析或记录中的字段不合法时返回None
+        :return: {"server": IP, "rtt": 秒, "time": 时间戳}
+        """
+        if self._loaded:
+            return self._record
+        self._loaded = True
+        if not self.path:
+            return None
+        try:
+            with open(self.path, "r") as cache:
+                record = json.loads(cache.read())
+            if self._valid(record):
+                self._record = record
+        except (OSError, ValueError):
+            pass
+        return self._record
+
+    @staticmethod
+    def _valid(record):
+        """
+        缓存文件可能被手工修改或由其它版本写入，字段类型不对的记录与无法解析的文件一样忽略
+        :param record:
+        :return:
+        """
+        if not isinstance(record, dict):
+            return False
+        server = record.get("server")
+        if not isinstance(server, str) or not server:
+            return False
+        for name in ("rtt", "time"):
+            value = record.get(name)
+            if value is None:
+                continue
+            # bool 是 int 的子类，同样不接受
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return False
+            if not math.isfinite(value) or value < 0:
+                return False
+        return True
+
+    def save(self, server, rtt):
+        """
+        记录胜出的服务器与往返时间
+        :param server:
+        :param rtt:
+        :return:
+        """
+        with self._lock:
+            previous = self.load()
+            self._record = {"server": server, "rtt": round(rtt, 6), "time": int(time.time())}
+            now = time.monotonic()
+            if previous and previous.get("server") == server and now - self._written < self.interval:
+                return
+            if not self.path:
+                return
+            temp = "{}.{}.tmp".format(self.path, os.getpid())
+            try:
+                with open(temp, "w") as cache:
+                    cache.write(json.dumps(self._record, sort_keys=True))
+                os.replace(temp, self.path)
+                self._written = now
+            except OSError as e:
+                logger.debug("[ServerCache.save]：Failure on writing %s: %s", self.path, e)
+
+
+# 默认共享的服务器缓存
+DEFAULT_CACHE = ServerCache()
+
+
+class Discovery(object):
+    """
+    一次服务器探测的发送计划
+    使用方法：
+        for attempt, timeout, servers in discovery.schedule():
+            发送给servers中的全部地址，等待timeout秒
+            成功：discovery.success(address, rtt, attempt)
+            超时：discovery.failure()
+    """
+
+    def __init__(self, policy, cache=DEFAULT_CACHE):
+        """
+        :param policy: 重传策略
+        :param cache: 服务器缓存，为None时不使用缓存
+        """
+        self.policy = policy
+        self.cache = cache
+
+        record = cache.load() if cache is not None else None
+        self.cached = record["server"] if record else None
+
+        hosts = []
+        for host in [self.cached] + list(SERVER_CANDIDATES):
+            if host and host not in hosts:
+                hosts.append(host)
+        self.servers = [(host, SERVER_PORT) for host in hosts]
+        self.primary = hosts[0] if hosts else None
+
+        # 使用缓存的往返时间作为第一个样本，缓存的服务器失效时只需要等待很短的时间
+        if self.cached and record.get("rtt"):
+            estimator = policy.estimator(self.cached)
+            if estimator.srtt is None:
+                estimator.sample(float(record["rtt"]))
+
+    def schedule(self):
+        """
+        生成每次发送的编号、等待时间与目标地址
+        :return:
+        """
+        if not self.servers:
+            return
+        for attempt, timeout in self.policy.schedule(self.primary):
+            if attempt == 0 and self.cached:
+                yield attempt, timeout, self.servers[:1]
+            else:
+                yield attempt, timeout, self.servers
+
+    def success(self, address, rtt, attempt):
+        self.policy.success(address[0], rtt, attempt)
+        if self.cache is not None:
+            self.cache.save(address[0], rtt)
+
+    def failure(self):
+        self.policy.failure(self.primary)
@@ -0,0 +1,353 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+请求与返回数据包的对应关系
+
+每个请求都有一个期望的返回签名，收到的数据包按签名找到等待它的请求：
+    0x01 0x02 + 随机值（prepare）  ->  0x02 0x02 + 随机值
+    0x01 0x03（登出准备）          ->  0x02 0x03
+    0x03 登录 / 0x06 登出          ->  0x04 / 0x05
+    0x07 心跳包二（类型cls）       ->  0x07 + 编号(num) + 0x28 ... 类型cls+1
+    0xff 心跳包一                  ->  其它 0x07（第三个字节不是0x28）
+同一轮心跳的cls 1与cls 3使用相同的编号，签名中包含类型，迟到或重复的cls 1返回不会完成cls 3的请求；
+心跳包二的返回也不会完成心跳包一的请求。找不到等待者的返回直接丢弃
+心跳包一的返回不带会话标识，内容也与会话无关（SHARED），同一端点上的多个请求可以同时等待，返回按发送顺序依次交给它们
+返回数据包的签名从精确到宽泛依次排列，找不到精确匹配的等待者时再尝试宽泛的签名
+"""
+
+import time
+import socket
+import threading
+
+CHALLENGE = 0x02
+AUTH = 0x04
+ALIVE = 0x07
+ALIVE1 = "alive1"
+
+# 返回可以交给任意一个同类请求的签名
+SHARED = frozenset([(ALIVE, ALIVE1)])
+
+
+def request_signature(pkg):
+    """
+    计算请求数据包期望的返回签名
+    :param pkg:
+    :return:
+    """
+    code = pkg[0]
+    if code == 0x01:
+        if pkg[1] == 0x02:
+            return CHALLENGE, pkg[1], bytes(pkg[2:4])
+        return CHALLENGE, pkg[1]
+    if code == 0x03 or code == 0x06:
+        return AUTH,
+    if code == 0x07:
+        # 服务器返回的类型为请求的类型加一（1 -> 2，3 -> 4）
+        return ALIVE, pkg[1], pkg[5] + 1
+    if code == 0xff:
+        return ALIVE, ALIVE1
+    return code,
+
+
+def request_key(pkg, server):
+    """
+    请求在等待表中的键，探测服务器时接受来自任意地址的返回
+    :param pkg:
+    :param server:
+    :return:
+    """
+    signature = request_signature(pkg)
+    if signature[0] == CHALLENGE and len(signature) == 3:
+        return None, signature
+    return server[0], signature
+
+
+def reply_signatures(data):
+    """
+    计算返回数据包可以匹配的签名，从精确到宽泛
+    :param data:
+    :return:
+    """
+    if not data:
+        return ()
+    code = data[0]
+    if code == 0x02 and len(data) >= 4:
+        return (CHALLENGE, data[1], bytes(data[2:4])), (CHALLENGE, data[1])
+    if code == 0x04 or code == 0x05:
+        return (AUTH,),
+    if code == 0x07:
+        if len(data) > 2 and data[2] == 0x28:
+            if len(data) > 5:
+                return (ALIVE, data[1], data[5]),
+            return ()
+        return (ALIVE, ALIVE1),
+    return (code,),
+
+
+class Dispatcher(object):
+    """
+    等待返回的请求表，以 (服务器IP, 签名) 为键
+    服务器IP为None时表示接受来自任意地址的返回（用于探测服务器）
+    """
+
+    def __init__(self):
+        self._waiters = {}
+
+    def __len__(self):
+        return len(self._waiters)
+
+    def __contains__(self, key):
+        return key in self._waiters
+
+    def waiters(self):
+        return list(self._waiters.values())
+
+    def register(self, key, waiter):
+        self._waiters[key] = waiter
+
+    def unregister(self, key, waiter):
+        if self._waiters.get(key) is waiter:
+            del self._waiters[key]
+
+    def match(self, data, address):
+        """
+        找到等待该数据包的请求，没有等待者时返回None，由调用者丢弃
+        :param data:
+        :param address:
+        :return:
+        """
+        waiters = self._waiters
+        if not waiters:
+            return None
+        host = address[0] if address else None
+        for signature in reply_signatures(data):
+            waiter = waiters.get((host, signature))
+            if waiter is None:
+                waiter = waiters.get((None, signature))
+            if waiter is not None:
+                return waiter
+        return None
+
+
+class BufferPool(object):
+    """
+    固定长度的接收缓冲区，配合 recvfrom_into 使用，避免每个数据包分配新的bytes
+    缓冲区以memoryview的形式保存，切片不拷贝数据；用完时临时分配，归还时超出 count 的部分直接丢弃
+    """
+
+    def __init__(self, count=4, length=1024):
+        self.count = count
+        self.length = length
+        self._free = [memoryview(bytearray(length)) for _ in range(count)]
+
+    def acquire(self):
+        # list.pop/append 在GIL下是原子操作
+        try:
+            return self._free.pop()
+        except IndexError:
+            return memoryview(bytearray(self.length))
+
+    def release(self, buffer):
+        if len(self._free) < self.count:
+            self._free.append(buffer)
+
+
+class _Waiter(object):
+    __slots__ = ("key", "result", "arrived")
+
+    def __init__(self, key):
+        self.key = key
+        self.result = None
+        self.arrived = None
+
+
+class SocketDispatcher(object):
+    """
+    阻塞socket上的请求与返回匹配，可以在多个线程中同时使用同一个socket，
+    也可以在同一个线程中先后 submit 多个请求再逐一 collect（流水线）
+    同一时间只有一个线程在socket上接收，收到的数据包交给对应的等待者，过期的数据包直接丢弃；
+    签名相同的请求依次进行
+    接收使用 recvfrom_into 与缓冲区池，没有等待者的数据包不产生任何拷贝；
+    capture 不为None时记录收发的全部数据包
+    """
+
+    def __init__(self, sock, capture=None):
+        self.socket = sock
+        self.capture = capture
+        self.pool = BufferPool()
+        self._local = None
+        self._waiters = Dispatcher()
+        self._cond = threading.Condition()
+        self._reading = False
+        self._aborted = False
+
+    def abort(self):
+        """
+        让正在等待与之后的请求立即以超时结束，直到 resume()；可以在任意线程中调用
+        :return:
+        """
+        with self._cond:
+            self._aborted = True
+            self._cond.notify_all()
+        # 向自己发送一个空数据包，唤醒阻塞在 recvfrom_into 中的线程
+        try:
+            host, port = self.socket.getsockname()[:2]
+            self.socket.sendto(b"", ("127.0.0.1" if host in ("", "0.0.0.0") else host, port))
+        except OSError:
+            pass
+
+    def resume(self):
+        with self._cond:
+            self._aborted = False
+
+    def exchange(self, pkg, server, timeout, fanout=(), reply=None):
+        """
+        发送数据包并等待对应的返回
+        :param pkg:
+        :param server:
+        :param timeout:
+        :param fanout: 同时发送的其它地址（探测服务器时使用），任意一个地址的返回都可以完成请求
+        :param reply: 解析返回数据包的类，例如 replies.AliveReply，在接收缓冲区归还之前调用
+        :return: reply(view, address)；reply为None时返回 (data, address)；超时触发socket.timeout
+        """
+        deadline = time.monotonic() + timeout
+        waiter = self.submit(pkg, server, deadline, fanout)
+        try:
+            return self.collect(waiter, deadline, reply)
+        finally:
+            self.cancel(waiter)
+
+    def submit(self, pkg, server, deadline, fanout=()):
+        """
+        登记等待者并发送数据包，不等待返回；之后用 collect 获取返回，用 cancel 注销
+        :param pkg:
+        :param server:
+        :param deadline: time.monotonic() 时间，签名相同的请求还没有结束时最多等待到此时
+        :param fanout:
+        :return: 等待者
+        """
+        key = request_key(pkg, server)
+        waiter = _Waiter(key)
+        cond = self._cond
+
+        with cond:
+            while key in self._waiters or self._aborted:
+                if self._aborted:
+                    raise socket.timeout("aborted")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout("timed out")
+                cond.wait(remaining)
+            self._waiters.register(key, waiter)
+
+        try:
+            self.socket.sendto(pkg, server)
+            if self.capture is not None:
+                self._record(True, server, pkg)
+            for other in fanout:
+                try:
+                    self.socket.sendto(pkg, other)
+                except OSError:
+                    # 某个候选地址不可达时不影响其它地址
+                    continue
+                if self.capture is not None:
+                    self._record(True, other, pkg)
+        except BaseException:
+            self.cancel(waiter)
+            raise
+        return waiter
+
+    def collect(self, waiter, deadline, reply=None):
+        """
+        等待 submit 的请求的返回，等待期间收到的其它数据包交给各自的等待者
+        :param waiter: submit 返回的等待者
+        :param deadline: time.monotonic() 时间
+        :param reply: 同 exchange
+        :return: 同 exchange；超时触发socket.timeout，等待者仍然有效，可以重新发送之后继续等待
+        """
+        cond = self._cond
+        while True:
+            with cond:
+                if self._aborted:
+                    raise socket.timeout("aborted")
+                result = waiter.result
+                if result is not None:
+                    waiter.result = None
+                    return self._decode(result, reply)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout("timed out")
+                if self._reading:
+                    cond.wait(remaining)
+                    continue
+                self._reading = True
+
+            buffer = self.pool.acquire()
+            size = 0
+            address = None
+            try:
+                self.socket.settimeout(remaining)
+                size, address = self.socket.recvfrom_into(buffer)
+            except socket.timeout:
+                pass
+            finally:
+                with cond:
+                    self._reading = False
+                    target = None
+                    if size:
+                        view = buffer[:size]
+                        if self.capture is not None:
+                            self._record(False, address, view)
+                        target = self._waiters.match(view, address)
+                        if target is not None and target.result is None:
+                            # 缓冲区交给等待者，解析之后由它归还
+                            target.result = (buffer, view, address)
+                            target.arrived = time.monotonic()
+                        else:
+                            target = None
+                    if target is None:
+                        self.pool.release(buffer)
+                    cond.notify_all()
+
+    def resend(self, waiter, pkg, server):
+        """
+        重传：等待者保持登记，之前发送的数据包的返回同样可以完成请求
+        :param waiter:
+        :param pkg:
+        :param server:
+        :return:
+        """
+        self.socket.sendto(pkg, server)
+        if self.capture is not None:
+            self._record(True, server, pkg)
+
+    def cancel(self, waiter):
+        """
+        注销等待者，归还没有取走的返回所占用的缓冲区
+        :param waiter:
+        :return:
+        """
+        with self._cond:
+            self._waiters.unregister(waiter.key, waiter)
+            result, waiter.result = waiter.result, None
+            self._cond.notify_all()
+        if result is not None:
+            self.pool.release(result[0])
+
+    def _decode(self, result, reply):
+        buffer, view, address = result
+        try:
+            if reply is None:
+                return bytes(view), address
+            return reply(view, address)
+        finally:
+            self.pool.release(buffer)
+
+    def _record(self, outgoing, peer, data):
+        if self._local is None:
+            self._local = self.socket.getsockname()
+        self.capture.record(outgoing, self._local, peer, data)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+本机身份信息（主机名称、MAC地址、IP地址）
+
+Linux 下从 /proc/net/route 找到默认路由所在的网卡，从 /sys/class/net 读取MAC地址，
+通过 SIOCGIFADDR 读取网卡IP地址，全部是本地操作，不会进行DNS查询，断网时也不会阻塞；
+其它平台使用 utils 中的通用方法。结果会被缓存，只有默认路由所在的网卡变化或者
+调用 invalidate() 之后才会重新获取
+"""
+
+import os
+import socket
+import struct
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from drcom.main import utils
+from drcom.main.logger import logger
+from drcom.configs.settings import *
+
+ROUTE_TABLE = "/proc/net/route"
+NET_CLASS = "/sys/class/net"
+
+SIOCGIFADDR = 0x8915
+RTF_UP = 0x0001
+
+
+def default_interface():
+    """
+    默认路由所在的网卡，多条默认路由时选择跃点数最小的一条
+    :return: 网卡名称，无法读取路由表或没有默认路由时返回None
+    """
+    try:
+        with open(ROUTE_TABLE, "r") as route:
+            lines = route.readlines()[1:]
+    except OSError:
+        return None
+    best = None
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 8 or fields[1] != "00000000" or fields[7] != "00000000":
+            continue
+        try:
+            flags, metric = int(fields[3], 16), int(fields[6])
+        except ValueError:
+            continue
+        if not flags & RTF_UP:
+            continue
+        if best is None or metric < best[0]:
+            best = (metric, fields[0])
+    return best[1] if best else None
+
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def interface_mac(iface):
+    """
+    :param iface:
+    :return: 小写无连接符的MAC地址，读取失败时返回空字符串
+    """
+    address = _read("{}/{}/address".format(NET_CLASS, iface)).replace(":", "").lower()
+    if len(address) != 12 or address == "0" * 12:
+        return ""
+    return address
+
+
+def interface_ip(iface):
+    """
+    :param iface:
+    :return: 网卡的IPv4地址，读取失败时返回空字符串
+    """
+    if fcntl is None:
+        return ""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        res = fcntl.ioctl(s.fileno(), SIOCGIFADDR, struct.pack("256s", iface[:15].encode("ascii")))
+        return socket.inet_ntoa(res[20:24])
+    except OSError:
+        return ""
+    finally:
+        s.close()
+
+
+def interfaces():
+    """
+    所有已经启用的非回环网卡
+    :return:
+    """
+    try:
+        names = sorted(os.listdir(NET_CLASS))
+    except OSError:
+        return []
+    return [name for name in names
+            if name != "lo" and _read("{}/{}/operstate".format(NET_CLASS, name)) in ("up", "unknown")]
+
+
+class HostIdentity(object):
+    """
+    带缓存的本机身份信息
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._iface = None
+        self._identity = None
+
+    def invalidate(self):
+        """
+        丢弃缓存，下一次调用 get() 时重新获取
+        :return:
+        """
+        with self._lock:
+            self._identity = None
+
+    def get(self):
+        """
+        :return: (主机名称, MAC地址, IP地址)，MAC地址为小写无连接符的字符串，无法获取的字段为空字符串
+        """
+        iface = default_interface()
+        with self._lock:
+            if self._identity is not None and iface == self._iface:
+                return self._identity
+            self._iface = iface
+            self._identity = self._discover(iface)
+            return self._identity
+
+    @staticmethod
+    def _discover(iface):
+        host_name = utils.hostname()
+
+        # 没有默认路由（例如还没有完成认证）时，选择第一个有IPv4地址的网卡
+        candidates = [iface] if iface else interfaces()
+        for name in candidates:
+            ip = interface_ip(name)
+            address = interface_mac(name)
+            if ip and address:
+                logger.debug("[HostIdentity]：%s %s %s", name, address, ip)
+                return host_name, address, ip
+
+        # 非Linux平台
+        try:
+            ip = utils.ipaddress()
+        except OSError:
+            ip = ""
+        return host_name, utils.mac(), ip
+
+
+# 默认共享的本机身份信息
+DEFAULT_HOST = HostIdentity()
@@ -4,21 +4,132 @@
 # Licensed under the GPLv3
 # 本项目由@Ryuchen开发维护，使用Python3.7
 # ==================================================
+"""
+日志
+
+    from drcom.main.logger import logger
+    logger.info("[DrCOM.login]：%s login...", usr)
+
+参数使用%格式并且延迟格式化，被过滤的日志不会产生格式化的开销；热路径上可以先用
+logger.isEnabledFor(logging.DEBUG) 判断。日志记录经由 QueueHandler 放入队列，由
+QueueListener 的后台线程写入输出流，心跳线程与事件循环不会被I/O阻塞
+频繁重复的警告（例如重传）使用 warning_limited 合并，只计数不逐条输出
+导入时不配置任何输出，由命令行、图形界面等入口调用 setup()
+"""
 
 import sys
+import time
+import queue
+import atexit
 import logging
+import threading
+import logging.handlers
 
 from drcom.configs.settings import LOG_LEVEL
 
+FORMAT = '%(asctime)s - [%(levelname)s]: %(message)s'
+
+logger = logging.getLogger("drcom")
+
+_listener = None
+
+
+def setup(level=LOG_LEVEL, stream=None):
+    """
+    配置日志输出，重复调用时只修改日志级别
+    :param level:
+    :param stream: 输出流，默认为标准输出
+    :return:
+    """
+    global _listener
+    logger.setLevel(level)
+    if _listener is not None:
+        return logger
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter(FORMAT))
+    records = queue.Queue()
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    atexit.register(shutdown)
+    return logger
+
+
+def shutdown():
+    """
+    输出队列中剩余的日志并停止后台线程
+    :return:
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in list(logger.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                logger.removeHandler(handler)
+        _listener = None
+
+
+class RateLimiter(object):
+    """
+    按键合并重复的日志，每个键每 interval 秒最多输出一条，其余的只计数，
+    下一次输出时附带被合并的条数
+    """
+
+    def __init__(self, interval=10.0):
+        self.interval = interval
+        self.counters = {}
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def log(self, level, key, msg, *args):
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            if not logger.isEnabledFor(level):
+                return
+            now = time.monotonic()
+            state = self._state.get(key)
+            if state is not None and now - state[0] < self.interval:
+                state[1] += 1
+                return
+            suppressed = state[1] if state is not None else 0
+            self._state[key] = [now, 0]
+        if suppressed:
+            logger.log(level, msg + " (%d similar messages suppressed)", *(args + (suppressed,)))
+        else:
+            logger.log(level, msg, *args)
+
+
+_limiter = RateLimiter()
+
+
+def warning_limited(key, msg, *args):
+    """
+    限流的警告
+    :param key: 合并与计数使用的键，例如 "DrCOM._send_package"
+    :param msg:
+    :param args:
+    :return:
+    """
+    _limiter.log(logging.WARNING, key, msg, *args)
+
+
+def counters():
+    """
+    :return: 每个限流键出现的总次数（包括被合并的）
+    """
+    with _limiter._lock:
+        return dict(_limiter.counters)
+
 
 class Log(object):
+    """
+    兼容旧接口，新代码请直接使用logger
+    """
+
     def __init__(self, level, err_no, msg):
-        logging.basicConfig(stream=sys.stdout, level=LOG_LEVEL, format='%(asctime)s - [%(levelname)s]: %(message)s')
-        if level == logging.DEBUG:
-            logging.debug(msg)
-        if level == logging.INFO:
-            logging.info(msg)
-        if level == logging.WARNING:
-            logging.warning(msg)
         if level == logging.ERROR:
-            logging.error("err_no:" + str(err_no) + ", " + msg)
+            logger.error("err_no:%s, %s", err_no, msg)
+        else:
+            logger.log(level, msg)
+
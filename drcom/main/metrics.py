@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+运行指标
+
+各阶段（挑战、登录、心跳包一、心跳包二cls 1/3、登出准备、登出）的耗时直方图，重传、超时、重新登录
+次数、会话在线时长，以及心跳相对计划时间的延迟。直方图的桶在创建时固定并预先分配，记录一个样本只是一次二分查找与
+几次整数加法，可以在生产环境中一直开启
+通过 snapshot() 获取JSON格式的快照，通过 prometheus() 获取Prometheus文本格式；
+METRICS_PORT 不为0时 MetricsServer 在本地提供 /metrics 与 /metrics.json
+"""
+
+import json
+import time
+import bisect
+import threading
+
+from http.server import HTTPServer
+from http.server import BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+from drcom.main.logger import logger
+from drcom.configs.settings import *
+
+# 秒，覆盖局域网内的亚毫秒返回到多次重传之后的数秒
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PHASES = ("challenge", "login", "alive1", "alive2_1", "alive2_3", "logout_challenge", "logout")
+COUNTERS = ("retransmissions", "timeouts", "relogins", "logins", "logouts", "late_heartbeats",
+            "skipped_heartbeats")
+
+
+def phase_of(pkg):
+    """
+    根据请求数据包判断所属阶段
+    :param pkg:
+    :return: 阶段名称，无法识别时返回None
+    """
+    code = pkg[0]
+    if code == 0x07:
+        return "alive2_3" if pkg[5] == 3 else "alive2_1"
+    if code == 0xff:
+        return "alive1"
+    if code == 0x01:
+        # 0x01 0x03 为登出准备，与之后的登出数据包分开记录，一次登出不会在logout中计入两次
+        return "challenge" if pkg[1] == 0x02 else "logout_challenge"
+    if code == 0x03:
+        return "login"
+    if code == 0x06:
+        return "logout"
+    return None
+
+
+class Histogram(object):
+    """
+    固定桶的直方图，counts[i] 为落在 (buckets[i-1], buckets[i]] 的样本数，最后一个为溢出桶
+    """
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """
+        :return: [(上界, 累计样本数)]，最后一个上界为 +Inf
+        """
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """
+        按桶估计分位数，返回所在桶的上界
+        :param q: 0~1
+        :return:
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics(object):
+    """
+    进程内的指标集合，可以在多个线程与事件循环中同时使用
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.created = time.time()
+        self.phases = {phase: Histogram(buckets) for phase in PHASES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.lateness = Histogram(buckets)
+        self._online = {}
+        self._lock = threading.Lock()
+
+    def observe(self, pkg, seconds):
+        """
+        记录一次请求（包括重传）从第一次发送到收到返回的耗时
+        :param pkg: 请求数据包
+        :param seconds:
+        :return:
+        """
+        histogram = self.phases.get(phase_of(pkg))
+        if histogram is not None:
+            with self._lock:
+                histogram.observe(seconds)
+
+    def heartbeat(self, lateness, skipped=0):
+        """
+        记录一轮心跳开始时相对计划时间的延迟
+        :param lateness: 秒
+        :param skipped: 因为延迟过大而跳过的轮数
+        :return: 是否迟到（超过HEARTBEAT_LATE）
+        """
+        late = lateness > HEARTBEAT_LATE
+        with self._lock:
+            self.lateness.observe(lateness)
+            if late:
+                self.counters["late_heartbeats"] += 1
+            if skipped:
+                self.counters["skipped_heartbeats"] += skipped
+        return late
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def session_started(self, key):
+        """
+        登录成功，开始计算在线时长
+        :param key: 会话标识，例如账号
+        :return:
+        """
+        with self._lock:
+            self.counters["logins"] += 1
+            self._online.setdefault(key, time.monotonic())
+
+    def session_stopped(self, key):
+        with self._lock:
+            if self._online.pop(key, None) is not None:
+                self.counters["logouts"] += 1
+
+    def uptime(self):
+        """
+        :return: 在线时间最长的会话的在线时长（秒），没有在线的会话时为0
+        """
+        with self._lock:
+            if not self._online:
+                return 0.0
+            return time.monotonic() - min(self._online.values())
+
+    def snapshot(self):
+        """
+        :return: 可以直接序列化为JSON的快照
+        """
+        uptime = self.uptime()
+        with self._lock:
+            phases = {}
+            for phase, histogram in self.phases.items():
+                phases[phase] = {
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "p50": histogram.quantile(0.5),
+                    "p99": histogram.quantile(0.99),
+                    "buckets": [[bound if bound != float("inf") else "+Inf", total]
+                                for bound, total in histogram.cumulative()],
+                }
+            lateness = self.lateness
+            return {
+                "phases": phases,
+                "heartbeat_lateness": {
+                    "count": lateness.count,
+                    "sum": round(lateness.sum, 6),
+                    "p50": lateness.quantile(0.5),
+                    "p99": lateness.quantile(0.99),
+                },
+                "counters": dict(self.counters),
+                "sessions_online": len(self._online),
+                "uptime_seconds": round(uptime, 3),
+                "created": self.created,
+            }
+
+    def prometheus(self):
+        """
+        :return: Prometheus文本格式
+        """
+        uptime = self.uptime()
+        lines = ["# HELP drcom_phase_seconds Request latency including retransmissions.",
+                 "# TYPE drcom_phase_seconds histogram"]
+        with self._lock:
+            for phase, histogram in self.phases.items():
+                for bound, total in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append('drcom_phase_seconds_bucket{phase="%s",le="%s"} %d' % (phase, le, total))
+                lines.append('drcom_phase_seconds_sum{phase="%s"} %r' % (phase, histogram.sum))
+                lines.append('drcom_phase_seconds_count{phase="%s"} %d' % (phase, histogram.count))
+            lines.append("# HELP drcom_heartbeat_lateness_seconds Delay of heartbeat rounds behind their deadline.")
+            lines.append("# TYPE drcom_heartbeat_lateness_seconds histogram")
+            for bound, total in self.lateness.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append('drcom_heartbeat_lateness_seconds_bucket{le="%s"} %d' % (le, total))
+            lines.append("drcom_heartbeat_lateness_seconds_sum %r" % self.lateness.sum)
+            lines.append("drcom_heartbeat_lateness_seconds_count %d" % self.lateness.count)
+            for name in COUNTERS:
+                lines.append("# TYPE drcom_%s_total counter" % name)
+                lines.append("drcom_%s_total %d" % (name, self.counters[name]))
+            online = len(self._online)
+        lines.append("# TYPE drcom_sessions_online gauge")
+        lines.append("drcom_sessions_online %d" % online)
+        lines.append("# TYPE drcom_session_uptime_seconds gauge")
+        lines.append("drcom_session_uptime_seconds %.3f" % uptime)
+        return "\n".join(lines) + "\n"
+
+
+# 默认共享的指标集合
+DEFAULT_METRICS = Metrics()
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        metrics = self.server.metrics
+        if self.path == "/metrics":
+            body = metrics.prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/metrics.json":
+            body = json.dumps(metrics.snapshot(), sort_keys=True).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        logger.debug("[MetricsServer]：" + fmt, *args)
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MetricsServer(object):
+    """
+    在后台线程中提供 /metrics（Prometheus）与 /metrics.json
+    """
+
+    def __init__(self, metrics=DEFAULT_METRICS, host=METRICS_HOST, port=METRICS_PORT):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address if self._server is not None else None
+
+    def start(self):
+        if self._server is None:
+            self._server = _Server((self.host, self.port), _Handler)
+            self._server.metrics = self.metrics
+            self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsServer", daemon=True)
+            self._thread.start()
+            logger.info("[MetricsServer]：Serving metrics on http://%s:%s/metrics...", *self.address[:2])
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = self._thread = None
+
+
+def serve(metrics=DEFAULT_METRICS):
+    """
+    METRICS_PORT 不为0时启动指标服务
+    :param metrics:
+    :return: MetricsServer，未启用时返回None
+    """
+    if not METRICS_PORT:
+        return None
+    try:
+        return MetricsServer(metrics).start()
+    except OSError as e:
+        logger.warning("[MetricsServer]：Failure on binding %s:%s: %s", METRICS_HOST, METRICS_PORT, e)
+        return None
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import time
+import socket
+import struct
+
+from drcom.main.utils import md5
+from drcom.main.utils import checksum
+from drcom.configs.settings import *
+
+_TIME = struct.Struct('!H')
+
+
+class PacketTemplate(object):
+    """
+    单个会话的数据包模板
+    固定字段在创建时一次性写入预分配的bytearray，之后只修补与salt相关的摘要、
+    编号、key、时间戳和校验和；与salt相关的摘要按salt缓存
+    返回的bytearray会被下一次调用复用，需要保留时请自行拷贝
+    """
+    __slots__ = ("usr", "pwd", "mac", "ip", "host_name", "_pwd", "_salt", "_auth_info",
+                 "_login", "_alive1", "_alive2", "_logout")
+
+    def __init__(self, usr, pwd, mac, ip, host_name):
+        self.usr = usr
+        self.pwd = pwd
+        self.mac = mac
+        self.ip = ip
+        self.host_name = host_name
+
+        self._pwd = pwd.encode('ascii')
+        self._salt = None
+        self._auth_info = None
+
+        user = usr.encode('ascii')[:36].ljust(36, b'\x00')
+        # (0:3 4) Header = Code + Type + EOF + (UserName Length + 20)
+        header = struct.pack('B', (len(usr) + 20) & 0xff)
+
+        # 登录数据包 330 字节，未写入的字段保持为0
+        login = bytearray(330)
+        login[0:4] = b'\x03\x01\x00' + header
+        # (4:19 16) MD5_A，与salt相关
+        # (20:55 36) 用户名
+        login[20:56] = user
+        # (56:56 1) 控制检查状态
+        login[56:57] = CONTROL_CHECK_STATUS
+        # (57:57 1) 适配器编号？
+        login[57:58] = ADAPTER_NUMBER
+        # (58:63 6) (MD5_A xor MAC)，与salt相关
+        # (64:79 16) MD5_B，与salt相关
+        # (80:80 1) NIC Count
+        login[80] = 0x01
+        # (81:84 4) 本机IP，(85:96 12) ip地址 2、3、4
+        login[81:85] = socket.inet_aton(ip)
+        # (97:104 8) 校验和A，与salt相关
+        # (105:105 1) IP Dog
+        login[105:106] = IP_DOG
+        # (110:141 32) 主机名
+        login[110:142] = host_name.encode('ascii')[:32].ljust(32, b'\x00')
+        # (142:145 4) 主要dns: 114.114.114.114
+        login[142:146] = b'\x72\x72\x72\x72'
+        # (146:149 4) DHCP服务器IP
+        login[146:150] = socket.inet_aton(DHCP_SERVER_IP)
+        # (150:153 4) 备用dns:8.8.8.8
+        login[150:154] = b'\x08\x08\x08\x08'
+        # (162:165 4) 未知，(166:177 12) OS major、minor、build，(178:181 4) 未知 OS相关
+        login[162:182] = b'\x94\x00\x00\x00\x06\x00\x00\x00\x01\x00\x00\x00\xb1\x1d\x00\x00\x02\x00\x00\x00'
+        # (182:213 32) 操作系统名称
+        login[182:214] = "WINDOWS".encode('ascii').ljust(32, b'\x00')
+        # (214:309 96) 未知 不同客户端有差异，BISTU版此字段包含一段识别符，但不影响登陆
+        # (310:311 2)
+        login[310:312] = AUTH_VERSION
+        # (312:313 2) 未知
+        login[312:314] = b'\x02\x0c'
+        # (314:317 4) 校验和，与salt相关
+        # (320:325 6) 本机MAC
+        login[320:326] = mac
+        # (326:327 2) auto logout、broadcast mode，默认为False
+        # (328:329 2) 未知 不同客户端有差异
+        login[328:330] = b'\x17\x77'
+        self._login = login
+
+        # 类型一心跳数据包 41 字节
+        self._alive1 = bytearray(41)
+        self._alive1[0] = 0xff
+
+        # 类型二心跳数据包，cls 1 与 cls 3 各一份，按cls下标存放
+        self._alive2 = [None] * 4
+        for cls in (1, 3):
+            alive = bytearray(40)
+            alive[0] = 0x07
+            alive[2:5] = b'\x28\x00\x0b'
+            alive[5] = cls
+            alive[8:10] = b'\x2f\x79'
+            if cls == 3:
+                alive[28:32] = socket.inet_aton(ip)
+            self._alive2[cls] = alive
+
+        # 登出数据包 80 字节
+        logout = bytearray(80)
+        logout[0:4] = b'\x06\x01\x00' + header
+        logout[20:56] = user
+        logout[56:57] = CONTROL_CHECK_STATUS
+        logout[57:58] = ADAPTER_NUMBER
+        self._logout = logout
+
+    def matches(self, usr, pwd, mac, ip, host_name):
+        return (self.usr == usr and self.pwd == pwd and self.mac == mac and
+                self.ip == ip and self.host_name == host_name)
+
+    def _set_salt(self, salt):
+        """
+        salt变化时重新计算所有与salt相关的字段
+        :param salt:
+        :return:
+        """
+        if salt == self._salt:
+            return
+        mac = int.from_bytes(self.mac, 'big')
+
+        # 登录数据包
+        login = self._login
+        # (4:19 16) MD5_A = MD5(Code + Type + Salt + Password)
+        md5_a = md5(b'\x03\x01' + salt + self._pwd)
+        login[4:20] = md5_a
+        # (58:63 6) (MD5_A xor MAC)
+        login[58:64] = (int.from_bytes(md5_a[:6], 'big') ^ mac).to_bytes(6, 'big')
+        # (64:79 16) MD5_B = MD5(0x01 + Password + Salt + 0x00 *4)
+        login[64:80] = md5(b'\x01' + self._pwd + salt + b'\x00' * 4)
+        # (97:104 8) 校验和A
+        login[97:105] = md5(bytes(login[:97]) + b'\x14\x00\x07\x0b')[:8]
+        # (314:317 4) 校验和
+        login[314:318] = checksum(bytes(login[:314]) + b'\x01\x26\x07\x11\x00\x00' + self.mac)
+
+        # 类型一心跳数据包与登录使用同一个MD5_A
+        self._alive1[1:17] = md5_a
+
+        # 登出数据包
+        logout = self._logout
+        md5_a = md5(b'\x06\x01' + salt + self._pwd)
+        logout[4:20] = md5_a
+        logout[58:64] = (int.from_bytes(md5_a[:6], 'big') ^ mac).to_bytes(6, 'big')
+
+        self._salt = salt
+
+    def _set_auth_info(self, auth_info):
+        if auth_info == self._auth_info:
+            return
+        self._alive1[20:36] = auth_info[:16].ljust(16, b'\x00')
+        self._logout[64:80] = auth_info[:16].ljust(16, b'\x00')
+        self._auth_info = auth_info
+
+    def login(self, salt):
+        """
+        登录数据包
+        :param salt:
+        :return:
+        """
+        self._set_salt(salt)
+        return self._login
+
+    def alive1(self, salt, auth_info):
+        """
+        类型一心跳数据包，每次只修补时间戳
+        :param salt:
+        :param auth_info:
+        :return:
+        """
+        self._set_salt(salt)
+        self._set_auth_info(auth_info)
+        _TIME.pack_into(self._alive1, 36, int(time.time()) % 0xFFFF)
+        return self._alive1
+
+    def alive2(self, num, key, cls, first=None):
+        """
+        类型二心跳数据包，每次只修补编号、版本和key
+        :param num:
+        :param key:
+        :param cls:
+        :param first: 是否为登录之后的第一轮心跳，为None时按 num == 0 判断
+        :return:
+        """
+        if first is None:
+            first = num == 0
+        alive = self._alive2[cls] if cls < len(self._alive2) else None
+        if alive is None:
+            alive = bytearray(24)
+            alive[0] = 0x07
+            alive[2:5] = b'\x28\x00\x0b'
+            alive[5] = cls
+            alive[8:10] = b'\x2f\x79'
+            if cls >= len(self._alive2):
+                self._alive2.extend([None] * (cls + 1 - len(self._alive2)))
+            self._alive2[cls] = alive
+        alive[1] = num & 0xff
+        # (6:7 2) BISTU版此字段不会变化
+        alive[6:8] = b'\xdc\x02' if first else KEEP_ALIVE_VERSION
+        alive[16:20] = key if len(key) == 4 else key[:4].ljust(4, b'\x00')
+        return alive
+
+    def logout(self, salt, auth_info):
+        """
+        登出数据包
+        :param salt:
+        :param auth_info:
+        :return:
+        """
+        self._set_salt(salt)
+        self._set_auth_info(auth_info)
+        return self._logout
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+网络连通性检测
+
+同时检测 PROBE_TARGETS 中的全部目标，每个目标有自己的超时时间：
+    ("tcp", host, port)    TCP连接成功即可达
+    ("dns", host, port)    UDP DNS查询，收到相同ID的返回即可达（不论查询结果）
+    ("drcom", host, port)  Dr.COM挑战数据包，收到 0x02 0x02 + 随机值 即可达
+目标后面可以追加第四个元素作为该目标的超时时间（秒）
+达到法定数量（quorum）的目标可达时判定为在线；结果缓存 ttl 秒，图形界面、命令行与
+重新登录共用同一个检测结果。所有socket都是非阻塞的，不修改 socket.setdefaulttimeout
+"""
+
+import os
+import time
+import errno
+import random
+import socket
+import selectors
+import threading
+
+from drcom.main.logger import logger
+from drcom.configs.settings import *
+
+_IN_PROGRESS = {0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY,
+                getattr(errno, "WSAEWOULDBLOCK", errno.EWOULDBLOCK)}
+
+
+class ProbeResult(object):
+    """
+    单个目标的检测结果
+    ok 为 True/False，提前得出结论时还没有完成的目标为 None
+    """
+    __slots__ = ("kind", "host", "port", "ok", "latency", "error")
+
+    def __init__(self, kind, host, port):
+        self.kind = kind
+        self.host = host
+        self.port = port
+        self.ok = None
+        self.latency = None
+        self.error = ""
+
+    def __repr__(self):
+        if self.ok:
+            state = "{:.1f}ms".format(self.latency * 1e3)
+        elif self.ok is None:
+            state = "skipped"
+        else:
+            state = self.error or "failed"
+        return "{}://{}:{} {}".format(self.kind, self.host, self.port, state)
+
+
+class Verdict(object):
+    """
+    一次检测的结论，可以直接作为布尔值使用
+    """
+
+    def __init__(self, online, results, quorum):
+        self.online = online
+        self.results = results
+        self.quorum = quorum
+        self.time = time.monotonic()
+
+    def __bool__(self):
+        return self.online
+
+    @property
+    def reachable(self):
+        return sum(1 for result in self.results if result.ok)
+
+    @property
+    def latency(self):
+        """
+        :return: 可达目标中最小的延迟（秒），没有可达目标时为None
+        """
+        latencies = [result.latency for result in self.results if result.ok]
+        return min(latencies) if latencies else None
+
+    def __repr__(self):
+        return "{} {}/{} [{}]".format("online" if self.online else "offline", self.reachable, self.quorum,
+                                      ", ".join(repr(result) for result in self.results))
+
+
+def _dns_query():
+    """
+    查询根域名的NS记录
+    :return: (数据包, 返回数据包的前缀)
+    """
+    ident = os.urandom(2)
+    return ident + b'\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00' + b'\x00\x00\x02\x00\x01', ident
+
+
+def _challenge():
+    """
+    与 DrCOMClient._make_challenge_package 相同格式的挑战数据包
+    :return: (数据包, 返回数据包的前缀)
+    """
+    random_value = random.getrandbits(16).to_bytes(2, 'little')
+    return b'\x01\x02' + random_value + b'\x0a' + b'\x00' * 15, b'\x02\x02' + random_value
+
+
+class _Probe(object):
+    __slots__ = ("result", "socket", "expect", "start", "deadline")
+
+    def __init__(self, target, timeout):
+        kind, host, port = target[:3]
+        self.result = ProbeResult(kind, host, port)
+        self.start = time.monotonic()
+        self.deadline = self.start + (target[3] if len(target) > 3 else timeout)
+        self.expect = None
+
+        if kind == "tcp":
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setblocking(False)
+            err = self.socket.connect_ex((host, port))
+            if err not in _IN_PROGRESS:
+                self.socket.close()
+                raise OSError(err, os.strerror(err))
+        elif kind in ("dns", "drcom"):
+            payload, self.expect = _dns_query() if kind == "dns" else _challenge()
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setblocking(False)
+            try:
+                # 连接之后只会收到来自目标的数据包，ICMP不可达也会作为错误返回
+                self.socket.connect((host, port))
+                self.socket.send(payload)
+            except OSError:
+                self.socket.close()
+                raise
+        else:
+            raise ValueError("unknown probe type: {}".format(kind))
+
+    @property
+    def events(self):
+        return selectors.EVENT_WRITE if self.expect is None else selectors.EVENT_READ
+
+    def ready(self):
+        """
+        socket可读或可写时调用
+        :return: 是否已经得出该目标的结果
+        """
+        result = self.result
+        try:
+            if self.expect is None:
+                err = self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if err:
+                    raise OSError(err, os.strerror(err))
+            else:
+                data = self.socket.recv(1024)
+                if not data.startswith(self.expect):
+                    return False
+        except OSError as e:
+            result.ok = False
+            result.error = e.strerror or str(e)
+            return True
+        result.ok = True
+        result.latency = time.monotonic() - self.start
+        return True
+
+    def close(self):
+        self.socket.close()
+
+
+def probe(targets, quorum, timeout):
+    """
+    同时检测全部目标，达到法定数量或者已经不可能达到时提前返回
+    :param targets:
+    :param quorum: 判定为在线需要的可达目标数量，大于目标数量时按目标数量计算
+    :param timeout: 没有单独指定超时时间的目标使用的超时时间
+    :return: Verdict
+    """
+    quorum = max(min(quorum, len(targets)), 1)
+    results = []
+    pending = {}
+    selector = selectors.DefaultSelector()
+    try:
+        for target in targets:
+            try:
+                item = _Probe(target, timeout)
+            except (OSError, ValueError) as e:
+                result = ProbeResult(*target[:3])
+                result.ok = False
+                result.error = getattr(e, "strerror", None) or str(e)
+                results.append(result)
+                continue
+            results.append(item.result)
+            pending[item.socket] = item
+            selector.register(item.socket, item.events, item)
+
+        while pending:
+            succeeded = sum(1 for result in results if result.ok)
+            if succeeded >= quorum or succeeded + len(pending) < quorum:
+                break
+            now = time.monotonic()
+            for item in [item for item in pending.values() if item.deadline <= now]:
+                item.result.ok = False
+                item.result.error = "timeout"
+                selector.unregister(item.socket)
+                del pending[item.socket]
+                item.close()
+            if not pending:
+                break
+            remaining = min(item.deadline for item in pending.values()) - now
+            for key, _ in selector.select(max(remaining, 0)):
+                item = key.data
+                if item.ready():
+                    selector.unregister(item.socket)
+                    del pending[item.socket]
+                    item.close()
+    finally:
+        for item in pending.values():
+            item.close()
+        selector.close()
+
+    online = sum(1 for result in results if result.ok) >= quorum
+    return Verdict(online, results, quorum)
+
+
+class Prober(object):
+    """
+    带缓存的连通性检测，可以在多个线程中同时使用
+    同一时间只进行一次检测，其它调用者等待并共用该结果
+    """
+
+    def __init__(self, targets=None, quorum=PROBE_QUORUM, timeout=PROBE_TIMEOUT, ttl=PROBE_TTL):
+        """
+        :param targets: 检测目标，默认使用PROBE_TARGETS
+        :param quorum: 判定为在线需要的可达目标数量
+        :param timeout: 单个目标的默认超时时间（秒）
+        :param ttl: 检测结果的缓存时间（秒）
+        """
+        self.targets = list(targets if targets is not None else PROBE_TARGETS)
+        self.quorum = quorum
+        self.timeout = timeout
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._verdict = None
+
+    def invalidate(self):
+        self._verdict = None
+
+    def check(self, force=False):
+        """
+        :param force: 忽略缓存的结果
+        :return: Verdict
+        """
+        with self._lock:
+            verdict = self._verdict
+            if not force and verdict is not None and time.monotonic() - verdict.time < self.ttl:
+                return verdict
+            verdict = self._verdict = probe(self.targets, self.quorum, self.timeout)
+            logger.debug("[Prober.check]：%s", verdict)
+            return verdict
+
+
+# 默认共享的连通性检测
+DEFAULT_PROBER = Prober()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+返回数据包的解析
+
+返回数据包以memoryview的形式交给这里的类解析，解析只在接收缓冲区仍然有效时进行：
+只拷贝之后还需要使用的字段（salt、auth_info、key），其它字段读取为整数；
+类型码不是成功的类型码时额外保留一份完整的拷贝（raw），用于错误信息与 last_pkg
+"""
+
+
+class Reply(object):
+    """
+    返回数据包的基类，子类在 __init__ 中直接解析各自的字段（热路径上不调用super）
+    """
+    __slots__ = ("code", "address", "raw")
+
+    # 成功时的类型码
+    SUCCESS = ()
+
+    def __init__(self, view, address):
+        """
+        :param view: 返回数据包，memoryview或者bytes
+        :param address: 来源地址
+        """
+        self.address = address
+        self.code = view[0] if len(view) else -1
+        self.raw = None if self.code in self.SUCCESS else bytes(view)
+
+    @property
+    def ok(self):
+        return self.raw is None
+
+    def __repr__(self):
+        return "<{} code=0x{:02x} from {}>".format(self.__class__.__name__, self.code & 0xff, self.address)
+
+
+class ChallengeReply(Reply):
+    """
+    0x02 0x02 + 随机值(2) + salt(4)
+    """
+    __slots__ = ("token", "salt")
+
+    SUCCESS = (0x02,)
+
+    def __init__(self, view, address):
+        self.address = address
+        if len(view) >= 8 and view[0] == 0x02 and view[1] == 0x02:
+            self.code = 0x02
+            self.raw = None
+            self.token = view[2] | view[3] << 8
+            self.salt = bytes(view[4:8])
+        else:
+            self.code = view[0] if len(view) else -1
+            self.raw = bytes(view)
+            self.token = None
+            self.salt = b""
+
+    def matches(self, random_value):
+        """
+        :param random_value: 挑战数据包中的随机值（小端序2字节）
+        :return:
+        """
+        return self.token is not None and self.token == int.from_bytes(random_value, "little")
+
+
+class LoginReply(Reply):
+    """
+    0x04 登录成功，auth_info 位于 23:39；0x05 登录失败，原因位于第32字节
+    """
+    __slots__ = ("auth_info", "reason")
+
+    SUCCESS = (0x04,)
+
+    # 登录失败的原因
+    WRONG_USERNAME = 0x31
+    WRONG_PASSWORD = 0x33
+
+    def __init__(self, view, address):
+        self.address = address
+        self.code = code = view[0] if len(view) else -1
+        if code == 0x04:
+            self.raw = None
+            self.auth_info = bytes(view[23:39])
+            self.reason = None
+        else:
+            self.raw = bytes(view)
+            self.auth_info = b""
+            self.reason = view[32] if code == 0x05 and len(view) > 32 else None
+
+
+class AliveReply(Reply):
+    """
+    0x07 + 编号(num) + ...，心跳包二的返回中下一次使用的key位于 16:20
+    """
+    __slots__ = ("num", "key")
+
+    SUCCESS = (0x07,)
+
+    def __init__(self, view, address):
+        self.address = address
+        if len(view) > 1 and view[0] == 0x07:
+            self.code = 0x07
+            self.raw = None
+            self.num = view[1]
+            self.key = bytes(view[16:20])
+        else:
+            self.code = view[0] if len(view) else -1
+            self.raw = bytes(view)
+            self.num = 0
+            self.key = b""
+
+
+class LogoutReply(Reply):
+    """
+    登出准备的返回 0x02 0x03，登出的返回 0x04
+    """
+    __slots__ = ("kind",)
+
+    SUCCESS = (0x02, 0x04)
+
+    def __init__(self, view, address):
+        self.address = address
+        self.code = view[0] if len(view) else -1
+        self.kind = view[1] if len(view) > 1 else -1
+        self.raw = None if self.challenge_ok or self.logout_ok else bytes(view)
+
+    @property
+    def challenge_ok(self):
+        return self.code == 0x02 and self.kind == 0x03
+
+    @property
+    def logout_ok(self):
+        return self.code == 0x04
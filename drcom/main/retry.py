@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+自适应重传超时
+
+每个服务器按 RFC 6298 估计 SRTT/RTTVAR 计算重传超时(RTO)，按Karn算法只使用没有重传过的
+请求作为样本；超时之后RTO指数退避并加入随机抖动，单个请求受总时限约束
+"""
+
+import time
+import random
+
+from drcom.configs.settings import *
+
+
+class RTTEstimator(object):
+    """
+    单个服务器的往返时间估计
+    """
+
+    ALPHA = 0.125
+    BETA = 0.25
+    K = 4
+    # 时钟粒度
+    G = 0.001
+
+    def __init__(self, initial=RTO_INITIAL, minimum=RTO_MIN, maximum=RTO_MAX):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.srtt = None
+        self.rttvar = None
+        self.rto = min(max(initial, minimum), maximum)
+
+    def sample(self, rtt):
+        """
+        使用一次没有重传的往返时间更新估计值
+        :param rtt: 秒
+        :return:
+        """
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.rto = min(max(self.srtt + max(self.G, self.K * self.rttvar), self.minimum), self.maximum)
+
+    def backoff(self):
+        """
+        超时之后RTO加倍，直到下一次有效的样本
+        :return:
+        """
+        self.rto = min(self.rto * 2, self.maximum)
+
+
+class RetryPolicy(object):
+    """
+    重传策略，命令行、图形界面与SessionManager共用
+    使用方法：
+        for attempt, timeout in policy.schedule(host):
+            发送，等待timeout秒
+            成功：policy.success(host, rtt, attempt)
+            超时：policy.failure(host)
+    """
+
+    def __init__(self, attempts=ReTryTimes, deadline=OPERATION_DEADLINE, initial=RTO_INITIAL,
+                 minimum=RTO_MIN, maximum=RTO_MAX, jitter=0.25):
+        """
+        :param attempts: 单个请求最多发送的次数
+        :param deadline: 单个请求（包括重传）的总时限
+        :param initial: 还没有样本时的RTO
+        :param minimum: RTO下限
+        :param maximum: RTO上限
+        :param jitter: 每次等待时间随机增加的比例上限，避免多个会话同时重传
+        """
+        self.attempts = attempts
+        self.deadline = deadline
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.jitter = jitter
+        self._estimators = {}
+
+    def estimator(self, host):
+        estimator = self._estimators.get(host)
+        if estimator is None:
+            estimator = self._estimators[host] = RTTEstimator(self.initial, self.minimum, self.maximum)
+        return estimator
+
+    def rto(self, host):
+        return self.estimator(host).rto
+
+    def schedule(self, host):
+        """
+        生成每次发送的编号与等待时间，超过总时限之后不再生成
+        :param host:
+        :return:
+        """
+        estimator = self.estimator(host)
+        deadline = time.monotonic() + self.deadline
+        for attempt in range(self.attempts):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            timeout = estimator.rto
+            if self.jitter:
+                timeout = timeout * (1 + random.random() * self.jitter)
+            yield attempt, min(timeout, remaining)
+
+    def success(self, host, rtt, attempt):
+        """
+        收到返回，Karn算法：重传过的请求无法确定返回对应哪一次发送，不作为样本
+        :param host:
+        :param rtt:
+        :param attempt:
+        :return:
+        """
+        if attempt == 0:
+            self.estimator(host).sample(rtt)
+
+    def failure(self, host):
+        self.estimator(host).backoff()
+
+
+# 默认共享的重传策略
+DEFAULT_POLICY = RetryPolicy()
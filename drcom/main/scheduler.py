@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+单线程调度器
+
+心跳、连通性检测、重新登录的退避等待以及网卡变化的监听都在同一个线程中执行：
+定时器保存在按到期时间排序的堆中，文件描述符（例如rtnetlink socket）注册在selector中，
+线程在 select() 中一直阻塞到最近的到期时间或者有数据可读，两次到期之间不会被唤醒。
+其它线程添加定时器时通过一对socket唤醒调度线程。
+
+回调在调度线程中依次执行，耗时的回调会推迟之后到期的定时器；回调抛出的异常只记录日志
+SessionManager 中的会话运行在asyncio事件循环上，事件循环本身就是同样的定时器堆，不需要这里的调度器
+
+Cadence 计算周期任务（心跳）的绝对截止时间，命令行、图形界面与asyncio会话共用
+"""
+
+import time
+import heapq
+import random
+import socket
+import itertools
+import selectors
+import threading
+
+from drcom.main.logger import logger
+from drcom.main.logger import warning_limited
+from drcom.configs.settings import *
+
+
+class Timer(object):
+    """
+    call_at/call_later 返回的定时器，cancel() 之后不再执行
+    """
+    __slots__ = ("deadline", "sequence", "callback", "args", "cancelled")
+
+    def __init__(self, deadline, sequence, callback, args):
+        self.deadline = deadline
+        self.sequence = sequence
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other):
+        # 到期时间相同的定时器按添加顺序执行
+        return (self.deadline, self.sequence) < (other.deadline, other.sequence)
+
+    def cancel(self):
+        self.cancelled = True
+        self.callback = self.args = None
+
+    def __repr__(self):
+        return "<Timer {:.3f} {}>".format(self.deadline, "cancelled" if self.cancelled else self.callback)
+
+
+class Scheduler(object):
+    """
+    定时器堆加selector的单线程事件循环，start() 在后台线程中运行，run() 在当前线程中运行
+    """
+
+    def __init__(self, name="Scheduler"):
+        self.name = name
+        self._heap = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._selector = None
+        self._wakeup = None
+        self._thread = None
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def __len__(self):
+        return sum(1 for timer in self._heap if not timer.cancelled)
+
+    def call_at(self, deadline, callback, *args):
+        """
+        :param deadline: time.monotonic() 时间
+        :param callback:
+        :param args:
+        :return: Timer
+        """
+        timer = Timer(deadline, next(self._sequence), callback, args)
+        with self._lock:
+            heapq.heappush(self._heap, timer)
+            earliest = self._heap[0] is timer
+        if earliest:
+            self._wake()
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(time.monotonic() + delay, callback, *args)
+
+    def call_soon(self, callback, *args):
+        return self.call_at(time.monotonic(), callback, *args)
+
+    def submit(self, callback, *args):
+        """
+        在调度线程中立即执行；调度器没有运行时直接在当前线程中执行
+        :param callback:
+        :param args:
+        :return:
+        """
+        if not self._running or threading.current_thread() is self._thread:
+            callback(*args)
+        else:
+            self.call_soon(callback, *args)
+
+    def add_reader(self, fileobj, callback):
+        """
+        fileobj 可读时在调度线程中调用 callback(fileobj)
+        :param fileobj: socket等有fileno()的对象
+        :param callback:
+        :return:
+        """
+        self.submit(self._ensure_selector().register, fileobj, selectors.EVENT_READ, callback)
+
+    def remove_reader(self, fileobj):
+        self.submit(self._unregister, fileobj)
+
+    def _unregister(self, fileobj):
+        try:
+            self._selector.unregister(fileobj)
+        except (KeyError, ValueError, AttributeError):
+            pass
+
+    def _ensure_selector(self):
+        with self._lock:
+            if self._selector is None:
+                self._selector = selectors.DefaultSelector()
+                self._wakeup = socket.socketpair()
+                for sock in self._wakeup:
+                    sock.setblocking(False)
+                self._selector.register(self._wakeup[0], selectors.EVENT_READ, None)
+        return self._selector
+
+    def _wake(self):
+        if self._running and self._wakeup is not None and threading.current_thread() is not self._thread:
+            try:
+                self._wakeup[1].send(b"\x00")
+            except OSError:
+                # 缓冲区已满说明已经有未处理的唤醒
+                pass
+
+    def start(self):
+        """
+        在后台线程中运行，已经运行时什么也不做
+        :return:
+        """
+        with self._lock:
+            if self._running:
+                return self
+            self._running = True
+        self._ensure_selector()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        """
+        在当前线程中运行，直到 stop()
+        :return:
+        """
+        with self._lock:
+            if self._running:
+                raise RuntimeError("Scheduler is already running")
+            self._running = True
+        self._ensure_selector()
+        self._thread = threading.current_thread()
+        self._loop()
+
+    def stop(self):
+        """
+        停止调度线程，未到期的定时器保留，再次 start() 之后继续执行
+        :return:
+        """
+        thread = self._thread
+        self._running = False
+        if thread is not None and thread is not threading.current_thread() and thread.is_alive():
+            try:
+                self._wakeup[1].send(b"\x00")
+            except OSError:
+                pass
+            thread.join()
+        self._thread = None
+
+    def _timeout(self):
+        """
+        :return: 距离最近的到期时间的秒数，没有定时器时为None（一直阻塞）
+        """
+        heap = self._heap
+        with self._lock:
+            while heap and heap[0].cancelled:
+                heapq.heappop(heap)
+            if not heap:
+                return None
+            return max(heap[0].deadline - time.monotonic(), 0)
+
+    def _pop(self):
+        """
+        :return: 已经到期的第一个定时器，没有时返回None
+        """
+        heap = self._heap
+        now = time.monotonic()
+        with self._lock:
+            while heap and heap[0].deadline <= now:
+                timer = heapq.heappop(heap)
+                if not timer.cancelled:
+                    return timer
+        return None
+
+    def _loop(self):
+        selector = self._selector
+        wakeup = self._wakeup[0]
+        try:
+            while self._running:
+                for key, _ in selector.select(self._timeout()):
+                    if key.fileobj is wakeup:
+                        try:
+                            while wakeup.recv(512):
+                                pass
+                        except OSError:
+                            pass
+                    else:
+                        self._invoke(key.data, (key.fileobj,))
+                while self._running:
+                    timer = self._pop()
+                    if timer is None:
+                        break
+                    self._invoke(timer.callback, timer.args)
+        finally:
+            self._running = False
+
+    @staticmethod
+    def _invoke(callback, args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error("err_no:110, [Scheduler]：Failure on running %s: %s", callback, e)
+
+
+class Cadence(object):
+    """
+    按 time.monotonic() 的绝对时间计算心跳的截止时间，第k轮为 anchor + k * interval，
+    执行耗时与重传不会累积到之后的周期上
+    anchor 为开始时间加上每个会话固定的随机相位 [0, jitter)，大量会话不会同时发送，
+    同一个会话相邻两轮的计划间隔始终为 interval
+    错过截止时间的一轮立即执行；错过多轮时只补一轮，其余计入 skipped，之后回到原来的节奏上
+    """
+    __slots__ = ("interval", "anchor", "rounds", "skipped")
+
+    def __init__(self, interval, jitter=HEARTBEAT_JITTER, now=None):
+        """
+        :param interval: 周期（秒）
+        :param jitter: 随机相位的上限（秒），不超过interval
+        :param now: 开始时间，默认为当前的 time.monotonic()
+        """
+        self.interval = interval
+        self.anchor = (time.monotonic() if now is None else now) + random.uniform(0, min(jitter, interval))
+        self.rounds = 0
+        self.skipped = 0
+
+    @property
+    def deadline(self):
+        return self.anchor + self.rounds * self.interval
+
+    def begin(self, metrics, now=None):
+        """
+        一轮开始执行时调用，记录相对截止时间的延迟
+        :param metrics: drcom.main.metrics.Metrics
+        :param now:
+        :return: 延迟（秒）
+        """
+        lateness = max((time.monotonic() if now is None else now) - self.deadline, 0.0)
+        if metrics.heartbeat(lateness, self.skipped):
+            warning_limited("Cadence", "[DrCOM.keep_alive]：Heartbeat is %.3fs behind schedule, %d rounds skipped...",
+                            lateness, self.skipped)
+        self.skipped = 0
+        return lateness
+
+    def advance(self, now=None):
+        """
+        一轮执行完成之后调用
+        :param now:
+        :return: 下一轮的截止时间，已经错过时小于当前时间（应立即执行）
+        """
+        now = time.monotonic() if now is None else now
+        self.rounds += 1
+        overdue = int((now - self.anchor) // self.interval) - self.rounds
+        if overdue > 0:
+            self.rounds += overdue
+            self.skipped += overdue
+        return self.deadline
+
+    def delay(self, now=None):
+        """
+        :param now:
+        :return: 距离本轮截止时间的秒数，已经错过时为0
+        """
+        return max(self.deadline - (time.monotonic() if now is None else now), 0.0)
+
+
+# 默认共享的调度器，命令行的心跳、连通性检测与网卡监听都在它的线程中执行
+DEFAULT_SCHEDULER = Scheduler("MagicDrCOM")
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import asyncio
+
+from drcom.main.aio import DrCOMProtocol
+from drcom.main.aio import AsyncDrCOMClient
+from drcom.main.retry import DEFAULT_POLICY
+from drcom.main.metrics import DEFAULT_METRICS
+from drcom.main.capture import DEFAULT_CAPTURE
+from drcom.main.capture import dump_on_error
+from drcom.main.logger import logger
+from drcom.main.excepts import DrCOMException
+from drcom.main.excepts import TimeoutException
+from drcom.main.excepts import MagicDrCOMException
+from drcom.configs.settings import *
+
+
+def _current_task():
+    # asyncio.current_task 从Python 3.7开始提供
+    current = getattr(asyncio, "current_task", None)
+    if current is None:
+        return asyncio.Task.current_task()
+    return current()
+
+
+class DrCOMSession(AsyncDrCOMClient):
+    """
+    由SessionManager管理的单个账号会话
+    每个会话拥有自己的salt、auth_info、num和key（见core.Session），本机信息与UDP端点由SessionManager共享
+    """
+    __slots__ = ()
+
+    def __init__(self, usr, pwd, protocol, host):
+        super(DrCOMSession, self).__init__(usr, pwd)
+        self.protocol = protocol
+        self.session.host_name, self.session.mac, self.session.ip = host
+
+    async def _setup(self):
+        """
+        本机信息与UDP端点已经由SessionManager准备好
+        :return:
+        """
+
+    def close(self):
+        # 共享的UDP端点由SessionManager负责关闭
+        self.protocol = None
+
+
+class SessionManager(object):
+    """
+    在同一个进程、同一个事件循环中管理多个账号的会话
+    所有会话复用一组UDP端点（默认只有一个，绑定LOCAL_PORT端口），返回的数据包按
+    来源地址、类型和编号交给对应的会话
+
+    同一个端点上的请求按返回签名区分（见 drcom.main.dispatch）：
+        登录与登出的返回（0x04/0x05）不带会话标识，同一个端点同一时间只有一个会话在登录或登出，
+        服务器响应慢或重传时，同一端点上的其它会话的登录与登出都要等待；
+        心跳包二的签名包含编号，每个会话的起始编号 first_num 按它在端点上的顺序错开，
+        同一端点上不超过256个会话时编号互不相同，心跳包二可以同时进行；
+        心跳包一的返回与会话无关，同时等待的请求按发送顺序依次取得返回，不需要排队。
+    全部端点同时等待返回的请求不超过 SESSION_WINDOW 个，一轮心跳每个会话三个请求，
+    全部会话同时心跳时一轮大约需要 会话数 × 3 × 往返时间 / SESSION_WINDOW 秒（往返时间10ms时1000个会话约1秒），
+    这一时间接近心跳间隔时应增加 SESSION_WINDOW。
+    会话按添加顺序轮流分配到各个端点，每个端点超过256个会话或同时登录的会话较多时应增加 pool_size
+    """
+
+    def __init__(self, pool_size=1, local_port=LOCAL_PORT, interval=10, concurrency=64, policy=None, metrics=None):
+        """
+        :param pool_size: UDP端点数量，依次绑定 local_port, local_port + 1, ...；
+                          登录与登出在每个端点上逐个进行，每个端点超过256个会话时心跳包二的编号会重复
+        :param local_port: 第一个UDP端点绑定的端口，为0时全部使用随机端口
+        :param interval: 心跳间隔
+        :param concurrency: 同时进行登录的会话数量上限，实际同时等待登录返回的会话不超过pool_size个
+        :param policy: 所有会话共用的重传策略，默认与命令行、图形界面共用DEFAULT_POLICY
+        :param metrics: 所有会话共用的运行指标，默认为DEFAULT_METRICS
+        """
+        self.pool_size = pool_size
+        self.local_port = local_port
+        self.interval = interval
+        self.concurrency = concurrency
+        self.policy = policy if policy is not None else DEFAULT_POLICY
+        self.metrics = metrics if metrics is not None else DEFAULT_METRICS
+
+        self.sessions = {}
+        self._pool = []
+        self._tasks = {}
+        self._host = None
+        self._semaphore = None
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, usr):
+        return usr in self.sessions
+
+    async def start(self):
+        """
+        获取本机信息并创建共享的UDP端点
+        :return:
+        """
+        if self._pool:
+            return
+
+        probe = AsyncDrCOMClient()
+        probe._setup_host()
+        self._host = (probe.session.host_name, probe.session.mac, probe.session.ip)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        # 全部端点共用，限制同时到达的返回数量，事件循环来不及读取时会被误判为超时
+        window = asyncio.Semaphore(SESSION_WINDOW)
+
+        loop = asyncio.get_event_loop()
+        for i in range(self.pool_size):
+            port = self.local_port + i if self.local_port else 0
+            try:
+                _, protocol = await loop.create_datagram_endpoint(
+                    lambda: DrCOMProtocol(DEFAULT_CAPTURE, window), local_addr=("0.0.0.0", port))
+            except OSError:
+                self.close()
+                raise DrCOMException("无法绑定本机{}端口".format(port))
+            self._pool.append(protocol)
+
+    def add(self, usr, pwd):
+        """
+        添加一个账号，按添加顺序轮流分配UDP端点，心跳包二的起始编号按在端点上的顺序错开
+        :param usr:
+        :param pwd:
+        :return:
+        """
+        if not self._pool:
+            raise MagicDrCOMException("SessionManager is not started...")
+        if usr in self.sessions:
+            raise MagicDrCOMException("Duplicated account: {}".format(usr))
+        position, index = divmod(len(self.sessions), len(self._pool))
+        protocol = self._pool[index]
+        session = DrCOMSession(usr, pwd, protocol, self._host)
+        session.session.first_num = session.session.num = position & 0xff
+        session.policy = self.policy
+        session.metrics = self.metrics
+        self.sessions[usr] = session
+        return session
+
+    async def login(self, usr):
+        """
+        准备并登录单个会话
+        :param usr:
+        :return:
+        """
+        session = self.sessions[usr]
+        async with self._semaphore:
+            await session.prepare()
+            return await session.login()
+
+    async def _supervise(self, client):
+        """
+        会话的生命周期：登录、心跳，心跳失败之后等待ReLoginCheck秒重新登录
+        :param client: DrCOMSession
+        :return:
+        """
+        state = client.session
+        while self._tasks.get(state.usr) is _current_task():
+            try:
+                await self.login(state.usr)
+                if not state.login_flag:
+                    logger.error("err_no:30, [SessionManager]：Failure on login %s...", state.usr)
+                    return
+                await client.keep_alive(self.interval)
+            except (DrCOMException, TimeoutException) as exc:
+                logger.error("err_no:30, [SessionManager]：%s %s", state.usr, exc.info)
+                dump_on_error("session")
+            if not ReLoginFlag or self._tasks.get(state.usr) is not _current_task():
+                return
+            state.login_flag = False
+            client.metrics.session_stopped(state.usr)
+            await asyncio.sleep(ReLoginCheck)
+            client.metrics.incr("relogins")
+
+    def run(self, usr):
+        """
+        在事件循环中启动会话的登录与心跳
+        :param usr:
+        :return:
+        """
+        task = self._tasks.get(usr)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._supervise(self.sessions[usr]))
+            self._tasks[usr] = task
+        return task
+
+    def run_all(self):
+        return [self.run(usr) for usr in self.sessions]
+
+    async def logout(self, usr):
+        """
+        停止心跳并登出单个会话
+        :param usr:
+        :return:
+        """
+        client = self.sessions[usr]
+        task = self._tasks.pop(usr, None)
+        if task is not None and not task.done():
+            client.session.alive_flag = False
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if client.session.login_flag:
+            await client.logout()
+
+    async def logout_all(self):
+        results = await asyncio.gather(*[self.logout(usr) for usr in list(self.sessions)], return_exceptions=True)
+        for usr, result in zip(list(self.sessions), results):
+            if isinstance(result, Exception):
+                logger.error("err_no:71, [SessionManager]：Failure on logout %s: %s", usr, result)
+
+    def remove(self, usr):
+        session = self.sessions.pop(usr)
+        task = self._tasks.pop(usr, None)
+        if task is not None:
+            task.cancel()
+        session.close()
+
+    def close(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        for protocol in self._pool:
+            protocol.close()
+        self._pool = []
@@ -12,11 +12,10 @@
 DocString Here
 ...
 """
-import time
-import socket
-
 from PySide2 import QtCore
 
+from drcom.main.core import DrCOMResponse
+from drcom.main.probe import DEFAULT_PROBER
 from drcom.main.excepts import DrCOMException
 from drcom.main.excepts import TimeoutException
 
@@ -35,10 +34,14 @@ class ExecSignal(QtCore.QObject):
 
     result
         `object` data returned from processing, anything
+
+    progress
+        `str` message describing the step currently running
     """
     state = QtCore.Signal()
     error = QtCore.Signal(object)
     result = QtCore.Signal(object)
+    progress = QtCore.Signal(str)
 
 
 class ClientCheckThreads(QtCore.QRunnable):
@@ -62,8 +65,10 @@ class ClientCheckThreads(QtCore.QRunnable):
         try:
             result = self.client.prepare(*self.args, **self.kwargs)
             self.signals.result.emit(result)  # Return the result of the processing
-        except DrCOMException as e:
+        except (DrCOMException, TimeoutException) as e:
             self.signals.error.emit(e)
+        finally:
+            self.signals.state.emit()
 
 
 class ClientLoginThreads(QtCore.QRunnable):
@@ -87,8 +92,10 @@ class ClientLoginThreads(QtCore.QRunnable):
         try:
             result = self.client.login(*self.args, **self.kwargs)
             self.signals.result.emit(result)  # Return the result of the processing
-        except DrCOMException as e:
+        except (DrCOMException, TimeoutException) as e:
             self.signals.error.emit(e)
+        finally:
+            self.signals.state.emit()
 
 
 class ClientAliveThreads(QtCore.QRunnable):
@@ -110,22 +117,19 @@ class ClientAliveThreads(QtCore.QRunnable):
     @QtCore.Slot()
     def run(self):
         try:
-            self.client.send_alive_pkg1()
-            self.client.key = self.client.send_alive_pkg2(self.client.num, self.client.key, cls=1)
-            self.client.key = self.client.send_alive_pkg2(self.client.num, self.client.key, cls=3)
+            self.client.heartbeat()
         except (TimeoutException, DrCOMException) as e:
             self.signals.error.emit(e)
-            self.client.alive_flag = False
+            self.client.session.alive_flag = False
         else:
-            self.client.alive_flag = True
-            self.client.num = self.client.num + 2
+            self.client.session.alive_flag = True
         finally:
             self.signals.state.emit()
 
 
 class ClientRetryThreads(QtCore.QRunnable):
     """
-    Execute the Dr.COM retry login job
+    Execute the network connectivity checking job, the verdict is shared with other callers
     """
 
     def __init__(self, client, *args, **kwargs):
@@ -142,13 +146,82 @@ class ClientRetryThreads(QtCore.QRunnable):
     @QtCore.Slot()
     def run(self):
         try:
-            socket.setdefaulttimeout(1)
-            socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect(("114.114.114.114", 53))
-        except (TimeoutException, DrCOMException) as e:
+            verdict = DEFAULT_PROBER.check(*self.args, **self.kwargs)
+            if verdict:
+                self.signals.result.emit(verdict)
+            else:
+                self.signals.error.emit(DrCOMException("Network connection seems broken: {}".format(verdict)))
+            self.client.session.alive_flag = verdict.online
+        finally:
+            self.signals.state.emit()
+
+
+class ClientLogoutThreads(QtCore.QRunnable):
+    """
+    Execute the Dr.COM logout job, client.cancel() aborts it from any thread
+    """
+
+    def __init__(self, client, *args, **kwargs):
+        super(ClientLogoutThreads, self).__init__()
+
+        self.client = client
+
+        # Store constructor arguments
+        self.args = args
+        self.kwargs = kwargs
+
+        self.signals = ExecSignal()
+
+    @QtCore.Slot()
+    def run(self):
+        try:
+            self.client.logout(*self.args, **self.kwargs)
+            result = DrCOMResponse()
+            result.msg = "已经断开与校园网的链接"
+            self.signals.result.emit(result)
+        except (DrCOMException, TimeoutException) as e:
+            self.signals.error.emit(e)
+        finally:
+            self.signals.state.emit()
+
+
+class ClientReloginThreads(QtCore.QRunnable):
+    """
+    Execute the Dr.COM relogin chain: logout, prepare and login, reporting each step through progress
+
+    A failed logout is tolerated (the link is usually already broken), client.cancel() aborts the chain
+    """
+
+    def __init__(self, client, *args, **kwargs):
+        super(ClientReloginThreads, self).__init__()
+
+        self.client = client
+
+        # Store constructor arguments
+        self.args = args
+        self.kwargs = kwargs
+
+        self.signals = ExecSignal()
+
+    @QtCore.Slot()
+    def run(self):
+        try:
+            self.signals.progress.emit("正在注销之前的会话")
+            try:
+                self.client.logout()
+            except (DrCOMException, TimeoutException) as e:
+                if self.client.interrupt:
+                    raise
+                self.signals.progress.emit(e.info)
+            self.client.session.login_flag = False
+
+            self.signals.progress.emit("正在检测认证服务器")
+            self.client.prepare()
+
+            self.signals.progress.emit("正在重新登录")
+            result = self.client.login()
+            self.signals.result.emit(result)
+        except (DrCOMException, TimeoutException) as e:
             self.signals.error.emit(e)
-            self.client.alive_flag = False
-        else:
-            self.client.alive_flag = True
-            self.client.num = self.client.num + 2
         finally:
             self.signals.state.emit()
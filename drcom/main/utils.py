@@ -20,10 +20,10 @@ def mac():
 
 def hostname():
     """
-    获取本机主机名称
+    获取本机主机名称，不使用socket.getfqdn，断网时反向DNS查询可能阻塞数秒
     :return:
     """
-    return socket.getfqdn(socket.gethostname())
+    return socket.gethostname()
 
 
 def ipaddress():
@@ -53,36 +53,54 @@ def int2hex_str(num):
     return bytes().fromhex(s)
 
 
+def _xor_words(b, start, count):
+    """
+    将 b[start:start + 4 * count] 按小端32位字异或
+    整段一次性转换为整数，再不断将高半部分异或到低半部分，避免逐字切片
+    """
+    if count <= 0:
+        return 0
+    x = int.from_bytes(b[start:start + 4 * count], 'little')
+    while count > 1:
+        half = (count + 1) >> 1
+        bits = half << 5
+        x = (x & ((1 << bits) - 1)) ^ (x >> bits)
+        count = half
+    return x
+
+
 def checksum(b):
     """
     在python2中的循环如下
     for i in re.findall('....', s):
         ret ^= int(i[::-1].encode('hex'), 16)
     校验和以4个字节为一组进行计算，遇到b'\x0a'时，从b'\x0a'之后开始重新分组
-    为了能匹配b'\x0a'，不得不加入一个if
+    不含b'\x0a'的连续分组一次性异或，只在出现b'\x0a'的分组处重新对齐
+    注意：与原实现保持一致，恰好落在末尾的最后一个完整分组不参与计算
     """
+    if isinstance(b, memoryview):
+        b = b.tobytes()
     ret = 1234
     i = 0
-    while i + 4 < len(b):
-        if not(b[i:i + 4].find(b'\x0a') == -1):
-            i = i + b[i:i+4].find(b'\x0a') + 1
-        ret ^= int.from_bytes(b[i:i+4][::-1], 'big')
+    n = len(b)
+    while i + 4 < n:
+        # 从i开始满足 j + 4 < n 的分组数量
+        count = (n - i - 1) >> 2
+        pos = b.find(b'\x0a', i)
+        if pos == -1 or pos >= i + 4 * count:
+            ret ^= _xor_words(b, i, count)
+            break
+        # b'\x0a'所在分组之前的分组一次性异或
+        words = (pos - i) >> 2
+        ret ^= _xor_words(b, i, words)
+        # 从b'\x0a'之后重新分组，重新对齐的这一组不再检查b'\x0a'
+        i = pos + 1
+        ret ^= int.from_bytes(b[i:i + 4], 'little')
         i = i + 4
     ret = (1968 * ret) & 0xffffffff
     return struct.pack('<I', ret)
 
 
-def clean_socket_buffer(s):
-    timeout = s.gettimeout()
-    s.settimeout(0.01)
-    while True:
-        try:
-            s.recvfrom(1024)
-        except socket.timeout:
-            break
-    s.settimeout(timeout)
-
-
 def print_bytes(byte):
     #
     print("========================================================================")
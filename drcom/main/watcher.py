@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+"""
+网卡与地址变化监听
+
+Linux 下订阅 rtnetlink 的网卡(RTMGRP_LINK)与IPv4地址(RTMGRP_IPV4_IFADDR)事件，
+网线拔插、DHCP重新分配地址时立即得到通知；其它平台或者无法创建netlink socket时
+每隔 LINK_POLL_INTERVAL 秒比较一次本机身份信息
+发生变化时清除本机身份信息与连通性检测的缓存，再调用 callback(identity, reason)，
+identity 为最新的 (主机名称, MAC地址, IP地址)，IP地址为空表示当前没有可用的网络
+短时间内的多个事件（例如DHCP续约时先删除再添加地址）合并为一次回调
+其它网卡（docker0、veth等）的事件不触发回调：合并之后重新获取本机身份信息，与上一次相同时忽略，
+只有承载默认路由的网卡的载波变化（网线拔插）即使身份信息不变也会回调
+netlink socket 注册在调度器（默认DEFAULT_SCHEDULER）的selector中，合并事件与轮询都使用调度器的定时器，
+不单独占用线程，没有事件时也不会被唤醒
+"""
+
+import socket
+import struct
+
+from drcom.main.host import DEFAULT_HOST
+from drcom.main.host import HostIdentity
+from drcom.main.host import default_interface
+from drcom.main.probe import DEFAULT_PROBER
+from drcom.main.scheduler import DEFAULT_SCHEDULER
+from drcom.main.logger import logger
+from drcom.configs.settings import *
+
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+
+IFF_LOOPBACK = 0x8
+IFF_RUNNING = 0x40
+IFF_LOWER_UP = 0x10000
+RT_SCOPE_HOST = 254
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_IFINFOMSG = struct.Struct("=BxHiII")
+_IFADDRMSG = struct.Struct("=BBBBI")
+_RTATTR = struct.Struct("=HH")
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _attributes(data, offset, end):
+    """
+    解析rtattr列表
+    :return: {类型: 内容}
+    """
+    attrs = {}
+    while offset + _RTATTR.size <= end:
+        length, kind = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        attrs[kind] = data[offset + _RTATTR.size:offset + length]
+        offset += _align(length)
+    return attrs
+
+
+def parse_events(data):
+    """
+    解析一个netlink数据包中的网卡与地址事件
+    :param data:
+    :return: [("link", 网卡编号, 是否有载波), ("addr", 网卡编号, IP地址, 是否为新增)]
+    """
+    events = []
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        length, kind, _, _, _ = _NLMSGHDR.unpack_from(data, offset)
+        if length < _NLMSGHDR.size or offset + length > len(data):
+            break
+        body = offset + _NLMSGHDR.size
+        if kind in (RTM_NEWLINK, RTM_DELLINK) and length >= _NLMSGHDR.size + _IFINFOMSG.size:
+            _, _, index, flags, _ = _IFINFOMSG.unpack_from(data, body)
+            if not flags & IFF_LOOPBACK:
+                carrier = kind == RTM_NEWLINK and bool(flags & IFF_LOWER_UP or flags & IFF_RUNNING)
+                events.append(("link", index, carrier))
+        elif kind in (RTM_NEWADDR, RTM_DELADDR) and length >= _NLMSGHDR.size + _IFADDRMSG.size:
+            family, _, _, scope, index = _IFADDRMSG.unpack_from(data, body)
+            if family == socket.AF_INET and scope != RT_SCOPE_HOST:
+                attrs = _attributes(data, body + _IFADDRMSG.size, offset + length)
+                address = attrs.get(IFA_LOCAL) or attrs.get(IFA_ADDRESS)
+                ip = socket.inet_ntoa(address) if address and len(address) == 4 else ""
+                events.append(("addr", index, ip, kind == RTM_NEWADDR))
+        elif kind == NLMSG_DONE or kind == NLMSG_ERROR:
+            break
+        offset += _align(length)
+    return events
+
+
+class LinkWatcher(object):
+    """
+    在调度器线程中监听网卡与地址变化，回调也在该线程中执行
+    """
+
+    def __init__(self, callback, interval=LINK_POLL_INTERVAL, debounce=0.3, scheduler=None):
+        """
+        :param callback: callback(identity, reason)
+        :param interval: 不支持netlink时的轮询间隔（秒）
+        :param debounce: 合并事件的等待时间（秒）
+        :param scheduler: 默认使用DEFAULT_SCHEDULER，start()时启动
+        """
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self.scheduler = scheduler if scheduler is not None else DEFAULT_SCHEDULER
+        self.mode = None
+
+        self._carrier = {}
+        self._sock = None
+        self._timer = None
+        self._reason = None
+        self._probe = None
+        self._state = None
+        # 承载默认路由的网卡编号，合并的事件中是否有它的载波变化
+        self._uplink = None
+        self._uplink_changed = False
+
+    def start(self):
+        if self.mode is not None:
+            return self
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR))
+            sock.setblocking(False)
+        except (AttributeError, OSError) as e:
+            logger.debug("[LinkWatcher]：rtnetlink unavailable (%s), polling every %ss...", e, self.interval)
+            self.mode = "poll"
+            self._probe = HostIdentity()
+            self._state = self._probe.get()
+            self._timer = self.scheduler.call_later(self.interval, self._poll)
+        else:
+            self.mode = "netlink"
+            self._sock = sock
+            self._state = DEFAULT_HOST.get()
+            self._uplink = self._uplink_index()
+            self.scheduler.add_reader(sock, self._readable)
+        self.scheduler.start()
+        return self
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._sock is not None:
+            self.scheduler.remove_reader(self._sock)
+            self.scheduler.submit(self._sock.close)
+            self._sock = None
+        self._reason = None
+        self._uplink_changed = False
+        self.mode = None
+
+    @staticmethod
+    def _uplink_index():
+        iface = default_interface()
+        if not iface:
+            return None
+        try:
+            return socket.if_nametoindex(iface)
+        except (AttributeError, OSError):
+            return None
+
+    def _readable(self, sock):
+        try:
+            data = sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            # 接收缓冲区溢出时丢失了部分事件，按发生变化处理
+            logger.debug("[LinkWatcher]：%s", e)
+            data = b""
+            self._reason = self._reason or "netlink overrun"
+            # 丢失的事件中可能有默认网卡的载波变化
+            self._uplink_changed = True
+        for event in parse_events(data):
+            changed = self._describe(event)
+            if changed:
+                self._reason = changed
+                if event[0] == "link" and event[1] == self._uplink:
+                    self._uplink_changed = True
+        if self._reason is not None and self._timer is None:
+            self._timer = self.scheduler.call_later(self.debounce, self._flush)
+
+    def _flush(self):
+        reason, self._reason, self._timer = self._reason, None, None
+        uplink, self._uplink_changed = self._uplink_changed, False
+        if reason is None or self.mode is None:
+            return
+        DEFAULT_HOST.invalidate()
+        current = DEFAULT_HOST.get()
+        self._uplink = self._uplink_index()
+        if current == self._state and not uplink:
+            logger.debug("[LinkWatcher]：Ignore %s, host identity unchanged...", reason)
+            return
+        self._state = current
+        self._fire(reason)
+
+    def _describe(self, event):
+        """
+        :param event:
+        :return: 需要处理时返回事件描述，否则返回None
+        """
+        if event[0] == "link":
+            _, index, carrier = event
+            previous = self._carrier.get(index)
+            self._carrier[index] = carrier
+            # 第一次看到的网卡只有在没有载波时才需要处理
+            if previous is None and carrier or previous == carrier:
+                return None
+            return "link {} {}".format(index, "up" if carrier else "down")
+        _, index, ip, added = event
+        return "address {} {} {}".format(ip, "added to" if added else "removed from", index)
+
+    def _poll(self):
+        if self.mode is None:
+            return
+        self._probe.invalidate()
+        current = self._probe.get()
+        self._timer = self.scheduler.call_later(self.interval, self._poll)
+        if current != self._state:
+            self._state = current
+            self._fire("host identity changed")
+
+    def _fire(self, reason):
+        DEFAULT_HOST.invalidate()
+        DEFAULT_PROBER.invalidate()
+        identity = DEFAULT_HOST.get()
+        logger.info("[LinkWatcher]：%s, current address: %s...", reason, identity[2] or "none")
+        try:
+            self.callback(identity, reason)
+        except Exception as e:
+            logger.error("err_no:80, [LinkWatcher]：Failure on handling link change: %s", e)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import io
+import socket
+import struct
+
+from drcom.main import capture as capture_module
+from drcom.main.capture import Capture
+from drcom.main.capture import LINKTYPE_RAW
+
+LOCAL = ("10.1.2.3", 61440)
+SERVER = ("10.0.0.1", 61440)
+
+
+def _sum16(data):
+    if len(data) & 1:
+        data += b'\x00'
+    total = sum(struct.unpack("!%dH" % (len(data) // 2), data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return total
+
+
+def _read(stream):
+    """
+    按pcap格式解析，返回全局头部与 [(记录头部, 帧)]
+    """
+    data = stream.getvalue()
+    header = struct.unpack("<IHHiIII", data[:24])
+    records = []
+    offset = 24
+    while offset < len(data):
+        record = struct.unpack("<IIII", data[offset:offset + 16])
+        offset += 16
+        records.append((record, data[offset:offset + record[2]]))
+        offset += record[2]
+    return header, records
+
+
+def test_ring_keeps_latest_packets():
+    capture = Capture(size=4, directory=".")
+    for i in range(10):
+        capture.record(True, LOCAL, SERVER, bytes([i]))
+    packets = capture.packets()
+    assert [entry[0] for entry in packets] == [6, 7, 8, 9]
+    assert [entry[5] for entry in packets] == [b'\x06', b'\x07', b'\x08', b'\x09']
+    capture.clear()
+    assert capture.packets() == []
+
+
+def test_record_copies_data():
+    capture = Capture(size=2, directory=".")
+    data = bytearray(b'\x07\x00')
+    capture.record(True, LOCAL, SERVER, data)
+    data[1] = 0xff
+    assert capture.packets()[0][5] == b'\x07\x00'
+
+
+def test_pcap_layout():
+    capture = Capture(size=8, directory=".")
+    payloads = [b'\x07\x01\x28\x00\x0b\x01' + bytes(34), b'\x07\x01\x28\x00\x0b\x02' + bytes(35), b'\xff']
+    capture.record(True, LOCAL, SERVER, payloads[0])
+    capture.record(False, LOCAL, SERVER, payloads[1])
+    capture.record(True, LOCAL, SERVER, payloads[2])
+    stamps = [entry[1] for entry in capture.packets()]
+
+    stream = io.BytesIO()
+    assert capture.write(stream) == 3
+    header, records = _read(stream)
+    assert header == (0xa1b2c3d4, 2, 4, 0, 0, 65535, LINKTYPE_RAW)
+    assert len(records) == 3
+
+    for sequence, ((seconds, micros, captured, length), frame) in enumerate(records):
+        payload = payloads[sequence]
+        assert captured == length == len(frame) == 20 + 8 + len(payload)
+        assert seconds == int(stamps[sequence])
+        assert 0 <= micros < 1000000
+
+        ip, udp = frame[:20], frame[20:]
+        version, tos, total, ident, fragment, ttl, protocol, _, source, destination = \
+            struct.unpack("!BBHHHBBH4s4s", ip)
+        assert (version, tos, total, ident, fragment, ttl, protocol) == \
+            (0x45, 0, len(frame), sequence, 0, 64, socket.IPPROTO_UDP)
+        # 包括校验和字段在内的IPv4头部求和为0xffff
+        assert _sum16(ip) == 0xffff
+
+        src, dst = (LOCAL, SERVER) if sequence != 1 else (SERVER, LOCAL)
+        assert (socket.inet_ntoa(source), socket.inet_ntoa(destination)) == (src[0], dst[0])
+        src_port, dst_port, udp_length, udp_checksum = struct.unpack("!HHHH", udp[:8])
+        assert (src_port, dst_port, udp_length) == (src[1], dst[1], 8 + len(payload))
+        assert udp_checksum != 0
+        pseudo = source + destination + struct.pack("!BBH", 0, socket.IPPROTO_UDP, udp_length)
+        assert _sum16(pseudo + udp) == 0xffff
+        assert udp[8:] == payload
+
+
+def test_wildcard_local_address_uses_host_ip(monkeypatch):
+    monkeypatch.setattr(capture_module.DEFAULT_HOST, "get", lambda: ("host", "", "10.9.8.7"))
+    capture = Capture(size=2, directory=".")
+    capture.record(True, ("0.0.0.0", 61440), SERVER, b'\xff')
+    stream = io.BytesIO()
+    capture.write(stream)
+    _, records = _read(stream)
+    assert socket.inet_ntoa(records[0][1][12:16]) == "10.9.8.7"
+
+
+def test_dump_on_error_is_rate_limited(tmp_path):
+    capture = Capture(size=2, directory=str(tmp_path), interval=60)
+    capture.record(True, LOCAL, SERVER, b'\xff')
+    path = capture.dump_on_error("keep alive")
+    assert path is not None and path.startswith(str(tmp_path)) and path.endswith("-keep-alive.pcap")
+    assert capture.dump_on_error("keep alive") is None
+    with open(path, "rb") as stream:
+        assert struct.unpack("<I", stream.read(4))[0] == 0xa1b2c3d4
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import random
+import struct
+
+from drcom.main.utils import checksum
+
+
+def _reference(b):
+    # 优化之前的逐组实现，作为对照
+    ret = 1234
+    i = 0
+    while i + 4 < len(b):
+        if not(b[i:i + 4].find(b'\x0a') == -1):
+            i = i + b[i:i+4].find(b'\x0a') + 1
+        ret ^= int.from_bytes(b[i:i+4][::-1], 'big')
+        i = i + 4
+    ret = (1968 * ret) & 0xffffffff
+    return struct.pack('<I', ret)
+
+
+def _random_bytes(rng, length, newline=0.0):
+    return bytes(0x0a if rng.random() < newline else rng.randrange(256) for _ in range(length))
+
+
+def test_random_inputs():
+    rng = random.Random(20190417)
+    for _ in range(2000):
+        data = _random_bytes(rng, rng.randrange(0, 400))
+        assert checksum(data) == _reference(data), data.hex()
+
+
+def test_inputs_with_many_newlines():
+    rng = random.Random(1968)
+    for newline in (0.1, 0.3, 0.5, 0.9, 1.0):
+        for _ in range(500):
+            data = _random_bytes(rng, rng.randrange(0, 120), newline)
+            assert checksum(data) == _reference(data), data.hex()
+
+
+def test_every_length():
+    rng = random.Random(1234)
+    for length in range(0, 64):
+        for _ in range(50):
+            data = _random_bytes(rng, length, 0.2)
+            assert checksum(data) == _reference(data), data.hex()
+
+
+def test_newline_at_every_offset():
+    base = bytes(range(0x10, 0x10 + 48))
+    for length in range(1, len(base) + 1):
+        for pos in range(length):
+            data = base[:pos] + b'\x0a' + base[pos + 1:length]
+            assert checksum(data) == _reference(data), data.hex()
+
+
+def test_memoryview_input():
+    data = bytes(range(256)) * 2
+    assert checksum(memoryview(data)) == _reference(data)
+
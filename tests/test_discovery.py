@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import json
+
+import pytest
+
+from drcom.main.retry import RetryPolicy
+from drcom.main.discovery import Discovery
+from drcom.main.discovery import ServerCache
+
+
+def _cache(tmp_path, content):
+    path = tmp_path / "server.json"
+    path.write_text(content if isinstance(content, str) else json.dumps(content))
+    return ServerCache(str(path))
+
+
+@pytest.mark.parametrize("content", [
+    "not json",
+    [],
+    {},
+    {"server": ""},
+    {"server": 10},
+    {"server": "10.0.0.1", "rtt": "fast"},
+    {"server": "10.0.0.1", "rtt": [0.01]},
+    {"server": "10.0.0.1", "rtt": True},
+    {"server": "10.0.0.1", "rtt": -1},
+    '{"server": "10.0.0.1", "rtt": NaN}',
+    '{"server": "10.0.0.1", "rtt": Infinity}',
+    {"server": "10.0.0.1", "rtt": 0.01, "time": "yesterday"},
+])
+def test_malformed_record_is_skipped(tmp_path, content):
+    cache = _cache(tmp_path, content)
+    assert cache.load() is None
+    # 与没有缓存时一样探测全部候选服务器
+    discovery = Discovery(RetryPolicy(), cache)
+    assert discovery.cached is None
+
+
+def test_valid_record_seeds_estimator(tmp_path):
+    cache = _cache(tmp_path, {"server": "10.0.0.1", "rtt": 0.02, "time": 1555555555})
+    assert cache.load()["server"] == "10.0.0.1"
+    policy = RetryPolicy()
+    discovery = Discovery(policy, cache)
+    assert discovery.cached == "10.0.0.1"
+    assert policy.estimator("10.0.0.1").srtt == pytest.approx(0.02)
+
+
+def test_record_without_rtt(tmp_path):
+    cache = _cache(tmp_path, {"server": "10.0.0.1"})
+    assert Discovery(RetryPolicy(), cache).cached == "10.0.0.1"
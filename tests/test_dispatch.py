@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+from drcom.main.dispatch import Dispatcher
+from drcom.main.dispatch import request_key
+
+SERVER = ("192.168.211.3", 61440)
+
+
+def _alive2(num, cls):
+    pkg = bytearray(40)
+    pkg[0] = 0x07
+    pkg[1] = num
+    pkg[2:5] = b'\x28\x00\x0b'
+    pkg[5] = cls
+    return bytes(pkg)
+
+
+def _alive2_reply(num, cls):
+    # 服务器返回的类型为请求的类型加一
+    return _alive2(num, cls + 1)
+
+
+def _alive1_reply():
+    reply = bytearray(32)
+    reply[0] = 0x07
+    reply[2] = 0x10
+    return bytes(reply)
+
+
+def test_alive2_reply_completes_waiter_of_same_cls():
+    dispatcher = Dispatcher()
+    dispatcher.register(request_key(_alive2(5, 3), SERVER), "cls3")
+    assert dispatcher.match(_alive2_reply(5, 3), SERVER) == "cls3"
+
+
+def test_late_cls1_reply_does_not_complete_cls3_waiter():
+    dispatcher = Dispatcher()
+    dispatcher.register(request_key(_alive2(5, 3), SERVER), "cls3")
+    assert dispatcher.match(_alive2_reply(5, 1), SERVER) is None
+
+
+def test_alive2_reply_of_other_num_is_dropped():
+    dispatcher = Dispatcher()
+    dispatcher.register(request_key(_alive2(5, 1), SERVER), "cls1")
+    assert dispatcher.match(_alive2_reply(6, 1), SERVER) is None
+
+
+def test_alive1_reply():
+    dispatcher = Dispatcher()
+    dispatcher.register(request_key(b'\xff' + b'\x00' * 40, SERVER), "alive1")
+    assert dispatcher.match(_alive1_reply(), SERVER) == "alive1"
+
+
+def test_alive2_reply_does_not_complete_alive1_waiter():
+    dispatcher = Dispatcher()
+    dispatcher.register(request_key(b'\xff' + b'\x00' * 40, SERVER), "alive1")
+    assert dispatcher.match(_alive2_reply(5, 1), SERVER) is None
+    assert dispatcher.match(_alive2_reply(5, 3), SERVER) is None
+
+
+def test_alive1_and_alive2_in_flight_together():
+    dispatcher = Dispatcher()
+    dispatcher.register(request_key(b'\xff' + b'\x00' * 40, SERVER), "alive1")
+    dispatcher.register(request_key(_alive2(5, 1), SERVER), "cls1")
+    assert dispatcher.match(_alive2_reply(5, 1), SERVER) == "cls1"
+    assert dispatcher.match(_alive1_reply(), SERVER) == "alive1"
@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import drcom.emulator as emulator
+from drcom.emulator import EmulatorProtocol
+
+
+def test_new_key_skips_keys_in_use(monkeypatch):
+    protocol = EmulatorProtocol()
+    protocol._keys[b'\x01\x02\x03\x04'] = object()
+    candidates = iter([b'\x01\x02\x03\x04', b'\x00\x00\x00\x00', b'\x05\x06\x07\x08'])
+    monkeypatch.setattr(emulator.os, "urandom", lambda size: next(candidates))
+    assert protocol._new_key() == b'\x05\x06\x07\x08'
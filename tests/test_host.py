@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import socket
+
+from drcom.main import host
+from drcom.main import utils
+from drcom.main.host import HostIdentity
+
+ROUTES = """Iface	Destination	Gateway 	Flags	RefCnt	Use	Metric	Mask		MTU	Window	IRTT
+wlan0	00000000	0102A8C0	0003	0	0	600	00000000	0	0	0
+eth0	0000A8C0	00000000	0001	0	0	100	00FFFFFF	0	0	0
+eth0	00000000	01010A0A	0003	0	0	100	00000000	0	0	0
+tun0	00000000	00000000	0000	0	0	50	00000000	0	0	0
+broken	00000000
+"""
+
+
+def _net_class(tmp_path, devices):
+    root = tmp_path / "net"
+    for name, (address, state) in devices.items():
+        device = root / name
+        device.mkdir(parents=True)
+        (device / "address").write_text(address + "\n")
+        (device / "operstate").write_text(state + "\n")
+    return str(root)
+
+
+def test_default_interface_picks_lowest_metric(tmp_path, monkeypatch):
+    route = tmp_path / "route"
+    route.write_text(ROUTES)
+    monkeypatch.setattr(host, "ROUTE_TABLE", str(route))
+    # tun0 的跃点数最小但没有启用，eth0 的第一条不是默认路由
+    assert host.default_interface() == "eth0"
+
+
+def test_default_interface_without_route_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(host, "ROUTE_TABLE", str(tmp_path / "missing"))
+    assert host.default_interface() is None
+    route = tmp_path / "route"
+    route.write_text(ROUTES.splitlines()[0] + "\n")
+    monkeypatch.setattr(host, "ROUTE_TABLE", str(route))
+    assert host.default_interface() is None
+
+
+def test_interface_mac_and_interfaces(tmp_path, monkeypatch):
+    monkeypatch.setattr(host, "NET_CLASS", _net_class(tmp_path, {
+        "lo": ("00:00:00:00:00:00", "unknown"),
+        "eth0": ("00:1A:26:4A:7B:0D", "up"),
+        "eth1": ("00:1a:26:4a:7b:0e", "down"),
+        "wwan0": ("00:00:00:00:00:00", "unknown"),
+    }))
+    assert host.interface_mac("eth0") == "001a264a7b0d"
+    assert host.interface_mac("wwan0") == ""
+    assert host.interface_mac("missing") == ""
+    assert host.interfaces() == ["eth0", "wwan0"]
+
+
+def test_identity_is_cached_until_route_changes(monkeypatch):
+    routes = ["eth0"]
+    discovered = []
+
+    def discover(iface):
+        discovered.append(iface)
+        return "host", "001a264a7b0d", "10.1.2.{}".format(len(discovered))
+
+    monkeypatch.setattr(host, "default_interface", lambda: routes[0])
+    identity = HostIdentity()
+    monkeypatch.setattr(identity, "_discover", discover)
+    assert identity.get() == ("host", "001a264a7b0d", "10.1.2.1")
+    assert identity.get() == ("host", "001a264a7b0d", "10.1.2.1")
+    routes[0] = "wlan0"
+    assert identity.get()[2] == "10.1.2.2"
+    identity.invalidate()
+    assert identity.get()[2] == "10.1.2.3"
+    assert discovered == ["eth0", "wlan0", "wlan0"]
+
+
+def test_discover_without_default_route_uses_first_interface(monkeypatch):
+    monkeypatch.setattr(host, "interfaces", lambda: ["eth0", "eth1"])
+    monkeypatch.setattr(host, "interface_ip", lambda name: "10.1.2.3" if name == "eth1" else "")
+    monkeypatch.setattr(host, "interface_mac", lambda name: "001a264a7b0e")
+    monkeypatch.setattr(utils, "hostname", lambda: "host")
+    assert HostIdentity._discover(None) == ("host", "001a264a7b0e", "10.1.2.3")
+
+
+def test_discover_falls_back_to_utils(monkeypatch):
+    monkeypatch.setattr(host, "interface_ip", lambda name: "")
+    monkeypatch.setattr(utils, "hostname", lambda: "host")
+    monkeypatch.setattr(utils, "mac", lambda: "001a264a7b0d")
+
+    def offline():
+        raise OSError("network is unreachable")
+
+    monkeypatch.setattr(utils, "ipaddress", offline)
+    assert HostIdentity._discover("eth0") == ("host", "001a264a7b0d", "")
+
+
+def test_hostname_does_not_resolve(monkeypatch):
+    def fail(*args):
+        raise AssertionError("DNS lookup")
+
+    monkeypatch.setattr(socket, "getfqdn", fail)
+    monkeypatch.setattr(socket, "gethostbyaddr", fail)
+    assert utils.hostname() == socket.gethostname()
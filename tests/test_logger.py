@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import io
+import logging
+
+import pytest
+
+from drcom.main import logger as logger_module
+from drcom.main.logger import logger
+from drcom.main.logger import RateLimiter
+
+
+class _Records(logging.Handler):
+    def __init__(self):
+        super(_Records, self).__init__(logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records():
+    handler = _Records()
+    level = logger.level
+    logger.addHandler(handler)
+    try:
+        yield handler.records
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+
+
+def test_filtered_records_are_not_formatted(records):
+    class Argument(object):
+        formatted = 0
+
+        def __str__(self):
+            Argument.formatted += 1
+            return "argument"
+
+    logger.setLevel(logging.INFO)
+    logger.debug("[DrCOM.keep_alive]：%s", Argument())
+    assert Argument.formatted == 0 and not records
+    logger.info("[DrCOM.login]：%s", Argument())
+    assert [record.getMessage() for record in records] == ["[DrCOM.login]：argument"]
+
+
+def test_import_does_not_configure_output():
+    assert logger_module._listener is None
+    assert not any(isinstance(handler, logging.handlers.QueueHandler) for handler in logger.handlers)
+    assert logger.propagate
+
+
+def test_records_reach_caplog(caplog):
+    with caplog.at_level(logging.INFO, logger="drcom"):
+        logger.info("[DrCOM.login]：%s login...", "2019010203")
+    assert caplog.record_tuples == [("drcom", logging.INFO, "[DrCOM.login]：2019010203 login...")]
+
+
+def test_setup_writes_through_queue_and_keeps_propagating(caplog):
+    stream = io.StringIO()
+    level = logger.level
+    logger_module.shutdown()
+    try:
+        logger_module.setup(logging.INFO, stream)
+        with caplog.at_level(logging.INFO, logger="drcom"):
+            logger.info("queued %d", 1)
+    finally:
+        # 停止后台线程之前输出队列中剩余的日志
+        logger_module.shutdown()
+        logger.setLevel(level)
+    assert "[INFO]: queued 1" in stream.getvalue()
+    assert [record.getMessage() for record in caplog.records] == ["queued 1"]
+
+
+def test_rate_limiter_merges_repeated_warnings(records):
+    limiter = RateLimiter(interval=60)
+    logger.setLevel(logging.INFO)
+    for i in range(5):
+        limiter.log(logging.WARNING, "retry", "retry %d", i)
+    assert [record.getMessage() for record in records] == ["retry 0"]
+    assert limiter.counters == {"retry": 5}
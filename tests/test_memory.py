@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import argparse
+
+from benchmarks import bench_memory
+
+# 与 python -m benchmarks 的 --memory-budget 默认值相同
+LOGGED_IN_BUDGET = 4096
+
+
+def test_record_within_budget():
+    assert bench_memory._per_session(500, bench_memory._record) <= bench_memory.BUDGETS["record_bytes"]
+
+
+def test_client_within_budget():
+    assert bench_memory._per_session(500, bench_memory._client) <= bench_memory.BUDGETS["client_bytes"]
+
+
+def test_logged_in_within_budget():
+    options = argparse.Namespace(memory_sessions=200, memory_budget=LOGGED_IN_BUDGET, pool=8, concurrency=64)
+    results = bench_memory.run(options)
+    assert results["over_budget"] == [], results
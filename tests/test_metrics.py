@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+from drcom.main.core import DrCOMCore
+from drcom.main.metrics import PHASES
+from drcom.main.metrics import Metrics
+from drcom.main.metrics import phase_of
+
+
+def _core():
+    core = DrCOMCore("2019010203", "123456")
+    session = core.session
+    session.mac, session.ip, session.host_name = bytes.fromhex("001a264a7b0d"), "10.1.2.3", "MagicDrCOM-test"
+    session.salt, session.auth_info = bytes(4), bytes(16)
+    return core
+
+
+def test_every_request_has_its_own_phase():
+    core = _core()
+    packets = {
+        "challenge": core._make_challenge_package()[0],
+        "login": core._make_login_package(),
+        "alive1": core._make_alive1_package(),
+        "alive2_1": core._make_alive_package(0, bytes(4), 1),
+        "alive2_3": core._make_alive_package(0, bytes(4), 3),
+        "logout_challenge": core._make_logout_challenge_package(),
+        "logout": core._make_logout_package(),
+    }
+    assert sorted(packets) == sorted(PHASES)
+    for phase, pkg in packets.items():
+        assert phase_of(pkg) == phase
+    assert phase_of(b'\x55') is None
+
+
+def test_logout_is_recorded_once():
+    core = _core()
+    metrics = Metrics()
+    metrics.observe(core._make_logout_challenge_package(), 0.01)
+    metrics.observe(core._make_logout_package(), 0.02)
+    assert metrics.phases["logout"].count == 1
+    assert metrics.phases["logout"].sum == 0.02
+    assert metrics.phases["logout_challenge"].count == 1
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import time
+import random
+import socket
+import struct
+
+import pytest
+
+from drcom.main.core import DrCOMCore
+from drcom.main.utils import md5
+from drcom.main.utils import checksum
+from drcom.main.utils import int2hex_str
+from drcom.main.packets import PacketTemplate
+from drcom.configs.settings import *
+
+USR = "2019010203"
+PWD = "p@ssw0rd"
+MAC = bytes.fromhex("001a264a7b0d")
+IP = "10.1.2.3"
+HOST_NAME = "MagicDrCOM-test"
+LONG_HOST_NAME = "a-very-long-host-name-for-the-template-test.local"
+
+
+class _Reference(object):
+    """
+    使用PacketTemplate之前逐字段拼接的构造方法，作为对照
+    """
+
+    def __init__(self, usr, pwd, mac, ip, host_name, salt, auth_info):
+        self.usr = usr
+        self.pwd = pwd
+        self.mac = mac
+        self.ip = ip
+        self.host_name = host_name
+        self.salt = salt
+        self.auth_info = auth_info
+
+    def login(self):
+        data = b'\x03\x01\x00' + int2hex_str(len(self.usr) + 20)
+        data += md5(b'\x03\x01' + self.salt + self.pwd.encode('ascii'))
+        data += self.usr.encode('ascii').ljust(36, b'\x00')
+        data += CONTROL_CHECK_STATUS
+        data += ADAPTER_NUMBER
+        data += int2hex_str(int.from_bytes(data[4:10], 'big') ^ int.from_bytes(self.mac, 'big')).rjust(6, b'\x00')
+        data += md5(b'\x01' + self.pwd.encode('ascii') + self.salt + b'\x00' * 4)
+        data += b'\x01'
+        data += socket.inet_aton(self.ip)
+        data += b'\00' * 4
+        data += b'\00' * 4
+        data += b'\00' * 4
+        data += md5(data + b'\x14\x00\x07\x0b')[:8]
+        data += IP_DOG
+        data += b'\x00' * 4
+        data += self.host_name.encode('ascii').ljust(32, b'\x00')
+        data += b'\x72\x72\x72\x72'
+        data += socket.inet_aton(DHCP_SERVER_IP)
+        data += b'\x08\x08\x08\x08'
+        data += b'\x00' * 8
+        data += b'\x94\x00\x00\x00'
+        data += b'\x06\x00\x00\x00'
+        data += b'\x01\x00\x00\x00'
+        data += b'\xb1\x1d\x00\x00'
+        data += b'\x02\x00\x00\x00'
+        data += "WINDOWS".encode('ascii').ljust(32, b'\x00')
+        data += b'\x00' * 96
+        data += AUTH_VERSION
+        data += b'\x02\x0c'
+        data += checksum(data + b'\x01\x26\x07\x11\x00\x00' + self.mac)
+        data += b'\x00\x00'
+        data += self.mac
+        data += b'\x00'
+        data += b'\x00'
+        data += b'\x17\x77'
+        return data
+
+    def alive1(self):
+        pkg = b'\xff'
+        pkg += md5(b'\x03\x01' + self.salt + self.pwd.encode('ascii'))
+        pkg += b'\x00' * 3
+        pkg += self.auth_info
+        pkg += struct.pack('!H', int(time.time()) % 0xFFFF)
+        pkg += b'\x00' * 3
+        return pkg
+
+    def alive2(self, num, key, cls):
+        data = b'\x07'
+        data += int2hex_str(num % 256)
+        data += b'\x28\x00\x0b'
+        data += int2hex_str(cls)
+        if num == 0:
+            data += b'\xdc\x02'
+        else:
+            data += KEEP_ALIVE_VERSION
+        data += b'\x2f\x79'
+        data += b'\x00' * 6
+        data += key
+        data += b'\x00' * 4
+        if cls == 1:
+            data += b'\x00' * 16
+        if cls == 3:
+            foo = b''.join([int2hex_str(int(i)) for i in self.ip.split('.')])
+            crc = b'\x00' * 4
+            data += crc + foo + b'\x00' * 8
+        return data
+
+    def logout_challenge(self):
+        pkg = b'\x01\x03'
+        pkg += b'\x00\x00'
+        pkg += b'\x0a'
+        pkg += b'\x00' * 15
+        return pkg
+
+    def logout(self):
+        data = b'\x06\x01\x00' + int2hex_str(len(self.usr) + 20)
+        data += md5(b'\x06\x01' + self.salt + self.pwd.encode('ascii'))
+        data += self.usr.encode('ascii').ljust(36, b'\x00')
+        data += CONTROL_CHECK_STATUS
+        data += ADAPTER_NUMBER
+        data += int2hex_str(int.from_bytes(data[4:10], 'big') ^ int.from_bytes(self.mac, 'big')).rjust(6, b'\x00')
+        data += self.auth_info
+        return data
+
+
+def _salts():
+    rng = random.Random(20190417)
+    return [bytes(4), b'\xff' * 4] + [bytes(rng.randrange(256) for _ in range(4)) for _ in range(30)]
+
+
+def _auth_info(salt):
+    return md5(b'auth' + salt)
+
+
+@pytest.fixture
+def frozen_time(monkeypatch):
+    now = 1555555555.5
+    monkeypatch.setattr(time, "time", lambda: now)
+    return now
+
+
+def test_login_matches_reference():
+    template = PacketTemplate(USR, PWD, MAC, IP, HOST_NAME)
+    for salt in _salts():
+        reference = _Reference(USR, PWD, MAC, IP, HOST_NAME, salt, _auth_info(salt))
+        assert bytes(template.login(salt)) == reference.login(), salt.hex()
+
+
+def test_alive1_matches_reference(frozen_time):
+    template = PacketTemplate(USR, PWD, MAC, IP, HOST_NAME)
+    for salt in _salts():
+        auth_info = _auth_info(salt)
+        reference = _Reference(USR, PWD, MAC, IP, HOST_NAME, salt, auth_info)
+        assert bytes(template.alive1(salt, auth_info)) == reference.alive1(), salt.hex()
+
+
+def test_alive2_matches_reference():
+    template = PacketTemplate(USR, PWD, MAC, IP, HOST_NAME)
+    reference = _Reference(USR, PWD, MAC, IP, HOST_NAME, bytes(4), bytes(16))
+    rng = random.Random(1968)
+    for num in (0, 1, 2, 255, 256, 257, 1000):
+        for cls in (1, 3):
+            key = bytes(rng.randrange(256) for _ in range(4))
+            assert bytes(template.alive2(num, key, cls)) == reference.alive2(num, key, cls), (num, cls)
+
+
+def test_alive2_first_round_follows_first_flag():
+    template = PacketTemplate(USR, PWD, MAC, IP, HOST_NAME)
+    assert bytes(template.alive2(5, bytes(4), 1, True)[6:8]) == b'\xdc\x02'
+    assert bytes(template.alive2(0, bytes(4), 1, False)[6:8]) == KEEP_ALIVE_VERSION
+
+
+def test_logout_matches_reference():
+    template = PacketTemplate(USR, PWD, MAC, IP, HOST_NAME)
+    for salt in _salts():
+        auth_info = _auth_info(salt)
+        reference = _Reference(USR, PWD, MAC, IP, HOST_NAME, salt, auth_info)
+        assert bytes(template.logout(salt, auth_info)) == reference.logout(), salt.hex()
+        assert DrCOMCore._make_logout_challenge_package() == reference.logout_challenge()
+
+
+def test_salt_change_rebuilds_every_packet(frozen_time):
+    template = PacketTemplate(USR, PWD, MAC, IP, HOST_NAME)
+    salts = _salts()
+    # 轮流使用几个salt，缓存的摘要不能残留上一个salt的结果
+    for salt in salts[:3] + salts[:3]:
+        auth_info = _auth_info(salt)
+        reference = _Reference(USR, PWD, MAC, IP, HOST_NAME, salt, auth_info)
+        assert bytes(template.login(salt)) == reference.login()
+        assert bytes(template.alive1(salt, auth_info)) == reference.alive1()
+        assert bytes(template.logout(salt, auth_info)) == reference.logout()
+
+
+def test_long_host_name_is_truncated():
+    assert len(LONG_HOST_NAME) > 32
+    template = PacketTemplate(USR, PWD, MAC, IP, LONG_HOST_NAME)
+    for salt in _salts()[:5]:
+        login = bytes(template.login(salt))
+        # 原来的实现会把整个主机名写入，让之后的字段整体后移；模板截断为32字节，数据包长度不变
+        assert len(login) == 330
+        assert login[110:142] == LONG_HOST_NAME.encode('ascii')[:32]
+        reference = _Reference(USR, PWD, MAC, IP, LONG_HOST_NAME[:32], salt, _auth_info(salt))
+        assert login == reference.login()
+
+
+def test_core_uses_session_template(frozen_time):
+    core = DrCOMCore(USR, PWD)
+    session = core.session
+    session.mac, session.ip, session.host_name = MAC, IP, HOST_NAME
+    for salt in _salts()[:5]:
+        session.salt = salt
+        session.auth_info = _auth_info(salt)
+        reference = _Reference(USR, PWD, MAC, IP, HOST_NAME, salt, session.auth_info)
+        assert bytes(core._make_login_package()) == reference.login()
+        assert bytes(core._make_alive1_package()) == reference.alive1()
+        assert bytes(core._make_alive_package(0, b'\x01\x02\x03\x04', 1)) == reference.alive2(0, b'\x01\x02\x03\x04', 1)
+        assert bytes(core._make_alive_package(2, b'\x01\x02\x03\x04', 3)) == reference.alive2(2, b'\x01\x02\x03\x04', 3)
+        assert bytes(core._make_logout_package()) == reference.logout()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import time
+import socket
+import threading
+
+import pytest
+
+from drcom.main import probe as probe_module
+from drcom.main.probe import Prober
+from drcom.main.probe import Verdict
+from drcom.main.probe import probe
+
+LOCALHOST = "127.0.0.1"
+
+
+class _UDPResponder(object):
+    """
+    本地UDP目标，reply 根据收到的数据包构造返回，为None时不返回
+    """
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((LOCALHOST, 0))
+        self.socket.settimeout(0.05)
+        self.port = self.socket.getsockname()[1]
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        while self._running:
+            try:
+                data, address = self.socket.recvfrom(1024)
+            except socket.timeout:
+                continue
+            reply = self.reply(data)
+            if reply is not None:
+                self.socket.sendto(reply, address)
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+        self.socket.close()
+
+
+@pytest.fixture
+def targets():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind((LOCALHOST, 0))
+    listener.listen(8)
+    # 绑定之后立即关闭的端口，连接会被拒绝
+    closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    closed.bind((LOCALHOST, 0))
+    closed_port = closed.getsockname()[1]
+    closed.close()
+
+    dns = _UDPResponder(lambda data: data[:2] + b'\x81\x80' + data[4:])
+    drcom = _UDPResponder(lambda data: b'\x02\x02' + data[2:4] + b'\x00' * 16)
+    silent = _UDPResponder(lambda data: None)
+    try:
+        yield {
+            "tcp": ("tcp", LOCALHOST, listener.getsockname()[1]),
+            "refused": ("tcp", LOCALHOST, closed_port),
+            "dns": ("dns", LOCALHOST, dns.port),
+            "drcom": ("drcom", LOCALHOST, drcom.port),
+            "silent": ("dns", LOCALHOST, silent.port, 5.0),
+        }
+    finally:
+        for responder in (dns, drcom, silent):
+            responder.close()
+        listener.close()
+
+
+def test_every_kind_is_reachable(targets):
+    verdict = probe([targets["tcp"], targets["dns"], targets["drcom"]], 3, 1.0)
+    assert verdict.online
+    assert [result.ok for result in verdict.results] == [True, True, True]
+    assert verdict.latency is not None
+
+
+def test_quorum(targets):
+    verdict = probe([targets["tcp"], targets["refused"], targets["dns"]], 2, 1.0)
+    assert verdict and verdict.reachable == 2
+    verdict = probe([targets["tcp"], targets["refused"]], 2, 1.0)
+    assert not verdict
+    assert verdict.results[1].ok is False and verdict.results[1].error
+    # 法定数量大于目标数量时按目标数量计算
+    verdict = probe([targets["tcp"]], 5, 1.0)
+    assert verdict and verdict.quorum == 1
+
+
+def test_early_exit_when_quorum_reached(targets):
+    begin = time.monotonic()
+    verdict = probe([targets["silent"], targets["tcp"], targets["drcom"]], 2, 1.0)
+    assert time.monotonic() - begin < 1.0
+    assert verdict.online
+    # 没有返回的目标不需要等到超时
+    assert verdict.results[0].ok is None
+
+
+def test_early_exit_when_quorum_unreachable(targets):
+    begin = time.monotonic()
+    verdict = probe([targets["refused"], targets["silent"], targets["refused"]], 2, 1.0)
+    assert time.monotonic() - begin < 1.0
+    assert not verdict.online
+    assert verdict.results[1].ok is None
+
+
+def test_timeout_per_target(targets):
+    verdict = probe([targets["silent"][:3] + (0.05,)], 1, 5.0)
+    assert not verdict
+    assert verdict.results[0].error == "timeout"
+
+
+def test_unknown_kind_fails_without_raising():
+    verdict = probe([("icmp", LOCALHOST, 0)], 1, 0.1)
+    assert not verdict
+    assert "unknown" in verdict.results[0].error
+
+
+def test_concurrent_callers_share_one_probe(monkeypatch):
+    calls = []
+
+    def slow_probe(targets, quorum, timeout):
+        calls.append(time.monotonic())
+        time.sleep(0.1)
+        return Verdict(True, [], quorum)
+
+    monkeypatch.setattr(probe_module, "probe", slow_probe)
+    prober = Prober(targets=[], ttl=60)
+    verdicts = []
+    threads = [threading.Thread(target=lambda: verdicts.append(prober.check())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(verdicts) == 8 and all(verdict is verdicts[0] for verdict in verdicts)
+
+    # 缓存期内直接返回，强制检测或者失效之后重新检测
+    assert prober.check() is verdicts[0]
+    assert prober.check(force=True) is not verdicts[0]
+    assert len(calls) == 2
+    prober.invalidate()
+    prober.check()
+    assert len(calls) == 3
+
+
+def test_cached_verdict_expires(monkeypatch):
+    calls = []
+
+    def counting_probe(targets, quorum, timeout):
+        calls.append(None)
+        return Verdict(True, [], quorum)
+
+    monkeypatch.setattr(probe_module, "probe", counting_probe)
+    prober = Prober(targets=[], ttl=0.05)
+    first = prober.check()
+    assert prober.check() is first
+    time.sleep(0.06)
+    assert prober.check() is not first
+    assert len(calls) == 2
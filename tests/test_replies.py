@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import time
+import socket
+
+import pytest
+
+from drcom.main.dispatch import BufferPool
+from drcom.main.dispatch import SocketDispatcher
+from drcom.main.replies import AliveReply
+from drcom.main.replies import LoginReply
+from drcom.main.replies import LogoutReply
+from drcom.main.replies import ChallengeReply
+
+SERVER = ("10.0.0.1", 61440)
+
+
+def _alive2(num, cls, key=bytes(4)):
+    pkg = bytearray(40)
+    pkg[0] = 0x07
+    pkg[1] = num
+    pkg[2:5] = b'\x28\x00\x0b'
+    pkg[5] = cls
+    pkg[16:20] = key
+    return bytes(pkg)
+
+
+def test_challenge_reply_offsets():
+    data = b'\x02\x02\x34\x12' + b'\xaa\xbb\xcc\xdd' + bytes(20)
+    reply = ChallengeReply(memoryview(data), SERVER)
+    assert reply.ok and reply.code == 0x02
+    assert reply.token == 0x1234
+    assert reply.salt == b'\xaa\xbb\xcc\xdd' and isinstance(reply.salt, bytes)
+    assert reply.matches(b'\x34\x12')
+    assert not reply.matches(b'\x12\x34')
+
+
+def test_challenge_reply_rejects_short_or_wrong_packets():
+    for data in (b'', b'\x02\x02\x34\x12', b'\x02\x03\x34\x12\xaa\xbb\xcc\xdd'):
+        reply = ChallengeReply(memoryview(data), SERVER)
+        assert not reply.ok and reply.raw == data
+        assert not reply.matches(b'\x34\x12')
+
+
+def test_login_reply_offsets():
+    data = bytearray(64)
+    data[0] = 0x04
+    data[23:39] = bytes(range(1, 17))
+    reply = LoginReply(memoryview(data), SERVER)
+    assert reply.ok and reply.reason is None
+    assert reply.auth_info == bytes(range(1, 17))
+    # 拷贝之后不再依赖接收缓冲区
+    data[23] = 0xff
+    assert reply.auth_info[0] == 1
+
+
+def test_login_failure_reason():
+    data = bytearray(40)
+    data[0] = 0x05
+    data[32] = LoginReply.WRONG_PASSWORD
+    reply = LoginReply(memoryview(data), SERVER)
+    assert not reply.ok
+    assert reply.reason == LoginReply.WRONG_PASSWORD
+    assert reply.raw == bytes(data) and reply.auth_info == b""
+    # 太短的失败返回没有原因
+    assert LoginReply(memoryview(bytes(data[:32])), SERVER).reason is None
+
+
+def test_alive_reply_offsets():
+    reply = AliveReply(memoryview(_alive2(0x2a, 2, b'\x01\x02\x03\x04')), SERVER)
+    assert reply.ok
+    assert reply.num == 0x2a
+    assert reply.key == b'\x01\x02\x03\x04'
+    reply = AliveReply(memoryview(b'\x05\x00'), SERVER)
+    assert not reply.ok and reply.raw == b'\x05\x00' and reply.key == b""
+
+
+def test_logout_reply_kinds():
+    challenge = LogoutReply(memoryview(b'\x02\x03' + bytes(18)), SERVER)
+    assert challenge.ok and challenge.challenge_ok and not challenge.logout_ok
+    logout = LogoutReply(memoryview(b'\x04' + bytes(30)), SERVER)
+    assert logout.ok and logout.logout_ok and not logout.challenge_ok
+    # 0x02 但不是登出准备的返回
+    other = LogoutReply(memoryview(b'\x02\x02' + bytes(18)), SERVER)
+    assert not other.ok and other.raw is not None
+    assert not LogoutReply(memoryview(b''), SERVER).ok
+
+
+def test_buffer_pool_reuses_buffers():
+    pool = BufferPool(count=2, length=64)
+    first, second = pool.acquire(), pool.acquire()
+    # 用完时临时分配
+    extra = pool.acquire()
+    assert len(extra) == 64
+    for buffer in (first, second, extra):
+        pool.release(buffer)
+    assert len(pool._free) == 2
+    assert {id(buffer) for buffer in pool._free} == {id(first), id(second)}
+
+
+@pytest.fixture
+def endpoints():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(1)
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.bind(("127.0.0.1", 0))
+    try:
+        yield server, client, SocketDispatcher(client)
+    finally:
+        server.close()
+        client.close()
+
+
+def _pooled(dispatcher):
+    return {id(buffer) for buffer in dispatcher.pool._free}
+
+
+def test_matched_reply_returns_buffer(endpoints):
+    server, _, dispatcher = endpoints
+    buffers = _pooled(dispatcher)
+    address = server.getsockname()
+    deadline = time.monotonic() + 1
+    waiter = dispatcher.submit(_alive2(1, 1), address, deadline)
+    _, peer = server.recvfrom(1024)
+    server.sendto(_alive2(1, 2, b'\x0a\x0b\x0c\x0d'), peer)
+    reply = dispatcher.collect(waiter, deadline, AliveReply)
+    dispatcher.cancel(waiter)
+    assert reply.key == b'\x0a\x0b\x0c\x0d'
+    assert _pooled(dispatcher) == buffers
+
+
+def test_stale_reply_returns_buffer(endpoints):
+    server, _, dispatcher = endpoints
+    buffers = _pooled(dispatcher)
+    address = server.getsockname()
+    deadline = time.monotonic() + 1
+    waiter = dispatcher.submit(_alive2(5, 3), address, deadline)
+    _, peer = server.recvfrom(1024)
+    # 上一轮迟到的返回没有等待者，直接丢弃
+    server.sendto(_alive2(4, 4), peer)
+    server.sendto(_alive2(5, 2), peer)
+    server.sendto(_alive2(5, 4, b'\x01\x01\x01\x01'), peer)
+    reply = dispatcher.collect(waiter, deadline, AliveReply)
+    dispatcher.cancel(waiter)
+    assert (reply.num, reply.key) == (5, b'\x01\x01\x01\x01')
+    assert _pooled(dispatcher) == buffers
+
+
+def test_uncollected_reply_returns_buffer_on_cancel(endpoints):
+    server, _, dispatcher = endpoints
+    buffers = _pooled(dispatcher)
+    address = server.getsockname()
+    deadline = time.monotonic() + 1
+    first = dispatcher.submit(_alive2(1, 1), address, deadline)
+    second = dispatcher.submit(_alive2(2, 1), address, deadline)
+    for _ in range(2):
+        _, peer = server.recvfrom(1024)
+    server.sendto(_alive2(1, 2), peer)
+    server.sendto(_alive2(2, 2), peer)
+    assert dispatcher.collect(second, deadline, AliveReply).num == 2
+    # 第一个请求的返回已经放入它的等待者，但没有被取走
+    assert first.result is not None
+    dispatcher.cancel(first)
+    dispatcher.cancel(second)
+    assert _pooled(dispatcher) == buffers
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import random
+
+import pytest
+
+from drcom.main import retry
+from drcom.main.retry import RetryPolicy
+from drcom.main.retry import RTTEstimator
+from drcom.configs.settings import RTO_MIN
+from drcom.configs.settings import RTO_MAX
+from drcom.configs.settings import RTO_INITIAL
+from drcom.configs.settings import OPERATION_DEADLINE
+
+HOST = "10.0.0.1"
+SEED = 20190417
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(retry.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def seeded():
+    # schedule() 使用random模块的全局随机数，固定种子之后可以按同样的顺序重算
+    state = random.getstate()
+    random.seed(SEED)
+    yield random.Random(SEED)
+    random.setstate(state)
+
+
+def test_first_sample_initializes_estimate():
+    estimator = RTTEstimator()
+    assert estimator.rto == RTO_INITIAL
+    estimator.sample(0.1)
+    assert estimator.srtt == pytest.approx(0.1)
+    assert estimator.rttvar == pytest.approx(0.05)
+    # RTO = SRTT + K * RTTVAR
+    assert estimator.rto == pytest.approx(0.3)
+
+
+def test_later_samples_follow_rfc6298():
+    rng = random.Random(SEED)
+    estimator = RTTEstimator(minimum=0.0, maximum=60.0)
+    srtt = rttvar = None
+    for _ in range(200):
+        rtt = rng.uniform(0.005, 0.5)
+        if srtt is None:
+            srtt, rttvar = rtt, rtt / 2
+        else:
+            rttvar = 0.75 * rttvar + 0.25 * abs(srtt - rtt)
+            srtt = 0.875 * srtt + 0.125 * rtt
+        estimator.sample(rtt)
+        assert estimator.srtt == pytest.approx(srtt)
+        assert estimator.rttvar == pytest.approx(rttvar)
+        assert estimator.rto == pytest.approx(srtt + max(RTTEstimator.G, 4 * rttvar))
+
+
+def test_rto_is_clamped():
+    estimator = RTTEstimator()
+    for _ in range(50):
+        estimator.sample(0.001)
+    assert estimator.rto == RTO_MIN
+    for _ in range(50):
+        estimator.sample(30.0)
+    assert estimator.rto == RTO_MAX
+    # 初始值同样限制在上下限之间
+    assert RTTEstimator(initial=100).rto == RTO_MAX
+    assert RTTEstimator(initial=0).rto == RTO_MIN
+
+
+def test_backoff_doubles_up_to_maximum():
+    estimator = RTTEstimator(initial=0.25, minimum=0.2, maximum=3.0)
+    rtos = []
+    for _ in range(6):
+        estimator.backoff()
+        rtos.append(estimator.rto)
+    assert rtos == [0.5, 1.0, 2.0, 3.0, 3.0, 3.0]
+    # 下一次有效样本重新计算RTO
+    estimator.sample(0.1)
+    assert estimator.rto == pytest.approx(0.3)
+
+
+def test_karn_ignores_retransmitted_samples():
+    policy = RetryPolicy(jitter=0)
+    policy.success(HOST, 0.1, 0)
+    srtt, rttvar, rto = policy.estimator(HOST).srtt, policy.estimator(HOST).rttvar, policy.rto(HOST)
+    # 重传之后收到的返回无法确定对应哪一次发送
+    for attempt in (1, 2, 4):
+        policy.success(HOST, 5.0, attempt)
+    estimator = policy.estimator(HOST)
+    assert (estimator.srtt, estimator.rttvar, estimator.rto) == (srtt, rttvar, rto)
+
+
+def test_failure_backs_off_per_host():
+    policy = RetryPolicy(jitter=0)
+    policy.failure(HOST)
+    policy.failure(HOST)
+    assert policy.rto(HOST) == RTO_MAX
+    assert policy.rto("10.0.0.2") == RTO_INITIAL
+
+
+def test_schedule_applies_jitter(clock, seeded):
+    policy = RetryPolicy(attempts=5, jitter=0.25)
+    policy.success(HOST, 0.1, 0)
+    rto = policy.rto(HOST)
+    schedule = list(policy.schedule(HOST))
+    assert [attempt for attempt, _ in schedule] == list(range(5))
+    for _, timeout in schedule:
+        expected = rto * (1 + seeded.random() * 0.25)
+        assert timeout == pytest.approx(expected)
+        assert rto <= timeout <= rto * 1.25
+
+
+def test_schedule_follows_backoff(clock):
+    policy = RetryPolicy(attempts=5, deadline=100, jitter=0)
+    timeouts = []
+    for attempt, timeout in policy.schedule(HOST):
+        timeouts.append(timeout)
+        clock.now += timeout
+        policy.failure(HOST)
+    assert timeouts == [RTO_INITIAL, 2.0, RTO_MAX, RTO_MAX, RTO_MAX]
+
+
+def test_schedule_is_capped_by_deadline(clock, seeded):
+    policy = RetryPolicy(attempts=10, jitter=0.25)
+    begin = clock.now
+    timeouts = []
+    for attempt, timeout in policy.schedule(HOST):
+        timeouts.append(timeout)
+        clock.now += timeout
+        policy.failure(HOST)
+    # 最后一次等待被截短，总等待时间正好等于总时限
+    assert len(timeouts) < 10
+    assert clock.now - begin == pytest.approx(OPERATION_DEADLINE)
+    assert timeouts[-1] < RTO_MAX
+
+
+def test_schedule_stops_when_deadline_passed(clock):
+    policy = RetryPolicy(attempts=5, deadline=2.0, jitter=0)
+    schedule = policy.schedule(HOST)
+    assert next(schedule) == (0, RTO_INITIAL)
+    clock.now += 2.5
+    assert list(schedule) == []
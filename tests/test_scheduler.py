@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import random
+import threading
+
+import pytest
+
+from drcom.main import scheduler as scheduler_module
+from drcom.main.metrics import Metrics
+from drcom.main.scheduler import Cadence
+from drcom.main.scheduler import Scheduler
+from drcom.main.scheduler import DEFAULT_SCHEDULER
+from drcom.main.watcher import LinkWatcher
+
+
+def test_watcher_keeps_idle_scheduler():
+    scheduler = Scheduler("test")
+    # 没有定时器的调度器长度为0
+    assert not len(scheduler)
+    watcher = LinkWatcher(lambda identity, reason: None, scheduler=scheduler)
+    assert watcher.scheduler is scheduler
+    assert LinkWatcher(lambda identity, reason: None).scheduler is DEFAULT_SCHEDULER
+
+
+def test_call_later_runs_on_scheduler_thread():
+    scheduler = Scheduler("test").start()
+    done = threading.Event()
+    threads = []
+    try:
+        scheduler.call_later(0.01, lambda: (threads.append(threading.current_thread().name), done.set()))
+        assert done.wait(2)
+    finally:
+        scheduler.stop()
+    assert threads == ["test"]
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 5000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(scheduler_module.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def seeded():
+    state = random.getstate()
+    random.seed(1968)
+    yield random.Random(1968)
+    random.setstate(state)
+
+
+def test_cadence_deadlines_stay_on_grid(clock, seeded):
+    cadence = Cadence(10, jitter=1.0)
+    anchor = 5000.0 + seeded.uniform(0, 1.0)
+    assert cadence.anchor == pytest.approx(anchor)
+    metrics = Metrics()
+    for k in range(1, 6):
+        clock.now = cadence.deadline + 0.3
+        assert cadence.begin(metrics) == pytest.approx(0.3)
+        # 执行耗时不累积，下一轮仍然在 anchor + k * interval
+        clock.now += 2.5
+        assert cadence.advance() == pytest.approx(anchor + k * 10)
+        assert cadence.delay() == pytest.approx(anchor + k * 10 - clock.now)
+    assert metrics.counters["skipped_heartbeats"] == 0
+    assert metrics.counters["late_heartbeats"] == 0
+
+
+def test_cadence_phase_is_capped_by_interval(clock):
+    for _ in range(200):
+        cadence = Cadence(0.5, jitter=5.0)
+        assert 5000.0 <= cadence.anchor < 5000.5
+        cadence = Cadence(10, jitter=1.0)
+        assert 5000.0 <= cadence.anchor < 5001.0
+    assert Cadence(10, jitter=0).anchor == 5000.0
+
+
+def test_cadence_catches_up_one_missed_round(clock):
+    cadence = Cadence(10, jitter=0)
+    metrics = Metrics()
+    cadence.begin(metrics)
+    # 这一轮执行了35秒，错过了第1、2、3轮的截止时间
+    clock.now += 35
+    deadline = cadence.advance()
+    # 只补一轮，立即执行
+    assert deadline == 5030.0
+    assert cadence.delay() == 0.0
+    assert cadence.skipped == 2
+    assert cadence.begin(metrics) == pytest.approx(5.0)
+    assert metrics.counters["skipped_heartbeats"] == 2
+    assert metrics.counters["late_heartbeats"] == 1
+    assert cadence.skipped == 0
+    # 之后回到原来的节奏上
+    clock.now += 1
+    assert cadence.advance() == 5040.0
+    assert cadence.skipped == 0
+
+
+def test_cadence_late_round_is_not_skipped(clock):
+    cadence = Cadence(10, jitter=0)
+    # 晚于截止时间但没有错过下一轮
+    clock.now += 15
+    assert cadence.advance() == 5010.0
+    assert cadence.skipped == 0
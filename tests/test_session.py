@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import asyncio
+
+import pytest
+
+from drcom.main.aio import DrCOMProtocol
+from drcom.main.retry import RetryPolicy
+from drcom.main.session import SessionManager
+from drcom.configs.settings import SERVER_PORT
+from drcom.configs.settings import KEEP_ALIVE_VERSION
+
+SERVER = ("10.0.0.1", SERVER_PORT)
+HOST = ("MagicDrCOM-test", bytes.fromhex("001a264a7b0d"), "10.1.2.3")
+
+
+class _Transport(object):
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, address):
+        self.sent.append((bytes(data), address))
+
+    def get_extra_info(self, name):
+        return ("0.0.0.0", 61440)
+
+
+def _alive2_reply(pkg):
+    reply = bytearray(40)
+    reply[0] = 0x07
+    reply[1] = pkg[1]
+    reply[2:5] = b'\x28\x00\x0b'
+    reply[5] = pkg[5] + 1
+    reply[16:20] = bytes([pkg[1], pkg[5], 0xaa, 0xbb])
+    return bytes(reply)
+
+
+def _alive1_reply():
+    reply = bytearray(32)
+    reply[0] = 0x07
+    reply[2] = 0x10
+    return bytes(reply)
+
+
+def _manager(count, pool_size=1):
+    """
+    SessionManager 的全部会话共用 pool_size 个假的UDP端点，会话已经登录
+    """
+    manager = SessionManager(pool_size=pool_size, policy=RetryPolicy())
+    for _ in range(pool_size):
+        protocol = DrCOMProtocol()
+        protocol.connection_made(_Transport())
+        manager._pool.append(protocol)
+    manager._host = HOST
+    for i in range(count):
+        client = manager.add("2019{:06d}".format(i), "123456")
+        state = client.session
+        state.server_ip = SERVER[0]
+        state.salt = bytes(4)
+        state.auth_info = bytes(16)
+        state.reset()
+        state.login_flag = state.alive_flag = True
+    return manager
+
+
+async def _settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_first_num_is_spread_per_endpoint():
+    manager = _manager(6, pool_size=2)
+    nums = [(client.protocol, client.session.first_num) for client in manager.sessions.values()]
+    assert len(set(nums)) == 6
+    assert [num for _, num in nums] == [0, 0, 1, 1, 2, 2]
+    # 重新登录时从同一个起始编号开始
+    for client in manager.sessions.values():
+        assert client.session.num == client.session.first_num
+
+
+def test_alive2_of_sessions_on_one_endpoint_overlap():
+    async def run():
+        manager = _manager(2)
+        protocol = manager._pool[0]
+        clients = list(manager.sessions.values())
+        tasks = [asyncio.ensure_future(client.send_alive_pkg2(client.session.num, client.session.key, 1))
+                 for client in clients]
+        await _settle()
+        # 两个会话的请求都已经发出，没有一个在等待另一个的返回
+        sent = protocol.transport.sent
+        assert len(sent) == 2
+        assert [pkg[1] for pkg, _ in sent] == [0, 1]
+        # 第一轮心跳使用第一次心跳的版本号
+        assert all(pkg[6:8] == b'\xdc\x02' for pkg, _ in sent)
+        # 返回的顺序与发送顺序相反
+        for pkg, address in reversed(sent):
+            protocol.datagram_received(_alive2_reply(pkg), address)
+        keys = await asyncio.gather(*tasks)
+        assert keys == [b'\x00\x01\xaa\xbb', b'\x01\x01\xaa\xbb']
+
+    asyncio.new_event_loop().run_until_complete(run())
+
+
+def test_heartbeat_rounds_overlap():
+    async def run():
+        manager = _manager(3)
+        protocol = manager._pool[0]
+        sent = protocol.transport.sent
+        clients = list(manager.sessions.values())
+        tasks = [asyncio.ensure_future(client.heartbeat()) for client in clients]
+        await _settle()
+        # 每个会话的心跳包一与cls 1同时发出
+        assert sorted(pkg[0] for pkg, _ in sent) == [0x07] * 3 + [0xff] * 3
+        for pkg, address in list(sent):
+            protocol.datagram_received(_alive1_reply() if pkg[0] == 0xff else _alive2_reply(pkg), address)
+        await _settle()
+        cls3 = [pkg for pkg, _ in sent[6:]]
+        assert sorted((pkg[1], pkg[5]) for pkg in cls3) == [(0, 3), (1, 3), (2, 3)]
+        for pkg in cls3:
+            protocol.datagram_received(_alive2_reply(pkg), SERVER)
+        await asyncio.gather(*tasks)
+        for client in clients:
+            assert client.session.num == client.session.first_num + 2
+
+        # 第二轮使用普通版本号
+        tasks = [asyncio.ensure_future(client.heartbeat()) for client in clients]
+        await _settle()
+        assert all(pkg[6:8] == KEEP_ALIVE_VERSION for pkg, _ in sent[9:] if pkg[0] == 0x07)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.new_event_loop().run_until_complete(run())
+
+
+def test_alive1_replies_go_to_waiters_in_order():
+    async def run():
+        manager = _manager(2)
+        protocol = manager._pool[0]
+        clients = list(manager.sessions.values())
+        tasks = [asyncio.ensure_future(client.send_alive_pkg1()) for client in clients]
+        await _settle()
+        assert len(protocol.transport.sent) == 2
+        protocol.datagram_received(_alive1_reply(), SERVER)
+        await _settle()
+        assert tasks[0].done() and not tasks[1].done()
+        protocol.datagram_received(_alive1_reply(), SERVER)
+        await asyncio.gather(*tasks)
+        # 全部完成之后不再留下等待队列
+        assert not protocol._queues and not len(protocol._dispatcher)
+
+    asyncio.new_event_loop().run_until_complete(run())
+
+
+def test_alive1_timeout_leaves_queue_clean():
+    async def run():
+        protocol = DrCOMProtocol()
+        protocol.connection_made(_Transport())
+        with pytest.raises(asyncio.TimeoutError):
+            await protocol.request(b'\xff' + bytes(40), SERVER, 0.01)
+        assert not protocol._queues and not len(protocol._dispatcher)
+        # 没有等待者时收到的返回直接丢弃
+        protocol.datagram_received(_alive1_reply(), SERVER)
+
+    asyncio.new_event_loop().run_until_complete(run())
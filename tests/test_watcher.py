@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# ==================================================
+# Licensed under the GPLv3
+# 本项目由@Ryuchen开发维护，使用Python3.7
+# ==================================================
+
+import socket
+import struct
+
+import pytest
+
+from drcom.main import watcher
+from drcom.main.scheduler import Scheduler
+
+UPLINK = 2
+IDENTITY = ("host", "001122334455", "192.0.2.2")
+
+
+def _message(kind, body):
+    return struct.pack("=IHHII", 16 + len(body), kind, 0, 0, 0) + body
+
+
+def _address(index, ip, added=True):
+    body = struct.pack("=BBBBI", socket.AF_INET, 24, 0, 0, index) + struct.pack("=HH", 8, watcher.IFA_LOCAL)
+    return _message(watcher.RTM_NEWADDR if added else watcher.RTM_DELADDR, body + socket.inet_aton(ip))
+
+
+def _link(index, carrier):
+    flags = watcher.IFF_LOWER_UP | watcher.IFF_RUNNING if carrier else 0
+    return _message(watcher.RTM_NEWLINK, struct.pack("=BxHiII", socket.AF_UNSPEC, 1, index, flags, 0))
+
+
+class _Socket(object):
+
+    def __init__(self, data):
+        self.data = data
+
+    def recv(self, size):
+        return self.data
+
+
+class _Host(object):
+
+    def __init__(self, identity):
+        self.identity = identity
+
+    def invalidate(self):
+        pass
+
+    def get(self):
+        return self.identity
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    host = _Host(IDENTITY)
+    monkeypatch.setattr(watcher, "DEFAULT_HOST", host)
+    monkeypatch.setattr(watcher.LinkWatcher, "_uplink_index", staticmethod(lambda: UPLINK))
+    calls = []
+    link = watcher.LinkWatcher(lambda identity, reason: calls.append((identity, reason)), scheduler=Scheduler("test"))
+    # 不创建netlink socket，直接喂入事件
+    link.mode = "netlink"
+    link._state = host.get()
+    link._uplink = UPLINK
+    return link, host, calls
+
+
+def _feed(link, data):
+    link._readable(_Socket(data))
+    link._flush()
+
+
+def test_other_interface_events_are_ignored(setup):
+    link, _, calls = setup
+    _feed(link, _address(5, "172.17.0.1") + _link(42, False))
+    assert calls == []
+
+
+def test_identity_change_is_reported(setup):
+    link, host, calls = setup
+    host.identity = IDENTITY[:2] + ("192.0.2.3",)
+    _feed(link, _address(UPLINK, "192.0.2.3"))
+    assert [identity for identity, _ in calls] == [host.identity]
+
+
+def test_uplink_carrier_change_is_reported(setup):
+    link, _, calls = setup
+    _feed(link, _link(UPLINK, False))
+    assert len(calls) == 1